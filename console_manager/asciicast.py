@@ -0,0 +1,125 @@
+import bisect
+import codecs
+import json
+import sys
+import time
+from session_recorder import SessionRecorder
+
+# Шаг индекса для перемотки: одна запись на каждые INDEX_INTERVAL секунд записи
+INDEX_INTERVAL = 1.0
+
+
+'''AsciicastWriter: записывает сессию в формате asciicast v2 (совместим с asciinema).
+Каждое событие (вывод сервера "o" или ввод с клавиатуры "i") сразу уходит в фоновый
+SessionRecorder, поэтому сессия не накапливается в памяти. Параллельно строится индекс
+"время -> смещение в файле", который сохраняется рядом с записью в файл .idx.'''
+class AsciicastWriter:
+    def __init__(self, file_path, width, height, command=None):
+        self.file_path = file_path
+        self.recorder = SessionRecorder(file_path, max_bytes=0)
+        self.decoders = {
+            "o": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+            "i": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        }
+        self.started = time.monotonic()
+        self.offset = 0
+        self.index = []
+        self.next_index_time = 0.0
+
+        header = {"version": 2, "width": width, "height": height, "timestamp": int(time.time())}
+        if command:
+            header["command"] = command
+        self.write_line(header)
+
+    def write_line(self, value):
+        '''Записывает одну JSON-строку и сдвигает текущее смещение.'''
+        line = (json.dumps(value, ensure_ascii=False) + "\n").encode("utf-8")
+        self.recorder.write(line)
+        self.offset += len(line)
+
+    def event(self, kind, data):
+        '''Записывает событие kind ("o" или "i") с байтами data.'''
+        text = self.decoders[kind].decode(data)
+        if not text:
+            return
+        elapsed = time.monotonic() - self.started
+        if elapsed >= self.next_index_time:
+            self.index.append((elapsed, self.offset))
+            self.next_index_time = elapsed + INDEX_INTERVAL
+        self.write_line([round(elapsed, 6), kind, text])
+
+    def output(self, data):
+        '''Записывает вывод сервера.'''
+        self.event("o", data)
+
+    def input(self, data):
+        '''Записывает ввод пользователя.'''
+        self.event("i", data)
+
+    def close(self):
+        '''Дописывает запись и сохраняет индекс.'''
+        self.recorder.close()
+        with open(self.file_path + ".idx", "w") as file:
+            for elapsed, offset in self.index:
+                file.write(f"{elapsed:.6f} {offset}\n")
+
+
+'''AsciicastPlayer: воспроизводит запись asciicast v2 с реальной скоростью, с ускорением
+или мгновенно. Для перемотки используется индекс .idx, если его нет, он строится
+одним проходом по файлу.'''
+class AsciicastPlayer:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.times, self.offsets = self.load_index()
+
+    def load_index(self):
+        '''Загружает индекс из файла .idx или строит его по записи.'''
+        try:
+            with open(self.file_path + ".idx", "r") as file:
+                entries = [line.split() for line in file if line.strip()]
+            return [float(elapsed) for elapsed, _ in entries], [int(offset) for _, offset in entries]
+        except FileNotFoundError:
+            return self.build_index()
+
+    def build_index(self):
+        '''Строит индекс, просматривая запись построчно.'''
+        times, offsets = [], []
+        next_index_time = 0.0
+        with open(self.file_path, "rb") as file:
+            offset = len(file.readline())
+            for line in file:
+                elapsed = json.loads(line)[0]
+                if elapsed >= next_index_time:
+                    times.append(elapsed)
+                    offsets.append(offset)
+                    next_index_time = elapsed + INDEX_INTERVAL
+                offset += len(line)
+        return times, offsets
+
+    def events(self, start=0.0):
+        '''Выдает события (время, тип, данные), начиная с момента start.'''
+        with open(self.file_path, "rb") as file:
+            header_size = len(file.readline())
+            position = bisect.bisect_right(self.times, start) - 1
+            file.seek(self.offsets[position] if position >= 0 else header_size)
+            for line in file:
+                elapsed, kind, data = json.loads(line)
+                if elapsed >= start:
+                    yield elapsed, kind, data
+
+    def play(self, speed=1.0, instant=False, start=0.0, output=None):
+        '''Воспроизводит вывод записи, начиная с момента start (в секундах).'''
+        if not instant and speed <= 0:
+            raise ValueError(f"ускорение воспроизведения должно быть больше нуля: {speed}")
+        output = output or sys.stdout
+        started = time.monotonic()
+        for elapsed, kind, data in self.events(start):
+            if kind != "o":
+                continue
+            if not instant:
+                delay = (elapsed - start) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    output.flush()
+                    time.sleep(delay)
+            output.write(data)
+        output.flush()
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from ssh_client import ConnectionPool, RECV_BUFFER_SIZE
+
+# Сколько сессий движок выполняет одновременно по умолчанию
+DEFAULT_MAX_SESSIONS = 32
+
+# Интервал проверки канала, если цикл событий не умеет ждать дескрипторы (Proactor в Windows)
+CHANNEL_POLL_INTERVAL = 0.02
+
+
+'''AsyncSession: одна команда, выполняемая через exec-канал под управлением AsyncSessionEngine.
+Данные читаются из канала только по мере того, как их забирает потребитель, поэтому
+память ограничена окном SSH-канала, а не объемом вывода.'''
+class AsyncSession:
+    def __init__(self, engine, command):
+        self.engine = engine
+        self.command = command
+        self.channel = None
+        self.exit_status = None
+
+    async def wait_readable(self, channel):
+        '''Ждет, пока в канале появятся данные или он закроется, не блокируя цикл событий.'''
+        loop = asyncio.get_running_loop()
+        fd = channel.fileno()
+        ready = loop.create_future()
+        try:
+            loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        except NotImplementedError:
+            await asyncio.sleep(CHANNEL_POLL_INTERVAL)
+            return
+        try:
+            await ready
+        finally:
+            loop.remove_reader(fd)
+
+    async def stream(self):
+        '''Асинхронно выдает чанки (data, is_error) по мере их поступления от сервера.'''
+        loop = asyncio.get_running_loop()
+        async with self.engine.semaphore:
+            self.channel = await self.engine.open_channel(self.command)
+            channel = self.channel
+            try:
+                while True:
+                    if channel.recv_ready():
+                        yield channel.recv(self.engine.recv_buffer_size), False
+                    elif channel.recv_stderr_ready():
+                        yield channel.recv_stderr(self.engine.recv_buffer_size), True
+                    elif channel.eof_received or channel.closed:
+                        break
+                    else:
+                        await self.wait_readable(channel)
+
+                self.exit_status = await loop.run_in_executor(None, channel.recv_exit_status)
+            finally:
+                # Сюда попадаем и при отмене задачи: канал закрывается, сервер получает сигнал о закрытии
+                channel.close()
+
+    def cancel(self):
+        '''Прерывает выполнение команды, закрывая канал.'''
+        if self.channel is not None:
+            self.channel.close()
+
+
+'''AsyncSessionEngine: асинхронный движок сессий рядом с SSHClient.
+Соединения берутся из того же ConnectionPool, блокирующие вызовы paramiko выполняются
+в пуле потоков, а ожидание данных идет в одном цикле событий, поэтому один процесс
+может вести десятки сессий одновременно.'''
+class AsyncSessionEngine:
+    def __init__(self, hostname, port, username, password, max_sessions=DEFAULT_MAX_SESSIONS, pool=None, recv_buffer_size=RECV_BUFFER_SIZE):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.recv_buffer_size = recv_buffer_size
+        self.semaphore = asyncio.Semaphore(max_sessions)
+        self.owns_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool()
+        self.logger = logging.getLogger(__name__)
+
+    async def connect(self):
+        '''Устанавливает соединение (или берет его из пула) и возвращает paramiko-клиент.'''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.pool.get_client, self.hostname, self.port, self.username, self.password
+        )
+
+    async def open_channel(self, command):
+        '''Открывает exec-канал и запускает в нем команду.'''
+        loop = asyncio.get_running_loop()
+        client = await self.connect()
+        channel = await loop.run_in_executor(None, client.get_transport().open_session)
+        try:
+            await loop.run_in_executor(None, channel.exec_command, command)
+        except BaseException:
+            channel.close()
+            raise
+        self.logger.info(f"Выполняется команда: {command}")
+        return channel
+
+    def session(self, command):
+        '''Создает сессию для команды; вывод читается через session.stream().'''
+        return AsyncSession(self, command)
+
+    async def stream(self, command):
+        '''Асинхронно выдает чанки (data, is_error) вывода команды.'''
+        async for data, is_error in self.session(command).stream():
+            yield data, is_error
+
+    async def run(self, command):
+        '''Выполняет команду и возвращает (код завершения, stdout, stderr).'''
+        session = self.session(command)
+        stdout, stderr = bytearray(), bytearray()
+        async for data, is_error in session.stream():
+            (stderr if is_error else stdout).extend(data)
+        return session.exit_status, bytes(stdout), bytes(stderr)
+
+    def close(self):
+        '''Закрывает соединения, если пул принадлежит движку.'''
+        if self.owns_pool:
+            self.pool.close()
@@ -0,0 +1,685 @@
+import os
+import sys
+import json
+import logging
+import glob
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+import paramiko
+from stand_server import StandServer, prepare_home, USERNAME, PASSWORD, POSTFIX, STANDS_DIR, LOGS_DIR
+from ssh_client import SSHClient, ConnectionPool, RECV_BUFFER_SIZE, FRAME_INTERVAL
+from cli import CLI
+from command_loader import StandCommands, EXEC_MODE
+from fan_out import FanOut
+from async_session import AsyncSessionEngine
+from result_cache import ResultCache
+from sftp_download import SFTPDownloader
+from terminal import PipeTerminal
+from key_decoder import KeyDecoder, PASTE_START, PASTE_END
+import control_master
+from command_index import CommandIndex, CommandHistory
+from output_stream import OutputStream
+from output_filter import OutputFilter, PLAIN_VIEW, HIGHLIGHT_VIEW, VIEWPORT_VIEW
+
+# Каталог, в который сохраняются результаты запусков для сравнения
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Каталог стенда-заглушки (логи переиспользуются между запусками)
+DATA_DIR = os.path.join(tempfile.gettempdir(), "ssh_console_bench")
+
+# Сколько раз повторяется каждое измерение (берется медиана) и размер лога стенда (в байтах)
+DEFAULT_REPEAT = 5
+DEFAULT_LOG_SIZE = 64 * 1024 * 1024
+QUICK_REPEAT = 3
+QUICK_LOG_SIZE = 8 * 1024 * 1024
+
+# Сколько раундов не меньше делает record_overhead: разница между вариантами мала, и ей нужно больше замеров
+RECORD_OVERHEAD_ROUNDS = 7
+
+# Изменение метрики, которое считается регрессией при сравнении (доля от базового значения)
+DEFAULT_THRESHOLD = 0.10
+
+# Стенды для fan-out и число потоков, с которыми он запускается
+STANDS = [f"stand{index}" for index in range(8)]
+FAN_OUT_WORKERS = (1, 2, 4, 8)
+
+# Сколько сессий асинхронный движок выполняет одновременно
+ASYNC_SESSIONS = (1, 8, 32)
+
+# Сколько "работает" команда на стенде в fan-out и асинхронных сессиях (в секундах)
+COMMAND_DELAY = 0.2
+
+# Сколько длится сессия без вывода при измерении CPU в простое (в секундах)
+IDLE_SECONDS = 3.0
+QUICK_IDLE_SECONDS = 1.0
+
+# Размер вставки из буфера обмена при измерении задержки ввода и объем для разбора KeyDecoder (в байтах)
+PASTE_SIZE = 64 * 1024
+DECODE_SIZE = 4 * 1024 * 1024
+
+# Сколько ждать эхо ввода, прежде чем считать измерение неудачным (в секундах)
+ECHO_TIMEOUT = 10.0
+
+# Каталог для поиска команд: 10 действий x 50 сервисов x 20 объектов = 10 000 названий
+SEARCH_VERBS = ("restart", "status", "tail", "full", "reload", "check", "clear", "run", "show", "stop")
+SEARCH_SERVICES = ("celery", "wsgi", "nginx", "redis", "postgres", "rabbit", "beat", "flower", "cron", "api") + tuple(f"worker{index}" for index in range(40))
+SEARCH_OBJECTS = (
+    "logs", "config", "queue", "cache", "settings", "visual", "script", "errors", "stats", "health",
+    "pid", "ports", "memory", "disk", "env", "version", "users", "jobs", "locks", "metrics",
+)
+
+# Запросы поиска по видам совпадения и сколько названий выбиралось раньше (история)
+SEARCH_QUERIES = {
+    "prefix": "restart cel",
+    "word_prefix": "celery lo",
+    "substring": "lery lo",
+    "typo": "restrat celry logs",
+    "typo_word": "celry",
+}
+SEARCH_HISTORY = 100
+
+# Высота окна терминала при выводе лога в режиме viewport (в строках)
+RENDER_HEIGHT = 50
+
+# Команды стенда-заглушки; пути подставляются StandCommands так же, как из commands.yaml
+TEMPLATES = {
+    "echo": "cd {src_path} && echo ok",
+    "full celery logs": "cd {src_path} && cat {logs_path}/celery_{stand}.log",
+    "cached logs": "cat {logs_path}/celery_{stand}.log",
+    "status": f"cd {{src_path}} && sleep {COMMAND_DELAY} && echo {{stand}} ok",
+    "sleep": "cd {src_path} && sleep {{seconds}}",
+}
+
+
+'''Sink: поток вывода для бенчмарков. Ничего не хранит, считает байты
+и отмечает момент, когда в выводе появляется ожидаемая строка (marker).'''
+class Sink:
+    def __init__(self):
+        self.buffer = self
+        self.bytes = 0
+        self.marker = None
+        self.tail = b""
+        self.seen = threading.Event()
+        self.seen_at = None
+
+    def expect(self, marker):
+        '''Начинает ждать marker в выводе; дождаться можно через seen.wait().'''
+        self.tail = b""
+        self.seen_at = None
+        self.seen.clear()
+        self.marker = marker
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bytes += len(data)
+        if self.marker is not None and not self.seen.is_set():
+            window = self.tail + data
+            if self.marker in window:
+                self.seen_at = time.perf_counter()
+                self.seen.set()
+            self.tail = window[-len(self.marker):]
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def median_ms(samples):
+    '''Медиана замеров в миллисекундах.'''
+    return statistics.median(samples) * 1000
+
+
+def timed(action):
+    '''Выполняет action() и возвращает время выполнения в секундах.'''
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+def metric(value, unit, better="lower"):
+    '''Описывает значение метрики: единица измерения и какое направление изменения лучше.'''
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+'''BenchmarkSuite: бенчмарки путей SSHClient/CLI против стенда-заглушки StandServer.
+Сервер работает в том же процессе, поэтому абсолютные значения ниже, чем на настоящем
+стенде: результаты предназначены для сравнения запусков между собой на одной машине.
+Каждый бенчмарк - метод, который возвращает словарь {метрика: metric(...)}.'''
+class BenchmarkSuite:
+    NAMES = (
+        "connect", "round_trip", "throughput", "record_overhead", "idle_cpu", "input_latency",
+        "fan_out", "async_sessions", "cache", "sftp", "control_master", "command_search", "render", "startup",
+    )
+
+    def __init__(self, server, work_dir, log_size, repeat=DEFAULT_REPEAT, idle_seconds=IDLE_SECONDS):
+        self.server = server
+        self.work_dir = work_dir
+        self.log_size = log_size
+        self.repeat = repeat
+        self.idle_seconds = idle_seconds
+        self.stand = STANDS[0]
+        self.commands = StandCommands(
+            {stand: f"~/{STANDS_DIR}/{stand}" for stand in STANDS}, f"~/{LOGS_DIR}", TEMPLATES,
+            modes={"cached logs": EXEC_MODE}, caches={"cached logs": 3600},
+        )
+        self.cli = CLI(self.commands, use_cache=True)
+
+    def create_client(self, sink=None, stdin=None, **kwargs):
+        '''Создает SSHClient к стенду-заглушке с терминалом без окна, который пишет в sink.'''
+        sink = sink if sink is not None else Sink()
+        terminal = PipeTerminal(stdin=stdin, stdout=sink, stderr=sink)
+        return SSHClient(self.server.hostname, self.server.port, USERNAME, PASSWORD, terminal=terminal, **kwargs)
+
+    def command(self, name, **values):
+        '''Возвращает команду стенда и prompt, которым CLI определяет ее завершение.'''
+        command = self.commands[self.stand][name].format(**values)
+        return command, self.cli.get_prompt_pattern_from_path(command, USERNAME, POSTFIX)
+
+    def execute(self, client, name, **values):
+        '''Выполняет команду в интерактивной сессии, как меню CLI.'''
+        command, prompt = self.command(name, **values)
+        client.execute_command(command, prompt)
+
+    def check_output(self, sink, expected, what):
+        '''Проверяет, что сессия получила весь вывод, а не завершилась ошибкой.'''
+        if sink.bytes < expected:
+            raise RuntimeError(f"{what}: получено {sink.bytes} байт вместо {expected}")
+
+    def connect(self):
+        '''Установка SSH-соединения: TCP, обмен ключами и аутентификация.'''
+        samples = []
+        for _ in range(self.repeat):
+            pool = ConnectionPool()
+            try:
+                samples.append(timed(lambda: pool.get_client(self.server.hostname, self.server.port, USERNAME, PASSWORD)))
+            finally:
+                pool.close()
+        return {"connect_ms": metric(median_ms(samples), "ms")}
+
+    def round_trip(self):
+        '''Короткая команда через переиспользуемый shell (меню) и через exec-канал (exec-режим, fan-out).'''
+        sink = Sink()
+        client = self.create_client(sink)
+        command, _ = self.command("echo")
+        try:
+            # Первая сессия открывает соединение и shell, дальше они берутся из пула
+            self.execute(client, "echo")
+            shell = [timed(lambda: self.execute(client, "echo")) for _ in range(self.repeat * 4)]
+            exec_samples = [timed(lambda: client.run_command(command, lambda data, is_error: None)) for _ in range(self.repeat * 4)]
+        finally:
+            client.close()
+        self.check_output(sink, len(shell) * len("ok\n"), "round_trip")
+        return {
+            "shell_ms": metric(median_ms(shell), "ms"),
+            "exec_ms": metric(median_ms(exec_samples), "ms"),
+        }
+
+    def stream_log(self, client, sink):
+        '''Выводит лог стенда в интерактивной сессии и возвращает время.'''
+        sink.bytes = 0
+        elapsed = timed(lambda: self.execute(client, "full celery logs"))
+        self.check_output(sink, self.log_size, "full celery logs")
+        return elapsed
+
+    def throughput(self):
+        '''Скорость вывода большого лога: shell-сессия (execute_command) и exec-режим (exec_command).'''
+        sink = Sink()
+        client = self.create_client(sink)
+        command, _ = self.command("full celery logs")
+        repeat = max(1, self.repeat // 2)
+        try:
+            client.initialize()
+            shell = [self.stream_log(client, sink) for _ in range(repeat)]
+            exec_samples = []
+            for _ in range(repeat):
+                exec_sink = Sink()
+                with redirect_stdout(exec_sink):
+                    exec_samples.append(timed(lambda: client.exec_command(command)))
+                self.check_output(exec_sink, self.log_size, "exec_command")
+        finally:
+            client.close()
+        megabytes = self.log_size / 1024 / 1024
+        return {
+            "shell_mb_s": metric(megabytes / statistics.median(shell), "MB/s", "higher"),
+            "exec_mb_s": metric(megabytes / statistics.median(exec_samples), "MB/s", "higher"),
+        }
+
+    def record_overhead(self):
+        '''
+        Насколько запись сессии (--record) и запись asciicast (--cast-dir) по отдельности замедляют вывод большого лога.
+        Варианты чередуются в каждом раунде, а замедление - медиана отношений внутри раунда:
+        так фоновая нагрузка машины одинаково влияет на оба замера и не дает разброса в десятки процентов.
+        '''
+        rounds = max(RECORD_OVERHEAD_ROUNDS, self.repeat)
+        variants = {
+            "plain": {},
+            "record": {"record_path": os.path.join(self.work_dir, "logs.txt")},
+            "cast": {"cast_dir": os.path.join(self.work_dir, "casts")},
+        }
+        clients = {}
+        samples = {name: [] for name in variants}
+        try:
+            for name, options in variants.items():
+                sink = Sink()
+                clients[name] = (self.create_client(sink, **options), sink)
+                clients[name][0].initialize()
+            for _ in range(rounds):
+                for name, (client, sink) in clients.items():
+                    samples[name].append(self.stream_log(client, sink))
+        finally:
+            for client, _ in clients.values():
+                client.close()
+        megabytes = self.log_size / 1024 / 1024
+
+        def overhead(name):
+            return statistics.median(sample / plain - 1 for sample, plain in zip(samples[name], samples["plain"])) * 100
+
+        return {
+            "plain_mb_s": metric(megabytes / statistics.median(samples["plain"]), "MB/s", "higher"),
+            "record_mb_s": metric(megabytes / statistics.median(samples["record"]), "MB/s", "higher"),
+            "cast_mb_s": metric(megabytes / statistics.median(samples["cast"]), "MB/s", "higher"),
+            "record_overhead_percent": metric(overhead("record"), "%"),
+            "cast_overhead_percent": metric(overhead("cast"), "%"),
+        }
+
+    def idle_cpu(self):
+        '''CPU процесса, пока команда на сервере ничего не выводит, в сравнении с простоем без сессии.'''
+        stdin_reader, stdin_writer = os.pipe()
+        client = self.create_client(stdin=os.fdopen(stdin_reader, "rb", buffering=0))
+        try:
+            client.initialize()
+            wall, cpu = time.perf_counter(), time.process_time()
+            time.sleep(self.idle_seconds)
+            baseline = (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.execute(client, "sleep", seconds=self.idle_seconds)
+            session = (time.process_time() - cpu) / (time.perf_counter() - wall) * 100
+        finally:
+            os.close(stdin_writer)
+            client.close()
+        return {
+            "session_cpu_percent": metric(session, "%"),
+            "baseline_cpu_percent": metric(baseline, "%"),
+        }
+
+    def input_latency(self):
+        '''Время от ввода до его эха в выводе: одно нажатие и вставка PASTE_SIZE байт, плюс разбор вставки KeyDecoder.'''
+        stdin_reader, stdin_writer = os.pipe()
+        sink = Sink()
+        client = self.create_client(sink, stdin=os.fdopen(stdin_reader, "rb", buffering=0))
+        command, prompt = self.command("sleep", seconds=3600)
+        sink.expect(b"sleep 3600")
+        session = threading.Thread(target=client.execute_command, args=(command, prompt), daemon=True)
+        session.start()
+
+        def echo_time(data, marker):
+            sink.expect(marker)
+            started = time.perf_counter()
+            os.write(stdin_writer, data)
+            if not sink.seen.wait(ECHO_TIMEOUT):
+                raise RuntimeError(f"input_latency: эхо {marker!r} не получено")
+            return sink.seen_at - started
+
+        try:
+            if not sink.seen.wait(ECHO_TIMEOUT):
+                raise RuntimeError("input_latency: сессия не началась")
+            keys = [echo_time(marker, marker) for marker in (f"k{index:03d}".encode() for index in range(self.repeat * 4))]
+            paste = []
+            for index in range(self.repeat):
+                marker = f"<paste{index}>".encode()
+                paste.append(echo_time(b"x" * (PASTE_SIZE - len(marker)) + marker, marker))
+            # Ctrl+C прерывает sleep, shell печатает prompt, и сессия завершается
+            os.write(stdin_writer, b"\x03")
+            session.join(ECHO_TIMEOUT)
+        finally:
+            os.close(stdin_writer)
+            client.close()
+
+        decoder = KeyDecoder()
+        data = PASTE_START + b"x" * DECODE_SIZE + PASTE_END
+        decode = min(
+            timed(lambda: [decoder.feed(data[offset:offset + 4096]) for offset in range(0, len(data), 4096)])
+            for _ in range(self.repeat)
+        )
+        return {
+            "echo_ms": metric(median_ms(keys), "ms"),
+            "paste_ms": metric(median_ms(paste), "ms"),
+            "decode_mb_s": metric(DECODE_SIZE / 1024 / 1024 / decode, "MB/s", "higher"),
+        }
+
+    def fan_out(self):
+        '''Команда на всех стендах через FanOut (как main.py run) с разным числом потоков.'''
+        client = self.create_client()
+        results = {}
+        try:
+            client.initialize()
+            for workers in FAN_OUT_WORKERS:
+                fan_out = FanOut(client, self.commands, max_workers=workers, output=Sink())
+                samples = []
+                for _ in range(max(1, self.repeat // 2)):
+                    started = time.perf_counter()
+                    statuses = fan_out.run("status", STANDS)
+                    samples.append(time.perf_counter() - started)
+                    if any(exit_status != 0 for _, exit_status, _ in statuses):
+                        raise RuntimeError(f"fan_out: команда завершилась с ошибкой: {statuses}")
+                results[workers] = statistics.median(samples)
+        finally:
+            client.close()
+        metrics = {f"workers_{workers}_s": metric(elapsed, "s") for workers, elapsed in results.items()}
+        metrics["speedup"] = metric(results[FAN_OUT_WORKERS[0]] / results[FAN_OUT_WORKERS[-1]], "x", "higher")
+        return metrics
+
+    def async_sessions(self):
+        '''Одновременные команды через AsyncSessionEngine.'''
+        command = f"sleep {COMMAND_DELAY} && echo ok"
+        engine = AsyncSessionEngine(self.server.hostname, self.server.port, USERNAME, PASSWORD, max_sessions=max(ASYNC_SESSIONS))
+
+        async def measure():
+            await engine.connect()
+            results = {}
+            for sessions in ASYNC_SESSIONS:
+                started = time.perf_counter()
+                outputs = await asyncio.gather(*(engine.run(command) for _ in range(sessions)))
+                results[sessions] = time.perf_counter() - started
+                if any(exit_status != 0 for exit_status, _, _ in outputs):
+                    raise RuntimeError("async_sessions: команда завершилась с ошибкой")
+            return results
+
+        try:
+            results = asyncio.run(measure())
+        finally:
+            engine.close()
+        return {f"sessions_{sessions}_s": metric(elapsed, "s") for sessions, elapsed in results.items()}
+
+    def cache(self):
+        '''Кэшируемая команда через CLI.exec_command: первый запуск (промах) и ответ из кэша.'''
+        client = self.create_client()
+        self.cli.ssh_client = client
+        self.cli.result_cache = ResultCache(os.path.join(self.work_dir, "cache"))
+        self.cli.result_cache.clear()
+        command = self.commands[self.stand]["cached logs"]
+        sink = Sink()
+        try:
+            client.initialize()
+            with redirect_stdout(sink):
+                miss = timed(lambda: self.cli.exec_command(self.stand, "cached logs", command))
+                hits = [timed(lambda: self.cli.exec_command(self.stand, "cached logs", command)) for _ in range(self.repeat)]
+        finally:
+            client.close()
+            self.cli.ssh_client = None
+        self.check_output(sink, self.log_size * (1 + len(hits)), "cache")
+        stats = self.cli.result_cache.stats
+        if stats["hits"] != len(hits) or stats["misses"] != 1:
+            raise RuntimeError(f"cache: неожиданные счетчики кэша {stats}")
+        return {
+            "miss_ms": metric(miss * 1000, "ms"),
+            "hit_ms": metric(median_ms(hits), "ms"),
+        }
+
+    def sftp(self):
+        '''Скачивание лога стенда по SFTP одним и несколькими каналами.'''
+        results = {}
+        for workers in (1, 4):
+            samples = []
+            for attempt in range(max(1, self.repeat // 2)):
+                client = self.create_client()
+                local_dir = os.path.join(self.work_dir, f"download-{workers}-{attempt}")
+                try:
+                    downloader = SFTPDownloader(client, workers=workers, output=Sink())
+                    stats = downloader.download(LOGS_DIR, local_dir, f"celery_{self.stand}.log")
+                finally:
+                    client.close()
+                if stats["written"] != os.path.getsize(os.path.join(self.server.home, LOGS_DIR, f"celery_{self.stand}.log")):
+                    raise RuntimeError(f"sftp: файл скачан не полностью: {stats}")
+                samples.append(stats["elapsed"])
+            results[workers] = statistics.median(samples)
+        megabytes = self.log_size / 1024 / 1024
+        return {f"workers_{workers}_mb_s": metric(megabytes / elapsed, "MB/s", "higher") for workers, elapsed in results.items()}
+
+    def control_master(self):
+        '''Подключение через брокер соединений: первый запуск (брокер подключается к серверу) и повторные.'''
+        if not control_master.is_supported():
+            print("    брокер соединений не поддерживается на этой платформе", flush=True)
+            return {}
+        control_path = os.path.join(self.work_dir, "broker.sock")
+        broker = control_master.ControlMaster(control_path, host_key_file=os.path.join(self.work_dir, "broker_host_key"))
+        # Брокер работает в процессе бенчмарка: его журнал локальных соединений не нужен в выводе
+        logging.getLogger(control_master.TRANSPORT_LOGGER).disabled = True
+        thread = threading.Thread(target=broker.serve, name="bench-broker", daemon=True)
+        thread.start()
+        # Ключ брокера создается при запуске, он не входит в подключение клиента
+        while not control_master.is_running(control_path):
+            if not thread.is_alive():
+                raise RuntimeError("control_master: брокер не запустился")
+            time.sleep(0.01)
+
+        def session(commands=0):
+            '''Подключается через брокер, как новый запуск программы, и выполняет commands команд.'''
+            pool = ConnectionPool(control_path=control_path)
+            try:
+                started = time.perf_counter()
+                client = pool.get_client(self.server.hostname, self.server.port, USERNAME, PASSWORD)
+                connected = time.perf_counter()
+                for _ in range(commands):
+                    _, stdout, _ = client.exec_command(self.command("echo")[0])
+                    stdout.read()
+                return connected - started, (time.perf_counter() - connected) / max(commands, 1)
+            finally:
+                pool.close()
+
+        try:
+            first, _ = session()
+            second = [session()[0] for _ in range(self.repeat)]
+            exec_samples = [session(self.repeat * 4)[1] for _ in range(self.repeat)]
+        finally:
+            broker.stop()
+            thread.join()
+        return {
+            "first_connect_ms": metric(first * 1000, "ms"),
+            "second_connect_ms": metric(median_ms(second), "ms"),
+            "exec_ms": metric(median_ms(exec_samples), "ms"),
+        }
+
+    def command_search(self):
+        '''Поиск по 10 тысячам команд: построение индекса, поиск по началу, подстроке, с опечатками и дополнение по Tab.'''
+        names = [f"{verb} {service} {name}" for verb in SEARCH_VERBS for service in SEARCH_SERVICES for name in SEARCH_OBJECTS]
+        history = CommandHistory(os.path.join(self.work_dir, "history.json"))
+        for name in names[::len(names) // SEARCH_HISTORY]:
+            history.record("command", name)
+        started = time.perf_counter()
+        index = CommandIndex(names, history, "command")
+        results = {"build_ms": metric((time.perf_counter() - started) * 1000, "ms")}
+        for kind, query in SEARCH_QUERIES.items():
+            if not index.search(query):
+                raise RuntimeError(f"command_search: ничего не найдено по запросу '{query}'")
+            samples = [timed(lambda: index.search(query)) for _ in range(self.repeat * 20)]
+            results[f"{kind}_ms"] = metric(median_ms(samples), "ms")
+        samples = [timed(lambda: index.complete("restart c")) for _ in range(self.repeat * 20)]
+        results["complete_ms"] = metric(median_ms(samples), "ms")
+        return results
+
+    def render(self):
+        '''Скорость отрисовки лога стенда (строк в секунду) как есть и через фильтры вывода, без сети.'''
+        with open(os.path.join(self.server.home, LOGS_DIR, f"celery_{self.stand}.log"), "rb") as file:
+            data = file.read()
+        chunks = [data[offset:offset + RECV_BUFFER_SIZE] for offset in range(0, len(data), RECV_BUFFER_SIZE)]
+        lines = data.count(b"\n")
+        streams = {
+            "raw": lambda sink: OutputStream(sink, min_flush_interval=FRAME_INTERVAL),
+            PLAIN_VIEW: lambda sink: OutputFilter(sink, PLAIN_VIEW, min_flush_interval=FRAME_INTERVAL),
+            HIGHLIGHT_VIEW: lambda sink: OutputFilter(sink, HIGHLIGHT_VIEW, min_flush_interval=FRAME_INTERVAL),
+            VIEWPORT_VIEW: lambda sink: OutputFilter(sink, VIEWPORT_VIEW, RENDER_HEIGHT, min_flush_interval=FRAME_INTERVAL),
+        }
+
+        def render(create, sink):
+            '''Выводит чанки лога так же, как execute_command: запись и сброс не чаще кадра.'''
+            stream = create(sink)
+            for chunk in chunks:
+                stream.write(chunk)
+                stream.paced_flush()
+            stream.close()
+
+        results = {}
+        for view, create in streams.items():
+            sink = Sink()
+            samples = [timed(lambda: render(create, sink)) for _ in range(self.repeat)]
+            results[f"{view}_lines_s"] = metric(lines / statistics.median(samples), "lines/s", "higher")
+            results[f"{view}_written_percent"] = metric(sink.bytes / self.repeat / len(data) * 100, "%")
+        return results
+
+    def startup(self):
+        '''Запуск программы до разбора аргументов: импорты модулей и интерпретатор (python main.py --help).'''
+        command = [sys.executable, os.path.join(APP_DIR, "main.py"), "--help"]
+        samples = []
+        for _ in range(self.repeat):
+            samples.append(timed(lambda: subprocess.run(command, cwd=APP_DIR, stdout=subprocess.DEVNULL, check=True)))
+        return {"startup_ms": metric(median_ms(samples), "ms")}
+
+    def run(self, names):
+        '''Выполняет бенчмарки names по порядку и возвращает {бенчмарк: метрики}.'''
+        results = {}
+        for name in names:
+            print(f"{name}...", flush=True)
+            results[name] = getattr(self, name)()
+            for key, value in results[name].items():
+                print(f"    {key:<24} {value['value']:>12.3f} {value['unit']}", flush=True)
+        return results
+
+
+def compare(results, baseline, threshold):
+    '''
+    Сравнивает результаты с базовым запуском и печатает таблицу изменений.
+
+    :return: Список регрессий (бенчмарк, метрика, изменение в долях).
+    '''
+    regressions = []
+    print(f"\n{'Метрика':<40} {'База':>12} {'Сейчас':>12} {'Изменение':>10}")
+    for name, metrics in results.items():
+        for key, current in metrics.items():
+            previous = baseline.get("results", {}).get(name, {}).get(key)
+            if previous is None:
+                continue
+            base, value = previous["value"], current["value"]
+            change = (value - base) / abs(base) if base else 0.0
+            worse = change > threshold if current["better"] == "lower" else change < -threshold
+            mark = "  регрессия" if worse else ""
+            print(f"{name + '.' + key:<40} {base:>12.3f} {value:>12.3f} {change * 100:>+9.1f}%{mark}")
+            if worse:
+                regressions.append((name, key, change))
+    return regressions
+
+
+def load_baseline(path):
+    '''Загружает базовый запуск; "latest" - последний сохраненный запуск в RESULTS_DIR.'''
+    if path == "latest":
+        saved = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+        if not saved:
+            return None, None
+        path = saved[-1]
+    with open(path, "r", encoding="utf-8") as file:
+        return path, json.load(file)
+
+
+def git_commit():
+    '''Возвращает хэш текущего коммита или None вне git.'''
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарки SSHClient/CLI против локального стенда-заглушки.")
+    parser.add_argument("--only", help="бенчмарки через запятую: " + ", ".join(BenchmarkSuite.NAMES))
+    parser.add_argument("--quick", action="store_true", help="меньше повторов и лог поменьше (для быстрой проверки)")
+    parser.add_argument("--repeat", type=int, help=f"сколько раз повторять измерения (по умолчанию {DEFAULT_REPEAT})")
+    parser.add_argument("--log-size", type=int, help="размер лога стенда в МБ")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка канала в одну сторону, мс")
+    parser.add_argument("--bandwidth", type=float, help="полоса канала, МБ/с")
+    parser.add_argument("--loss", type=float, default=0.0, help="доля потерянных TCP-сегментов, например 0.01")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="каталог стенда-заглушки (логи переиспользуются)")
+    parser.add_argument("--save", metavar="FILE", help=f"куда сохранить результаты (по умолчанию новый файл в {RESULTS_DIR})")
+    parser.add_argument("--no-save", action="store_true", help="не сохранять результаты")
+    parser.add_argument("--compare", metavar="FILE", help="сравнить с сохраненным запуском ('latest' - с последним)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="изменение, которое считается регрессией (доля)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    names = args.only.split(",") if args.only else list(BenchmarkSuite.NAMES)
+    unknown = [name for name in names if name not in BenchmarkSuite.NAMES]
+    if unknown:
+        print(f"Неизвестные бенчмарки: {', '.join(unknown)}")
+        return 2
+
+    repeat = args.repeat or (QUICK_REPEAT if args.quick else DEFAULT_REPEAT)
+    log_size = args.log_size * 1024 * 1024 if args.log_size else (QUICK_LOG_SIZE if args.quick else DEFAULT_LOG_SIZE)
+    link = {
+        "latency": args.latency / 1000,
+        "bandwidth": args.bandwidth * 1024 * 1024 if args.bandwidth else None,
+        "loss": args.loss,
+    }
+    # Базовый запуск читается до сохранения нового, чтобы "latest" не указывал на текущий
+    baseline_path, baseline = load_baseline(args.compare) if args.compare else (None, None)
+
+    home = os.path.join(args.data_dir, "home")
+    print(f"Подготовка стенда-заглушки в {home}...", flush=True)
+    logs = prepare_home(home, STANDS, log_size)
+    # Размер лога может чуть превышать заданный: измерения считаются по фактическому
+    log_size = os.path.getsize(logs[STANDS[0]])
+
+    with tempfile.TemporaryDirectory(prefix="ssh_console_bench_") as work_dir, StandServer(home, seed=0, **link) as server:
+        suite = BenchmarkSuite(server, work_dir, log_size, repeat, QUICK_IDLE_SECONDS if args.quick else IDLE_SECONDS)
+        results = suite.run(names)
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "paramiko": paramiko.__version__,
+        "platform": platform.platform(),
+        "log_size": log_size,
+        "repeat": repeat,
+        "link": link,
+        "results": results,
+    }
+    if not args.no_save:
+        save_path = args.save or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+        os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+        with open(save_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {save_path}")
+
+    if args.compare:
+        if baseline is None:
+            print("Сохраненных запусков для сравнения нет.")
+            return 0
+        print(f"Сравнение с {baseline_path} (коммит {baseline.get('commit')}):")
+        if baseline.get("link") != link or baseline.get("log_size") != log_size:
+            print("Внимание: канал или размер лога отличаются от базового запуска, сравнение приблизительное.")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)} (порог {args.threshold * 100:.0f}%).")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
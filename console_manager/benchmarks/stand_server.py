@@ -0,0 +1,786 @@
+import os
+import re
+import time
+import queue
+import shlex
+import random
+import socket
+import threading
+import paramiko
+from log_follow import FOLLOW_SCRIPT
+
+# Данные для входа на стенд-заглушку (то же, что username, password и postfix в login_data.yaml)
+USERNAME = "bench"
+PASSWORD = "bench"
+POSTFIX = "stand"
+
+# Размер чанка, которым команды отдают вывод в канал (в байтах)
+SEND_CHUNK_SIZE = 64 * 1024
+
+# Код завершения команды, прерванной Ctrl+C (как в bash)
+INTERRUPTED_STATUS = 130
+
+# Как часто tail -f проверяет, что в файл дописаны данные (в секундах)
+FOLLOW_POLL_INTERVAL = 0.05
+
+# Скрипт слежения LogFollower: заглушка не разбирает переменные и условия bash,
+# поэтому узнает скрипт целиком и выполняет его как одну команду follow_script
+FOLLOW_SCRIPT_PATTERN = re.compile(
+    re.escape(FOLLOW_SCRIPT)
+    .replace(re.escape("{file}"), "(?P<file>.+?)")
+    .replace(re.escape("{offset}"), "(?P<offset>-?[0-9]+)")
+    .replace(re.escape("{lines}"), "(?P<lines>[0-9]+)")
+)
+
+# Каталоги стенда-заглушки относительно домашнего каталога: исходники стендов и логи
+STANDS_DIR = "stands"
+LOGS_DIR = "logs"
+
+# Строка лога celery; каждая WARNING_EVERY-я строка - предупреждение, чтобы grep было что отбирать
+LOG_LINE = "[2024-05-{day:02d} {hour:02d}:{minute:02d}:{second:02d},{ms:03d}: {level}/MainProcess] Task tasks.process_report[{task:08x}] {message}\n"
+WARNING_EVERY = 50
+
+# Параметры TCP для эмуляции канала: размер сегмента и минимальный таймаут повторной передачи (как в Linux)
+SEGMENT_SIZE = 1460
+MIN_RETRANSMIT_TIMEOUT = 0.2
+
+# Сколько чанков эмулятор канала держит в пути; дальше чтение приостанавливается (окно TCP)
+RELAY_QUEUE_SIZE = 64
+RELAY_CHUNK_SIZE = 64 * 1024
+
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def get_host_key():
+    '''Возвращает ключ сервера; генерация RSA-ключа долгая, поэтому ключ один на процесс.'''
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+def write_log(file_path, size, seed=0):
+    '''Создает лог celery размером не меньше size байт из правдоподобных строк.'''
+    rng = random.Random(seed)
+    written = 0
+    index = 0
+    with open(file_path, "w", encoding="utf-8", newline="\n") as file:
+        while written < size:
+            lines = []
+            for _ in range(1000):
+                index += 1
+                warning = index % WARNING_EVERY == 0
+                lines.append(LOG_LINE.format(
+                    day=1 + index // 8640000 % 28, hour=index // 360000 % 24, minute=index // 6000 % 60,
+                    second=index // 100 % 60, ms=index % 1000, level="WARNING" if warning else "INFO",
+                    task=rng.getrandbits(32),
+                    message="retry in 5s: ConnectionError" if warning else f"succeeded in {rng.random():.4f}s: None",
+                ))
+            chunk = "".join(lines)
+            file.write(chunk)
+            written += len(chunk)
+
+
+def prepare_home(home, stands, log_size):
+    '''
+    Готовит домашний каталог стенда-заглушки: каталоги стендов и логи celery.
+    Логи нужного размера переиспользуются между запусками, чтобы не создавать их каждый раз заново.
+
+    :return: Словарь {стенд: путь к логу}.
+    '''
+    logs = {}
+    os.makedirs(os.path.join(home, LOGS_DIR), exist_ok=True)
+    for index, stand in enumerate(stands):
+        os.makedirs(os.path.join(home, STANDS_DIR, stand, "src"), exist_ok=True)
+        log_file = os.path.join(home, LOGS_DIR, f"celery_{stand}.log")
+        if not os.path.exists(log_file) or not log_size <= os.path.getsize(log_file) < log_size + SEND_CHUNK_SIZE:
+            write_log(log_file, log_size, seed=index)
+        logs[stand] = log_file
+    return logs
+
+
+'''Process: состояние одной команды конвейера. Код завершения выставляется, когда команда дочитана.'''
+class Process:
+    def __init__(self):
+        self.status = 0
+
+
+'''StandShell: интерпретатор небольшого подмножества bash, которым отвечает стенд-заглушка.
+Понимает последовательности через &&, || и ;, конвейеры через | и команды cd, cat, echo,
+sleep, head, tail, wc, grep, true, false и exit, а также скрипт слежения LogFollower.
+Пути с ~ отсчитываются от домашнего каталога сервера.
+Команды - генераторы, поэтому вывод уходит в канал по мере чтения файла, а не целиком.'''
+class StandShell:
+    def __init__(self, home, stdout, stderr):
+        self.home = home
+        self.cwd = home
+        self.stdout = stdout
+        self.stderr = stderr
+        self.interrupted = threading.Event()
+        self.running = False
+        self.exited = False
+        self.status = 0
+        self.commands = {
+            "cd": self.cd, "cat": self.cat, "echo": self.echo, "sleep": self.sleep, "head": self.head,
+            "grep": self.grep, "true": self.true, "false": self.false, "exit": self.exit,
+            "tail": self.tail, "wc": self.wc, "follow_script": self.follow_script,
+        }
+
+    def display_path(self):
+        '''Возвращает текущий каталог так, как его показывает \\w в PS1 (с ~ вместо домашнего каталога).'''
+        if self.cwd == self.home:
+            return "~"
+        relative = os.path.relpath(self.cwd, self.home)
+        if relative.startswith(".."):
+            return self.cwd
+        return "~/" + relative.replace(os.sep, "/")
+
+    def prompt(self, username, postfix):
+        '''Возвращает prompt в формате PS1 "\\u@postfix:\\w$ ".'''
+        return f"{username}@{postfix}:{self.display_path()}$ "
+
+    def resolve(self, path):
+        '''Переводит путь команды в путь на диске.'''
+        if path == "~" or path.startswith("~/"):
+            path = os.path.join(self.home, path[2:])
+        return os.path.normpath(os.path.join(self.cwd, path))
+
+    def interrupt(self):
+        '''Прерывает выполняющуюся команду (Ctrl+C).'''
+        self.interrupted.set()
+
+    @staticmethod
+    def parse(command_line):
+        '''Разбирает строку на [(конвейер, оператор после него)], где конвейер - список argv.'''
+        lexer = shlex.shlex(command_line, posix=True, punctuation_chars=";&|")
+        lexer.whitespace_split = True
+        pipelines = []
+        stages = [[]]
+        for token in lexer:
+            if token == "|":
+                stages.append([])
+            elif token in ("&&", "||", ";"):
+                pipelines.append((stages, token))
+                stages = [[]]
+            else:
+                stages[-1].append(token)
+        if stages[0]:
+            pipelines.append((stages, None))
+        return pipelines
+
+    def run(self, command_line):
+        '''Выполняет строку команд и возвращает код завершения последней выполненной команды.'''
+        follow = FOLLOW_SCRIPT_PATTERN.fullmatch(command_line)
+        try:
+            if follow:
+                pipelines = [([["follow_script", *shlex.split(follow["file"]), follow["offset"], follow["lines"]]], None)]
+            else:
+                pipelines = self.parse(command_line)
+        except ValueError as e:
+            self.stderr(f"bash: {e}\n".encode())
+            return 2
+
+        self.running = True
+        try:
+            operator = None
+            for stages, next_operator in pipelines:
+                skip = (operator == "&&" and self.status != 0) or (operator == "||" and self.status == 0)
+                if not skip:
+                    self.status = self.run_pipeline(stages)
+                operator = next_operator
+                if self.interrupted.is_set():
+                    self.status = INTERRUPTED_STATUS
+                    break
+                if self.exited:
+                    break
+        finally:
+            self.running = False
+            self.interrupted.clear()
+        return self.status
+
+    def run_pipeline(self, stages):
+        '''Выполняет конвейер команд и отправляет вывод последней из них.'''
+        data = iter(())
+        process = Process()
+        for argv in stages:
+            process = Process()
+            handler = self.commands.get(argv[0]) if argv else None
+            if handler is None:
+                self.stderr(f"bash: {argv[0] if argv else ''}: command not found\n".encode())
+                process.status = 127
+                data = iter(())
+                continue
+            data = handler(argv[1:], data, process)
+        for chunk in data:
+            self.stdout(chunk)
+        return process.status
+
+    @staticmethod
+    def lines(data):
+        '''Разбивает поток чанков на строки с \\n на конце (последняя строка может быть без него).'''
+        pending = b""
+        for chunk in data:
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                yield line + b"\n"
+        if pending:
+            yield pending
+
+    @staticmethod
+    def batches(lines):
+        '''Собирает строки в чанки по SEND_CHUNK_SIZE, чтобы не отправлять каждую строку отдельным пакетом.'''
+        batch = []
+        size = 0
+        for line in lines:
+            batch.append(line)
+            size += len(line)
+            if size >= SEND_CHUNK_SIZE:
+                yield b"".join(batch)
+                batch, size = [], 0
+        if batch:
+            yield b"".join(batch)
+
+    def cd(self, args, data, process):
+        path = self.resolve(args[0] if args else "~")
+        if os.path.isdir(path):
+            self.cwd = path
+        else:
+            self.stderr(f"bash: cd: {args[0]}: No such file or directory\n".encode())
+            process.status = 1
+        yield from ()
+
+    def cat(self, args, data, process):
+        if not args:
+            yield from data
+            return
+        for name in args:
+            try:
+                file = open(self.resolve(name), "rb")
+            except OSError:
+                self.stderr(f"cat: {name}: No such file or directory\n".encode())
+                process.status = 1
+                continue
+            with file:
+                while not self.interrupted.is_set():
+                    chunk = file.read(SEND_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            if self.interrupted.is_set():
+                process.status = INTERRUPTED_STATUS
+                return
+
+    def echo(self, args, data, process):
+        newline = not (args and args[0] == "-n")
+        text = " ".join(args[0 if newline else 1:])
+        yield (text + ("\n" if newline else "")).encode()
+
+    def sleep(self, args, data, process):
+        try:
+            seconds = float(args[0])
+        except (IndexError, ValueError):
+            self.stderr(b"sleep: invalid time interval\n")
+            process.status = 1
+            return
+        if self.interrupted.wait(seconds):
+            process.status = INTERRUPTED_STATUS
+        yield from ()
+
+    def head(self, args, data, process):
+        count, by_bytes = 10, False
+        if args and args[0] in ("-c", "-n") and len(args) > 1:
+            by_bytes, count = args[0] == "-c", int(args[1])
+        elif args and args[0][1:].isdigit():
+            count = int(args[0][1:])
+        if by_bytes:
+            for chunk in data:
+                if count <= 0:
+                    return
+                yield chunk[:count]
+                count -= len(chunk)
+            return
+        for line in self.lines(data):
+            if count <= 0:
+                return
+            yield line
+            count -= 1
+
+    def tail(self, args, data, process):
+        '''tail -n N [файл], tail -c +N [файл] и -f (слежение за дописанными в файл данными).'''
+        follow = "-f" in args
+        args = [arg for arg in args if arg != "-f"]
+        count, start = 10, None
+        if len(args) > 1 and args[0] == "-n":
+            count, args = int(args[1]), args[2:]
+        elif len(args) > 1 and args[0] == "-c" and args[1].startswith("+"):
+            start, args = int(args[1][1:]) - 1, args[2:]
+        if not args:
+            lines = list(self.lines(data))
+            yield from lines[len(lines) - count:] if start is None else [b"".join(lines)[start:]]
+            return
+        path = self.resolve(args[0])
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            self.stderr(f"tail: cannot open '{args[0]}' for reading: No such file or directory\n".encode())
+            process.status = 1
+            return
+        position = max(0, start) if start is not None else self.tail_offset(path, size, count)
+        yield from self.read_from(path, position, follow, process)
+
+    @staticmethod
+    def tail_offset(path, size, count):
+        '''Возвращает смещение, с которого начинаются последние count строк файла.'''
+        with open(path, "rb") as file:
+            data = file.read(size)
+        position = len(data) - 1 if data.endswith(b"\n") else len(data)
+        for _ in range(count):
+            position = data.rfind(b"\n", 0, position)
+            if position == -1:
+                return 0
+        return position + 1
+
+    def read_from(self, path, position, follow, process):
+        '''
+        Отдает файл с position; с follow ждет дописанных данных, пока команду не прервут.
+        Если файл стал меньше прочитанного (ротация), чтение начинается с начала, как у tail -f.
+        '''
+        with open(path, "rb") as file:
+            file.seek(position)
+            while not self.interrupted.is_set():
+                chunk = file.read(SEND_CHUNK_SIZE)
+                if chunk:
+                    position += len(chunk)
+                    yield chunk
+                    continue
+                if not follow:
+                    return
+                if os.path.getsize(path) < position:
+                    position = 0
+                    file.seek(0)
+                self.interrupted.wait(FOLLOW_POLL_INTERVAL)
+        process.status = INTERRUPTED_STATUS
+
+    def wc(self, args, data, process):
+        '''wc -c [файл]: размер в байтах.'''
+        names = [arg for arg in args if not arg.startswith("-")]
+        if names:
+            try:
+                yield f"{os.path.getsize(self.resolve(names[0]))} {names[0]}\n".encode()
+            except OSError:
+                self.stderr(f"wc: {names[0]}: No such file or directory\n".encode())
+                process.status = 1
+            return
+        yield f"{sum(len(chunk) for chunk in data)}\n".encode()
+
+    def follow_script(self, args, data, process):
+        '''Выполняет FOLLOW_SCRIPT: первая строка - смещение, дальше tail -c +N -f с этого смещения.'''
+        name, offset, count = args[0], int(args[1]), int(args[2])
+        path = self.resolve(name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            self.stderr(f"bash: {name}: No such file or directory\n".encode())
+            process.status = 1
+            return
+        if offset < 0:
+            offset = self.tail_offset(path, size, count)
+        if size < offset:
+            offset = 0
+        yield f"{offset}\n".encode()
+        yield from self.read_from(path, offset, True, process)
+
+    def grep(self, args, data, process):
+        flags = "".join(arg[1:] for arg in args if arg.startswith("-") and len(arg) > 1)
+        patterns = [arg for arg in args if not (arg.startswith("-") and len(arg) > 1)]
+        if not patterns:
+            self.stderr(b"Usage: grep [OPTION]... PATTERNS [FILE]...\n")
+            process.status = 2
+            return
+        pattern = re.escape(patterns[0]) if "F" in flags else patterns[0]
+        if "w" in flags:
+            pattern = rf"\b(?:{pattern})\b"
+        regex = re.compile(pattern.encode(), re.IGNORECASE if "i" in flags else 0)
+        invert = "v" in flags
+        found = False
+        for batch in self.batches(line for line in self.lines(data) if bool(regex.search(line)) != invert):
+            found = True
+            yield batch
+        process.status = 0 if found else 1
+
+    def true(self, args, data, process):
+        yield from ()
+
+    def false(self, args, data, process):
+        process.status = 1
+        yield from ()
+
+    def exit(self, args, data, process):
+        self.exited = True
+        process.status = int(args[0]) if args and args[0].isdigit() else self.status
+        yield from ()
+
+
+'''StandSFTPHandle: открытый на чтение файл SFTP-сервера стенда-заглушки.'''
+class StandSFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+'''StandSFTP: SFTP-сервер стенда-заглушки только для чтения. Относительные пути
+отсчитываются от домашнего каталога, как на настоящем сервере.'''
+class StandSFTP(paramiko.SFTPServerInterface):
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.home = server.stand.home
+
+    def resolve(self, path):
+        return os.path.normpath(os.path.join(self.home, path))
+
+    def list_folder(self, path):
+        try:
+            folder = self.resolve(path)
+            entries = []
+            for name in os.listdir(folder):
+                attr = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(folder, name)))
+                attr.filename = name
+                entries.append(attr)
+            return entries
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.resolve(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return paramiko.SFTP_PERMISSION_DENIED
+        try:
+            handle = StandSFTPHandle(flags)
+            handle.readfile = open(self.resolve(path), "rb")
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        handle.filename = path
+        return handle
+
+    def canonicalize(self, path):
+        return self.resolve(path)
+
+
+'''StandServerInterface: обработчик запросов одного SSH-соединения со стендом-заглушкой.'''
+class StandServerInterface(paramiko.ServerInterface):
+    def __init__(self, stand):
+        self.stand = stand
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self.stand.username, self.stand.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_window_change_request(self, channel, width, height, pixelwidth, pixelheight):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=self.stand.run_shell, args=(channel,), name="stand-shell", daemon=True).start()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode("utf-8", errors="replace")
+        threading.Thread(target=self.stand.run_exec, args=(channel, command), name="stand-exec", daemon=True).start()
+        return True
+
+
+'''StandServer: локальный SSH-сервер в том же процессе, который изображает стенд для бенчмарков.
+Shell отвечает prompt вида "username@postfix:~/путь$ " (как ждет CLI.get_prompt_from_path),
+повторяет ввод как терминал (echo) и понимает Ctrl+C, exec-каналы выполняют те же команды,
+а SFTP отдает файлы домашнего каталога. Если задана задержка, полоса или потери,
+соединения идут через LinkEmulator, и port указывает на него.'''
+class StandServer:
+    def __init__(self, home, username=USERNAME, password=PASSWORD, postfix=POSTFIX, latency=0.0, bandwidth=None, loss=0.0, seed=None):
+        self.home = os.path.abspath(home)
+        self.username = username
+        self.password = password
+        self.postfix = postfix
+        self.link = LinkEmulator(latency, bandwidth, loss, seed) if latency or bandwidth or loss else None
+        self.hostname = "127.0.0.1"
+        self.port = None
+        self.listener = None
+        self.transports = []
+        self.shells = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        '''Начинает принимать соединения на свободном порту.'''
+        self.listener = socket.create_server((self.hostname, 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.accept_loop, name="stand-accept", daemon=True).start()
+        if self.link:
+            self.port = self.link.start(self.hostname, self.port)
+        return self
+
+    def stop(self):
+        '''Прерывает команды, закрывает соединения и перестает принимать новые.'''
+        if self.link:
+            self.link.stop()
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+        self.drop_connections()
+
+    def drop_connections(self):
+        '''
+        Обрывает все соединения, продолжая принимать новые, как при обрыве сети.
+        Сначала закрываются соединения, а потом прерываются команды: так клиент не получает код завершения.
+        '''
+        with self.lock:
+            for transport in self.transports:
+                transport.close()
+            self.transports = []
+            for shell in self.shells:
+                shell.interrupt()
+
+    def interrupt_commands(self):
+        '''Прерывает выполняющиеся команды (как Ctrl+C); они завершаются с кодом INTERRUPTED_STATUS.'''
+        with self.lock:
+            for shell in self.shells:
+                shell.interrupt()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def accept_loop(self):
+        listener = self.listener
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            # Как sshd для интерактивных сессий: echo, вывод и prompt не ждут подтверждения предыдущего пакета
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(connection)
+            transport.add_server_key(get_host_key())
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, StandSFTP)
+            with self.lock:
+                self.transports = [item for item in self.transports if item.is_active()]
+                self.transports.append(transport)
+            try:
+                transport.start_server(server=StandServerInterface(self))
+            except (paramiko.SSHException, EOFError, OSError):
+                transport.close()
+
+    def register(self, shell):
+        with self.lock:
+            self.shells.append(shell)
+
+    def unregister(self, shell):
+        with self.lock:
+            self.shells.remove(shell)
+
+    def run_exec(self, channel, command):
+        '''
+        Выполняет команду exec-канала; stdout и stderr идут раздельно, как без PTY.
+        Канал завершается как в OpenSSH: EOF и код завершения, а закрывает его клиент.
+        Закрыть канал самому нельзя: быстрая команда успела бы закрыть его раньше, чем paramiko
+        ответит на запрос exec, и клиент получил бы "Channel closed".
+        '''
+        shell = StandShell(self.home, channel.sendall, channel.sendall_stderr)
+        self.register(shell)
+        try:
+            status = shell.run(command)
+            channel.shutdown_write()
+            channel.send_exit_status(status)
+        except (OSError, EOFError, paramiko.SSHException):
+            # Клиент закрыл канал, не дождавшись конца вывода
+            channel.close()
+        finally:
+            self.unregister(shell)
+
+    def run_shell(self, channel):
+        '''
+        Ведет интерактивный shell. Ввод повторяется в канал сразу (как echo терминала),
+        а строки выполняются по очереди в отдельном потоке, чтобы ввод не ждал команду.
+        '''
+        shell = StandShell(self.home, channel.sendall, channel.sendall)
+        self.register(shell)
+        lines = queue.Queue()
+
+        def execute():
+            try:
+                channel.sendall(shell.prompt(self.username, self.postfix).encode())
+                while True:
+                    line = lines.get()
+                    if line is None:
+                        break
+                    shell.run(line)
+                    if shell.exited:
+                        break
+                    channel.sendall(shell.prompt(self.username, self.postfix).encode())
+                channel.send_exit_status(shell.status)
+            except (OSError, EOFError, paramiko.SSHException):
+                pass
+            finally:
+                channel.close()
+
+        executor = threading.Thread(target=execute, name="stand-shell-exec", daemon=True)
+        executor.start()
+        line = bytearray()
+        try:
+            while executor.is_alive():
+                data = channel.recv(SEND_CHUNK_SIZE)
+                if not data:
+                    break
+                echo = bytearray()
+                for part in re.split(rb"(\r\n|\r|\n|\x03)", data):
+                    if part in (b"\r\n", b"\r", b"\n"):
+                        lines.put(line.decode("utf-8", errors="replace"))
+                        line.clear()
+                        echo += b"\r\n"
+                    elif part == b"\x03":
+                        # Ctrl+C: строка ввода и очередь сбрасываются; без команды shell просто печатает новый prompt
+                        line.clear()
+                        while not lines.empty():
+                            lines.get_nowait()
+                        echo += b"^C\r\n"
+                        if shell.running:
+                            shell.interrupt()
+                        else:
+                            lines.put("")
+                    else:
+                        line += part
+                        echo += part
+                channel.sendall(bytes(echo))
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            shell.interrupt()
+            lines.put(None)
+            self.unregister(shell)
+
+
+'''LinkEmulator: TCP-прокси, который изображает медленный канал до стенда.
+Каждый чанк доставляется не раньше чем через latency секунд (задержка в одну сторону),
+полоса bandwidth (байт/с) задает время передачи, а при потере сегмента (вероятность loss)
+чанк и все следующие за ним ждут таймаут повторной передачи, как в TCP.'''
+class LinkEmulator:
+    def __init__(self, latency=0.0, bandwidth=None, loss=0.0, seed=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.retransmit_timeout = max(MIN_RETRANSMIT_TIMEOUT, 4 * latency)
+        self.listener = None
+        self.sockets = []
+        self.lock = threading.Lock()
+        self.stats = {"bytes": 0, "lost_segments": 0}
+
+    def start(self, hostname, target_port):
+        '''Начинает принимать соединения и возвращает порт, через который нужно подключаться.'''
+        self.listener = socket.create_server((hostname, 0))
+        threading.Thread(target=self.accept_loop, args=(hostname, target_port), name="link-accept", daemon=True).start()
+        return self.listener.getsockname()[1]
+
+    def stop(self):
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+        with self.lock:
+            for sock in self.sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+            self.sockets = []
+
+    def accept_loop(self, hostname, target_port):
+        listener = self.listener
+        while True:
+            try:
+                client, _ = listener.accept()
+            except OSError:
+                return
+            try:
+                upstream = socket.create_connection((hostname, target_port))
+            except OSError:
+                client.close()
+                continue
+            for sock in (client, upstream):
+                # Прокси не должен добавлять собственную задержку Nagle
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.sockets += [client, upstream]
+            self.relay(client, upstream)
+            self.relay(upstream, client)
+
+    def delivery_time(self, size, received, state):
+        '''Возвращает момент доставки чанка с учетом полосы, задержки и потерь; порядок чанков сохраняется.'''
+        sent = received
+        if self.bandwidth:
+            sent = max(received, state["sent"]) + size / self.bandwidth
+            state["sent"] = sent
+        delivery = sent + self.latency
+        if self.loss:
+            segments = -(-size // SEGMENT_SIZE)
+            if self.random.random() < 1 - (1 - self.loss) ** segments:
+                delivery += self.retransmit_timeout
+                with self.lock:
+                    self.stats["lost_segments"] += 1
+        delivery = max(delivery, state["delivery"])
+        state["delivery"] = delivery
+        return delivery
+
+    def relay(self, source, target):
+        '''Запускает пересылку одного направления: чтение и доставка идут в разных потоках.'''
+        in_flight = queue.Queue(RELAY_QUEUE_SIZE)
+        state = {"sent": 0.0, "delivery": 0.0}
+
+        def read():
+            try:
+                while True:
+                    data = source.recv(RELAY_CHUNK_SIZE)
+                    if not data:
+                        break
+                    in_flight.put((self.delivery_time(len(data), time.monotonic(), state), data))
+            except OSError:
+                pass
+            in_flight.put((None, None))
+
+        def deliver():
+            try:
+                while True:
+                    delivery, data = in_flight.get()
+                    if data is None:
+                        target.shutdown(socket.SHUT_WR)
+                        return
+                    delay = delivery - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    target.sendall(data)
+                    with self.lock:
+                        self.stats["bytes"] += len(data)
+            except OSError:
+                pass
+
+        threading.Thread(target=read, name="link-read", daemon=True).start()
+        threading.Thread(target=deliver, name="link-deliver", daemon=True).start()
@@ -0,0 +1,107 @@
+import time
+import paramiko
+from control_master import parse_broker_username, PENDING_CHANNEL_TIMEOUT
+
+
+'''BrokerSession: обработчик одного локального клиента брокера (одного запущенного экземпляра программы).
+Каждый канал клиента открывается как канал в соединении брокера с сервером, запросы PTY,
+shell, exec, подсистем (SFTP) и изменения размера окна передаются серверу, а данные, stderr,
+EOF и код завершения пересылаются в обе стороны. Канал сервера, для которого команда
+не запустилась (запрос отклонен, клиент закрыл канал или отключился), закрывается.'''
+class BrokerSession(paramiko.ServerInterface):
+    def __init__(self, broker):
+        self.broker = broker
+        self.target = None
+        self.upstream = {}
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        try:
+            target = parse_broker_username(username)
+        except ValueError:
+            return paramiko.AUTH_FAILED
+        try:
+            self.broker.acquire(target, password)
+        except paramiko.AuthenticationException:
+            return paramiko.AUTH_FAILED
+        self.target = target
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind != "session" or self.target is None:
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+        try:
+            self.upstream[chanid] = (self.broker.open_session(self.target), time.monotonic())
+        except (OSError, EOFError, paramiko.SSHException):
+            return paramiko.OPEN_FAILED_CONNECT_FAILED
+        return paramiko.OPEN_SUCCEEDED
+
+    def discard(self, chanid):
+        '''Закрывает канал сервера, для которого команда так и не запустилась.'''
+        # Канал забирает тот, кто первым вынул его из upstream: пересылка или закрытие
+        entry = self.upstream.pop(chanid, None)
+        if entry is None:
+            return
+        try:
+            entry[0].close()
+        finally:
+            self.broker.release(self.target)
+
+    def discard_pending(self, connected):
+        '''
+        Закрывает каналы сервера, которые ждут запуска команды дольше PENDING_CHANNEL_TIMEOUT,
+        или все ждущие каналы, если клиент отключился (connected=False).
+        paramiko не сообщает серверу о закрытии канала клиентом, поэтому брокер проверяет их сам.
+        '''
+        now = time.monotonic()
+        for chanid, (_, opened) in list(self.upstream.items()):
+            if not connected or now - opened > PENDING_CHANNEL_TIMEOUT:
+                self.discard(chanid)
+
+    def forward(self, channel, request):
+        '''Передает запрос канала серверу; при ошибке сервера запрос отклоняется.'''
+        entry = self.upstream.get(channel.chanid)
+        if entry is None:
+            return False
+        try:
+            request(entry[0])
+        except (OSError, EOFError, paramiko.SSHException):
+            # Клиент после отказа закрывает канал, а канал сервера уже не понадобится
+            self.discard(channel.chanid)
+            return False
+        return True
+
+    def start(self, channel, request):
+        '''Передает запрос, который запускает команду, и начинает пересылку данных канала.'''
+        if not self.forward(channel, request):
+            return False
+        entry = self.upstream.pop(channel.chanid, None)
+        if entry is None:
+            # Канал закрыт брокером как брошенный, пока шел запрос
+            return False
+        self.broker.relay(channel, entry[0], self.target)
+        return True
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return self.forward(channel, lambda upstream: upstream.get_pty(term, width, height, pixelwidth, pixelheight))
+
+    def check_channel_window_change_request(self, channel, width, height, pixelwidth, pixelheight):
+        upstream = self.broker.relayed.get(channel)
+        if upstream is None:
+            return self.forward(channel, lambda upstream: upstream.resize_pty(width, height, pixelwidth, pixelheight))
+        try:
+            upstream.resize_pty(width, height, pixelwidth, pixelheight)
+        except (OSError, EOFError, paramiko.SSHException):
+            return False
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return self.start(channel, lambda upstream: upstream.invoke_shell())
+
+    def check_channel_exec_request(self, channel, command):
+        return self.start(channel, lambda upstream: upstream.exec_command(command))
+
+    def check_channel_subsystem_request(self, channel, name):
+        return self.start(channel, lambda upstream: upstream.invoke_subsystem(name))
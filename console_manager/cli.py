@@ -0,0 +1,507 @@
+import re
+import sys
+import shutil
+import threading
+from ssh_client import SSHClient
+from command_loader import CommandLoader, SHELL_MODE, EXEC_MODE, FOLLOW_MODE
+from fan_out import FanOut, DEFAULT_MAX_WORKERS
+from output_stream import OutputStream
+from output_filter import create_output, RAW_VIEW
+from result_cache import ResultCache
+from session_metrics import SessionMetrics
+from log_follow import LogFollower, FollowError, DEFAULT_TAIL_LINES, DEFAULT_MAX_RETRIES
+from sftp_download import SFTPDownloader, DEFAULT_WORKERS as DOWNLOAD_WORKERS
+from playbook import Playbook, PlaybookRunner
+from command_index import CommandIndex, CommandHistory, input_with_completion
+from lazy_import import LazyModule
+from startup_profiler import profiler
+
+paramiko = LazyModule("paramiko")
+yaml = LazyModule("yaml")
+
+# Сколько стендов или команд выводить в меню; остальные находятся поиском и дополнением по Tab
+DISPLAY_LIMIT = 20
+
+'''CLI: главный класс, который управляет пользовательским интерфейсом командной строки. 
+Он отображает категории, команды и управляет SSH-сессиями.'''
+class CLI:
+    def __init__(self, commands, record_path=None, compress_records=False, cast_dir=None, use_cache=True, control_path=None, start_broker=False):
+        self.commands = commands
+        self.ssh_client = None
+        self.record_path = record_path
+        self.compress_records = compress_records
+        self.cast_dir = cast_dir
+        self.use_cache = use_cache
+        self.control_path = control_path
+        self.start_broker = start_broker
+        self.result_cache = None
+        # Метрики всех сессий за запуск программы, по стендам и командам
+        self.metrics = SessionMetrics()
+        self.login = None
+        self.warm_up_thread = None
+        self.warm_up_error = None
+        self.history = CommandHistory()
+        self.stand_index = None
+        self.command_index = None
+        # Варианты, которые показал поиск: следующий ввод может быть их номером
+        self.suggestions = []
+
+    def create_ssh_client(self, hostname, port, username, password):
+        '''Создает SSH-клиент с настройками записи сессий и брокера соединений из параметров CLI.'''
+        return SSHClient(
+            hostname, port, username, password, record_path=self.record_path, compress_records=self.compress_records,
+            cast_dir=self.cast_dir, metrics=self.metrics, control_path=self.control_path, start_broker=self.start_broker,
+        )
+
+    def warm_up(self):
+        '''Загружает данные для входа и подключается к серверу, пока пользователь выбирает команду.'''
+        try:
+            with profiler.phase("подключение (в фоне)"):
+                hostname, port, username, password, postfix = self.load_login_data("login_data.yaml")
+                self.ssh_client = self.create_ssh_client(hostname, port, username, password)
+                self.ssh_client.initialize()
+            self.login = (username, postfix)
+        except BaseException as e:
+            self.warm_up_error = e
+
+    def start_warm_up(self):
+        '''Запускает фоновое подключение.'''
+        self.warm_up_thread = threading.Thread(target=self.warm_up, name="ssh-warm-up", daemon=True)
+        self.warm_up_thread.start()
+
+    def check_warm_up(self):
+        '''Пробрасывает ошибку фонового подключения, если оно уже завершилось неудачно.'''
+        if self.warm_up_error is not None:
+            error, self.warm_up_error = self.warm_up_error, None
+            raise error
+
+    def wait_connection(self):
+        '''Дожидается фонового подключения и возвращает (username, postfix).'''
+        if self.warm_up_thread.is_alive():
+            print("Подключение к серверу...")
+            self.warm_up_thread.join()
+            self.check_warm_up()
+            print("Подключение установлено. Вы можете выполнять команды.")
+        self.check_warm_up()
+        return self.login
+
+    def load_login_data(self, file_path):
+        '''Подгружает данные для подключения к SSH-серверу и возвращает их как кортеж.'''
+
+        # Загружаем данные из YAML файла (путь внутри сборки PyInstaller учитывается в load_yaml)
+        login_data = CommandLoader.load_yaml(file_path)
+
+        return (
+            login_data["hostname"],
+            login_data["port"],
+            login_data["username"],
+            login_data["password"],
+            login_data["postfix"],
+        )
+    
+    def extract_path(self, command):
+        '''Извлекает путь из команды, начиная с ~ и заканчивая перед &&.'''
+        if '~' in command:
+            start_index = command.index('~')
+            if '&&' in command:
+                end_index = command.index('&&')
+                return command[start_index:end_index].strip()
+            else:
+                return command[start_index:].strip()
+        return None
+    
+    def get_prompt_from_path(self, command, username, postfix):
+        """Генерирует prompt на основе команды, используя extract_path."""
+        path = self.extract_path(command)
+        return f"{username}@{postfix}:{path}$" if path else f"{username}@{postfix}:~/default$"
+
+    def get_prompt_pattern_from_path(self, command, username, postfix):
+        """Генерирует регулярное выражение для того же prompt, что и get_prompt_from_path.
+        Между частями prompt допускаются цветовые escape-последовательности (цветной PS1)."""
+        path = self.extract_path(command) or "~/default"
+        color = r"(?:\x1b\[[0-9;]*m)*"
+        parts = [f"{username}@{postfix}", ":", path, "$"]
+        return re.compile(color.join(re.escape(part) for part in parts))
+
+    def command_mode(self, command_name):
+        '''Возвращает режим выполнения команды (shell или exec).'''
+        mode = getattr(self.commands, "mode", None)
+        return mode(command_name) if mode else SHELL_MODE
+
+    def command_view(self, command_name):
+        '''Возвращает режим отображения вывода команды (raw, plain, highlight или viewport).'''
+        view = getattr(self.commands, "view", None)
+        return view(command_name) if view else RAW_VIEW
+
+    def command_cache(self, stand, command_name):
+        '''Возвращает (ttl, файл лога) для кэшируемой команды или None, если вывод команды не кэшируется.'''
+        cache = getattr(self.commands, "cache", None)
+        if not self.use_cache or cache is None:
+            return None
+        return cache(stand, command_name)
+
+    def get_result_cache(self):
+        '''Открывает кэш результатов при первом обращении.'''
+        if self.result_cache is None:
+            self.result_cache = ResultCache()
+        return self.result_cache
+
+    def exec_command(self, stand, command_name, command):
+        '''
+        Выполняет команду в режиме exec, для кэшируемых команд через кэш результатов.
+
+        :return: Код завершения команды или None, если выполнение прервано пользователем.
+        '''
+        view = self.command_view(command_name)
+        cache = self.command_cache(stand, command_name)
+        if cache is None:
+            return self.ssh_client.exec_command(command, view)
+
+        ttl, log_file = cache
+        # Все, что дописано к команде из commands.yaml (например, grep), применяется и к дочитанной части лога
+        suffix = command[len(self.commands[stand][command_name]):]
+        try:
+            result = self.get_result_cache().fetch(self.ssh_client, stand, command, ttl, log_file, suffix)
+        except KeyboardInterrupt:
+            return None
+
+        stdout = create_output(sys.stdout, view, shutil.get_terminal_size().lines)
+        stderr = OutputStream(sys.stderr)
+        stdout.write(result["data"])
+        stderr.write(result["errors"])
+        stdout.close()
+        stderr.close()
+        if self.ssh_client.recorder:
+            self.ssh_client.recorder.write(result["data"])
+
+        if result["source"] == "hit":
+            print(f"\nИз кэша (получено {result['age']:.0f} с назад).")
+        elif result["source"] == "refresh":
+            print(f"\nКэш обновлен: от сервера получено {result['fetched']} байт, остальное из кэша.")
+        return result["exit_status"]
+
+    def follow_log(self, stand, command_name, include=(), exclude=(), lines=DEFAULT_TAIL_LINES, max_retries=DEFAULT_MAX_RETRIES):
+        '''
+        Следит за логом команды в режиме follow, переподключаясь при обрывах соединения.
+
+        :return: Код завершения tail или None, если слежение прервано пользователем.
+        '''
+        log_file = self.commands.log_file(stand, command_name)
+        follower = LogFollower(self.ssh_client, log_file, lines=lines, include=include, exclude=exclude, max_retries=max_retries)
+        try:
+            return follower.follow()
+        except KeyboardInterrupt:
+            return None
+        except FollowError as e:
+            print(f"\nСлежение за логом остановлено: {e}")
+            return 1
+
+    @staticmethod
+    def pattern_error(patterns):
+        '''Возвращает описание ошибки в первом неверном регулярном выражении из patterns или None.'''
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                return f"неверное регулярное выражение '{pattern}': {e}"
+        return None
+
+    def ask_follow_pattern(self):
+        '''Спрашивает регулярное выражение для отбора строк лога, пока оно не окажется верным.'''
+        while True:
+            pattern = input("Показывать только строки, где найдено регулярное выражение (пусто - все строки): ")
+            error = self.pattern_error([pattern])
+            if error is None:
+                return pattern
+            print(f"Ошибка: {error}. Попробуйте снова.")
+
+    def build_indexes(self):
+        '''Строит индексы стендов и команд для поиска и дополнения по Tab.'''
+        self.stand_index = CommandIndex(self.commands, self.history, "stand")
+        # Шаблоны команд общие для всех стендов, поэтому команды стендов не подставляются
+        names = getattr(self.commands, "templates", None)
+        if names is None:
+            names = {name: None for stand in self.commands for name in self.commands[stand]}
+        self.command_index = CommandIndex(names, self.history, "command")
+
+    def display_names(self, names, index):
+        '''Выводит названия; из длинного списка - только первые, часто и недавно выбранные.'''
+        names = list(names)
+        if len(names) > DISPLAY_LIMIT:
+            members = set(names)
+            shown = [name for name in index.ranked() if name in members][:DISPLAY_LIMIT]
+        else:
+            shown = names
+        for name in shown:
+            print(f"- {name}")
+        if len(shown) < len(names):
+            print(f"... и еще {len(names) - len(shown)}: введите часть названия (Tab - дополнение)")
+
+    def display_categories(self):
+        '''Выводит доступные стенды.'''
+        print("\nДоступные стенды:")
+        self.display_names(self.commands, self.stand_index)
+
+    def display_commands(self, category):
+        '''Выводит доступные команды в выбранной категории.'''
+        print(f"\nВы выбрали стенд '{category}'. Доступные команды:")
+        self.display_names(self.commands[category], self.command_index)
+
+    def choose(self, index, text, names):
+        '''
+        Находит стенд или команду по вводу: номер варианта из прошлого поиска или название без учета регистра.
+        Если точного совпадения нет, выводит похожие варианты из names.
+
+        :return: Название или None.
+        '''
+        # Варианты из поиска на другом шаге меню (стенд или команда) номером не выбираются
+        if text.isdigit() and 1 <= int(text) <= len(self.suggestions) and self.suggestions[int(text) - 1] in names:
+            return self.suggestions[int(text) - 1]
+        name = index.lookup(text)
+        if name is not None and name in names:
+            return name
+        self.suggestions = [variant for variant in index.search(text) if variant in names]
+        if self.suggestions:
+            print("Точного совпадения нет. Похожие варианты (введите номер или название):")
+            for number, variant in enumerate(self.suggestions, 1):
+                print(f"{number}. {variant}")
+        return None
+
+    def start(self):
+        # Подключение идет в фоне, пока отображается меню
+        self.start_warm_up()
+        try:
+            with profiler.phase("индекс стендов и команд"):
+                self.build_indexes()
+            profiler.mark("первое меню")
+            while True:
+                self.check_warm_up()
+                self.display_categories()
+                category_input = input_with_completion("Введите категорию (или 'exit' для выхода): ", self.stand_index).strip()
+
+                if category_input.lower() == "exit":
+                    print("Завершаем работу.")
+                    break
+
+                category_input = self.choose(self.stand_index, category_input, self.commands)
+                if category_input is not None:
+                    self.history.record("stand", category_input)
+                    # Номера вариантов действуют только в том шаге меню, где они выведены
+                    self.suggestions = []
+                    while True:  # Цикл для работы с командами внутри категории
+                        self.display_commands(category_input)
+                        command_input = input_with_completion(
+                            "Введите команду (или 'back' для возврата, 'exit' для выхода): ", self.command_index
+                        ).strip()
+                        if command_input.lower() in ("back", "exit"):
+                            command_input = command_input.lower()
+                        # Дебагаю стрелочки в nano
+                        #if command_input == "cat -v":
+                            #self.ssh_client.execute_command(command_input, "test")
+
+                        if command_input == "back":  # Вернуться к выбору категории
+                            self.suggestions = []
+                            break
+
+                        if command_input == "exit":  # Завершить программу
+                            print("Завершаем работу.")
+                            return
+
+                        command_input = self.choose(self.command_index, command_input, self.commands[category_input])
+                        if command_input is not None:
+                            self.history.record("command", command_input)
+                            self.suggestions = []
+                            username, postfix = self.wait_connection()
+                            command_to_execute = self.commands[category_input][command_input]
+
+                            prompt = self.get_prompt_pattern_from_path(command_to_execute, username, postfix)
+
+                            if self.command_mode(command_input) == FOLLOW_MODE:
+                                print("Выход из слежения за логом: Ctrl + C")
+                                pattern = self.ask_follow_pattern()
+                                with self.metrics.scope(category_input, command_input):
+                                    self.follow_log(category_input, command_input, include=[pattern] if pattern else [])
+                                continue
+
+                            if command_input == "run script":
+                                script_name = self.ssh_client.remove_control_sequences(input("Введите название скрипта: "))
+                                command_to_execute = self.commands[category_input][command_input] + script_name
+                            elif command_input in ["tail celery logs", "tail wsgi logs", "full celery logs", "full wsgi logs"]:
+                                print("Выход из интерактивного режима: Ctrl + C")
+                                log_choice = input("Выполнить с выборкой? ('y' с параметром, 'n' или 'пусто' без параметра): ")
+                                if log_choice == "y":
+                                    print("Пример вывода за исключением слова: -vw слово")
+                                    print("Пример вывода только со словом: -i слово")
+                                    log_param = self.ssh_client.remove_control_sequences(input("Введите параметр: "))
+                                    if log_param == "":
+                                        command_to_execute = self.commands[category_input][command_input]
+                                    else:
+                                        command_to_execute = self.commands[category_input][command_input] + " | grep " + log_param
+                                else:
+                                    command_to_execute = self.commands[category_input][command_input]
+                            elif command_input in ["change settings", "change visual"]:
+                                print("Выход из интерактивного режима: Ctrl + X")
+                                tmp = input("Для продолжения нажмите Enter: ")
+                            else:
+                                command_to_execute = self.commands[category_input][command_input]
+                            with self.metrics.scope(category_input, command_input):
+                                if self.command_mode(command_input) == EXEC_MODE:
+                                    exit_status = self.exec_command(category_input, command_input, command_to_execute)
+                                    print("\nКоманда прервана." if exit_status is None else f"\nКод завершения: {exit_status}")
+                                else:
+                                    self.ssh_client.execute_command(command_to_execute, prompt, self.command_view(command_input))
+                        elif not self.suggestions:
+                            print("Неверная команда. Попробуйте снова.")
+                elif not self.suggestions:
+                    print("Неверная категория. Попробуйте снова.")
+        except paramiko.AuthenticationException:
+            print("Ошибка аутентификации. Проверьте логин или пароль.")
+        except paramiko.SSHException as ssh_error:
+            print(f"Ошибка SSH: {ssh_error}")
+        except KeyboardInterrupt:
+            print("\nПрограмма завершена пользователем.")
+        except Exception as e:
+            print(f"Общая ошибка: {e}")
+        finally:
+            if self.ssh_client:
+                self.ssh_client.close()
+            print("Соединение закрыто.")
+            summary = self.metrics.summary()
+            if summary:
+                print("\nМетрики сессий (время в секундах):")
+                print(summary)
+
+    def call_with_connection(self, action):
+        """Подключается к серверу, вызывает action() и возвращает ее результат как код выхода программы."""
+        hostname, port, username, password, postfix = self.load_login_data("login_data.yaml")
+        try:
+            self.ssh_client = self.create_ssh_client(hostname, port, username, password)
+            self.ssh_client.initialize()
+            return action()
+        except paramiko.AuthenticationException:
+            print("Ошибка аутентификации. Проверьте логин или пароль.")
+        except paramiko.SSHException as ssh_error:
+            print(f"Ошибка SSH: {ssh_error}")
+        except KeyboardInterrupt:
+            print("\nПрограмма завершена пользователем.")
+        except Exception as e:
+            print(f"Общая ошибка: {e}")
+        finally:
+            if self.ssh_client:
+                self.ssh_client.close()
+        return 1
+
+    def run(self, command_name, stands, grep_param="", max_workers=DEFAULT_MAX_WORKERS):
+        """Неинтерактивно выполняет команду на нескольких стендах параллельно и возвращает код выхода программы."""
+        if stands == ["all"]:
+            stands = list(self.commands)
+        if not stands:
+            print("Не указан ни один стенд: передайте 'all' или список стендов через запятую")
+            return 2
+        unknown = [stand for stand in stands if stand not in self.commands]
+        if unknown:
+            print(f"Неизвестные стенды: {', '.join(unknown)}")
+            return 2
+        if any(command_name not in self.commands[stand] for stand in stands):
+            print(f"Неизвестная команда: {command_name}")
+            return 2
+
+        suffix = " | grep " + grep_param if grep_param else ""
+
+        def action():
+            fan_out = FanOut(self.ssh_client, self.commands, max_workers=max_workers)
+            results = fan_out.run(command_name, stands, suffix)
+            fan_out.print_summary(results)
+            return 0 if all(exit_status == 0 for _, exit_status, _ in results) else 1
+
+        return self.call_with_connection(action)
+
+    def playbook(self, file_path, max_workers=None, fail_fast=False, report_path=None):
+        """Выполняет сценарий из YAML файла и возвращает код выхода программы."""
+        try:
+            playbook = Playbook.load(file_path, self.commands)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            print(f"Ошибка в сценарии {file_path}: {e}")
+            return 2
+        if max_workers:
+            playbook.max_workers = max_workers
+        playbook.fail_fast = playbook.fail_fast or fail_fast
+
+        def action():
+            runner = PlaybookRunner(self.ssh_client, self.commands, playbook)
+            results = runner.run()
+            runner.print_summary(results)
+            if report_path:
+                runner.save_report(results, report_path)
+            return 0 if runner.succeeded(results) else 1
+
+        return self.call_with_connection(action)
+
+    def follow(self, command_name, stand, include=(), exclude=(), lines=DEFAULT_TAIL_LINES, max_retries=DEFAULT_MAX_RETRIES):
+        """Неинтерактивно следит за логом команды в режиме follow и возвращает код выхода программы."""
+        if stand not in self.commands:
+            print(f"Неизвестный стенд: {stand}")
+            return 2
+        if command_name not in self.commands[stand] or self.command_mode(command_name) != FOLLOW_MODE:
+            print(f"Неизвестная команда или команда не в режиме follow: {command_name}")
+            return 2
+        error = self.pattern_error(list(include) + list(exclude))
+        if error:
+            print(f"Ошибка в фильтре: {error}")
+            return 2
+
+        def action():
+            with self.metrics.scope(stand, command_name):
+                exit_status = self.follow_log(stand, command_name, include, exclude, lines, max_retries)
+            return 0 if exit_status in (0, None) else 1
+
+        return self.call_with_connection(action)
+
+    def download(self, stand, local_dir=None, remote_path=None, pattern=None, workers=DOWNLOAD_WORKERS, decompress=False):
+        """Скачивает по SFTP каталог логов (или remote_path) стенда и возвращает код выхода программы."""
+        if stand not in self.commands:
+            print(f"Неизвестный стенд: {stand}")
+            return 2
+        remote_path = remote_path or self.commands.logs_path
+        # SFTP не раскрывает ~, но относительные пути и так отсчитываются от домашнего каталога
+        if remote_path.startswith("~/"):
+            remote_path = remote_path[2:]
+        local_dir = local_dir or stand
+
+        def action():
+            downloader = SFTPDownloader(self.ssh_client, workers=workers, decompress=decompress)
+            try:
+                stats = downloader.download(remote_path, local_dir, pattern)
+            except KeyboardInterrupt:
+                print("\nЗагрузка прервана, при следующем запуске она продолжится с того же места.")
+                return 1
+            speed = stats["bytes"] / stats["elapsed"] / 1024 / 1024 if stats["elapsed"] else 0.0
+            print(
+                f"\nСкачано файлов: {stats['files']}, уже были скачаны: {stats['skipped']}, продолжено: {stats['resumed']}. "
+                f"Передано {stats['bytes']} байт за {stats['elapsed']:.2f} с ({speed:.1f} МБ/с)."
+            )
+            return 0
+
+        return self.call_with_connection(action)
+
+    def query_logs(self, command_name, stand, log_query):
+        """Неинтерактивно выполняет команду просмотра лога с фильтрацией на стороне сервера."""
+        if stand not in self.commands:
+            print(f"Неизвестный стенд: {stand}")
+            return 2
+        if command_name not in self.commands[stand]:
+            print(f"Неизвестная команда: {command_name}")
+            return 2
+
+        def action():
+            with self.metrics.scope(stand, command_name):
+                stats = log_query.run(self.ssh_client, self.commands[stand][command_name])
+            first_line = f"{stats['first_line'] * 1000:.0f} мс" if stats["first_line"] is not None else "-"
+            print(
+                f"\nПередано: {stats['received']} байт, выведено: {stats['written']} байт, "
+                f"первая строка: {first_line}, всего: {stats['elapsed']:.2f} с",
+                file=sys.stderr,
+            )
+            return 0 if stats["exit_status"] == 0 else 1
+
+        return self.call_with_connection(action)
@@ -0,0 +1,344 @@
+import os
+import json
+import math
+import time
+import heapq
+import bisect
+
+try:
+    import readline
+except ImportError:
+    # В Windows нет readline: ввод работает без дополнения по Tab
+    readline = None
+
+# Файл истории выбора стендов и команд (рядом с кэшем файла команд)
+HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".cache", "ssh_console_manager", "history.json")
+
+# Версия формата истории; при ее изменении старая история не используется
+HISTORY_VERSION = 1
+
+# За сколько секунд вес выбора в истории уменьшается вдвое (неделя)
+HISTORY_HALF_LIFE = 7 * 24 * 3600
+
+# Сколько записей хранится в истории (остальные, самые редкие, удаляются)
+HISTORY_MAX_ENTRIES = 1000
+
+# Сколько вариантов возвращает поиск
+SEARCH_LIMIT = 10
+
+# Какая доля триграмм слова запроса должна найтись в слове названия, чтобы считать его похожим (опечатки)
+FUZZY_THRESHOLD = 0.4
+
+# Группы совпадений в порядке приоритета; внутри группы выше часто и недавно выбранные
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_WORD_PREFIX = 2
+MATCH_SUBSTRING = 3
+MATCH_FUZZY = 4
+
+
+def normalize(text):
+    '''Приводит название к виду для поиска: без регистра и лишних пробелов.'''
+    return " ".join(text.casefold().split())
+
+
+def trigrams(text):
+    '''
+    Возвращает множество триграмм нормализованного текста, как pg_trgm: каждое слово
+    дополняется двумя пробелами в начале и одним в конце, поэтому начало слова весит больше.
+    '''
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return result
+
+
+'''CommandHistory: история выбора стендов и команд в файле. У каждой записи есть вес,
+который увеличивается на 1 при выборе и уменьшается вдвое за HISTORY_HALF_LIFE,
+поэтому выше оказываются и часто, и недавно выбранные названия (frecency).'''
+class CommandHistory:
+    def __init__(self, history_file=HISTORY_FILE):
+        self.history_file = history_file
+        self.entries = {}
+        # Номер изменения истории: по нему индексы узнают, что веса нужно пересчитать
+        self.revision = 0
+        self.load()
+
+    @staticmethod
+    def key(scope, name):
+        '''Возвращает ключ записи: область ("stand" или "command") и название.'''
+        return f"{scope}\0{name}"
+
+    def load(self):
+        '''Читает историю; поврежденная или старая история считается пустой.'''
+        try:
+            with open(self.history_file, "r", encoding="utf-8") as file:
+                history = json.load(file)
+        except (OSError, ValueError):
+            return
+        if history.get("version") == HISTORY_VERSION:
+            self.entries = history["entries"]
+
+    def save(self):
+        '''Атомарно записывает историю; ошибки записи не мешают работе программы.'''
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            tmp_file = f"{self.history_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as file:
+                json.dump({"version": HISTORY_VERSION, "entries": self.entries}, file, ensure_ascii=False)
+            os.replace(tmp_file, self.history_file)
+        except OSError:
+            pass
+
+    def score(self, scope, name, now=None):
+        '''Возвращает текущий вес названия (0 - еще не выбиралось).'''
+        entry = self.entries.get(self.key(scope, name))
+        if entry is None:
+            return 0.0
+        weight, updated = entry
+        now = time.time() if now is None else now
+        return weight * math.pow(0.5, max(now - updated, 0) / HISTORY_HALF_LIFE)
+
+    def names(self, scope):
+        '''Возвращает названия из истории для области scope.'''
+        prefix = self.key(scope, "")
+        return [key[len(prefix):] for key in self.entries if key.startswith(prefix)]
+
+    def record(self, scope, name):
+        '''Отмечает выбор названия и сохраняет историю.'''
+        now = time.time()
+        self.entries[self.key(scope, name)] = [self.score(scope, name, now) + 1, now]
+        if len(self.entries) > HISTORY_MAX_ENTRIES:
+            rarest = sorted(self.entries, key=lambda key: self.entries[key][0])
+            for key in rarest[:len(self.entries) - HISTORY_MAX_ENTRIES]:
+                del self.entries[key]
+        self.revision += 1
+        self.save()
+
+
+'''CommandIndex: индекс названий (стендов или команд) для нечеткого поиска и дополнения по Tab.
+Строится один раз: отсортированные списки названий и слов для поиска по началу (bisect),
+инвертированный индекс триграмм названий для поиска подстроки и словарь слов с индексом
+триграмм для слов с опечатками. Поиск перебирает не все названия, а только кандидатов из индекса,
+поэтому на 10 тысячах названий занимает доли миллисекунды. Результаты упорядочены по группе
+совпадения (точное, начало названия, начало слова, подстрока, опечатка), а внутри группы -
+по истории выбора.'''
+class CommandIndex:
+    def __init__(self, names, history=None, scope=""):
+        self.names = list(dict.fromkeys(names))
+        self.history = history
+        self.scope = scope
+        self.cached_weights = (None, {})
+        self.keys = [normalize(name) for name in self.names]
+        self.by_key = {key: index for index, key in enumerate(self.keys)}
+        # Отсортированные ключи и номера названий для поиска по началу
+        pairs = sorted((key, index) for index, key in enumerate(self.keys))
+        self.sorted_keys = [key for key, _ in pairs]
+        self.sorted_indexes = [index for _, index in pairs]
+        # То же для слов после первого: по ним ищется начало слова ("celery" в "restart celery")
+        pairs = sorted((word, index) for index, key in enumerate(self.keys) for word in key.split()[1:])
+        self.sorted_words = [word for word, _ in pairs]
+        self.word_indexes = [index for _, index in pairs]
+        self.entry_words = [set(key.split()) for key in self.keys]
+        self.postings = {}
+        self.word_entries = {}
+        for index, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                self.postings.setdefault(gram, []).append(index)
+            for word in self.entry_words[index]:
+                self.word_entries.setdefault(word, set()).add(index)
+        self.vocabulary = sorted(self.word_entries)
+        self.word_trigrams = {word: trigrams(word) for word in self.vocabulary}
+        self.word_postings = {}
+        for word, grams in self.word_trigrams.items():
+            for gram in grams:
+                self.word_postings.setdefault(gram, []).append(word)
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, text):
+        '''Возвращает название, которое совпадает с text без учета регистра, или None.'''
+        index = self.by_key.get(normalize(text))
+        return None if index is None else self.names[index]
+
+    def weights(self):
+        '''
+        Веса названий по истории выбора: {номер названия: вес}. Пересчитываются после
+        изменения истории: за время работы программы вес почти не уменьшается.
+        '''
+        if not self.history:
+            return {}
+        revision, weights = self.cached_weights
+        if revision == self.history.revision:
+            return weights
+        now = time.time()
+        weights = {}
+        for name in self.history.names(self.scope):
+            index = self.by_key.get(normalize(name))
+            if index is not None:
+                weights[index] = self.history.score(self.scope, name, now)
+        self.cached_weights = (self.history.revision, weights)
+        return weights
+
+    def ranked(self, limit=None):
+        '''Возвращает названия по убыванию веса в истории, остальные - в исходном порядке.'''
+        weights = self.weights()
+        order = sorted(weights, key=lambda index: (-weights[index], index))
+        order += [index for index in range(len(self.names)) if index not in weights]
+        return [self.names[index] for index in order[:limit]]
+
+    @staticmethod
+    def prefix_range(sorted_keys, values, prefix, limit=None):
+        '''Возвращает значения для ключей из sorted_keys, которые начинаются с prefix (не больше limit).'''
+        start = bisect.bisect_left(sorted_keys, prefix)
+        end = start
+        stop = len(sorted_keys) if limit is None else min(start + limit, len(sorted_keys))
+        while end < stop and sorted_keys[end].startswith(prefix):
+            end += 1
+        return values[start:end]
+
+    def similar_words(self, word, partial):
+        '''
+        Возвращает слова словаря, похожие на слово запроса: {слово: доля совпавших триграмм}.
+
+        :param partial: Слово еще вводится (последнее в запросе): подходят и слова, которые с него начинаются.
+        '''
+        similar = {}
+        if partial:
+            similar = dict.fromkeys(self.prefix_range(self.vocabulary, self.vocabulary, word), 1.0)
+        grams = trigrams(word)
+        # Если в слове есть хотя бы need триграмм запроса, то среди любых len - need + 1
+        # триграмм запроса хотя бы одна в нем есть: достаточно просмотреть самые редкие
+        need = math.ceil(FUZZY_THRESHOLD * len(grams))
+        postings = sorted((self.word_postings.get(gram, []) for gram in grams), key=len)
+        candidates = set()
+        for posting in postings[:len(postings) - need + 1]:
+            candidates.update(posting)
+        for candidate in candidates:
+            coverage = len(grams & self.word_trigrams[candidate]) / len(grams)
+            if coverage >= FUZZY_THRESHOLD and coverage > similar.get(candidate, 0.0):
+                similar[candidate] = coverage
+        return similar
+
+    def fuzzy(self, query):
+        '''
+        Ищет названия, в которых каждому слову запроса соответствует похожее слово.
+
+        :return: {номер названия: средняя похожесть слов}.
+        '''
+        words = query.split()
+        matches = [self.similar_words(word, index == len(words) - 1) for index, word in enumerate(words)]
+        if not all(matches):
+            return {}
+        if len(matches) == 1:
+            # Одно слово: похожесть названия - похожесть его лучшего слова (похожие слова идут последними)
+            scores = {}
+            for word in sorted(matches[0], key=matches[0].get):
+                scores.update(dict.fromkeys(self.word_entries[word], matches[0][word]))
+            return scores
+        # Пересечение начинается с самого узкого слова запроса, остальные проверяются по словам названия
+        order = sorted(matches, key=lambda similar: sum(len(self.word_entries[word]) for word in similar))
+        candidates = set().union(*(self.word_entries[word] for word in order[0]))
+        for similar in order[1:]:
+            candidates = {index for index in candidates if not self.entry_words[index].isdisjoint(similar)}
+        return {
+            index: sum(max(similar.get(word, 0.0) for word in self.entry_words[index]) for similar in matches) / len(matches)
+            for index in candidates
+        }
+
+    def substrings(self, query):
+        '''Возвращает номера названий, которые содержат запрос (не короче 3 символов).'''
+        # Такое название содержит все "внутренние" триграммы запроса (без пробелов по краям слов)
+        inner = sorted((self.postings.get(gram, []) for gram in trigrams(query) if " " not in gram), key=len)
+        if not inner or not inner[0]:
+            return []
+        common = set(inner[0]).intersection(*inner[1:])
+        return [index for index in common if query in self.keys[index]]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        '''
+        Ищет названия по запросу: по началу названия или слова, подстроке и с опечатками.
+
+        :return: Не больше limit названий, лучшие совпадения первыми.
+        '''
+        query = normalize(query)
+        if not query:
+            return self.ranked(limit)
+        weights = self.weights()
+        # По началу названия и слова индекс возвращает первые совпадения по алфавиту,
+        # поэтому выбранные раньше названия добавляются к ним отдельно
+        remembered = {MATCH_PREFIX: [], MATCH_WORD_PREFIX: []}
+        for index in weights:
+            words = self.keys[index].split()
+            if self.keys[index].startswith(query):
+                remembered[MATCH_PREFIX].append(index)
+            elif any(word.startswith(query) for word in words[1:]):
+                remembered[MATCH_WORD_PREFIX].append(index)
+
+        found = []
+        seen = set()
+        # Группы проверяются по порядку, следующая - только если вариантов еще не хватает
+        for group in (MATCH_EXACT, MATCH_PREFIX, MATCH_WORD_PREFIX, MATCH_SUBSTRING, MATCH_FUZZY):
+            similarity = {}
+            if group == MATCH_EXACT:
+                indexes = [self.by_key[query]] if query in self.by_key else []
+            elif group == MATCH_PREFIX:
+                indexes = self.prefix_range(self.sorted_keys, self.sorted_indexes, query, limit + 1)
+            elif group == MATCH_WORD_PREFIX:
+                indexes = self.prefix_range(self.sorted_words, self.word_indexes, query, limit * 4)
+            elif group == MATCH_SUBSTRING:
+                indexes = self.substrings(query) if len(query) >= 3 else []
+            else:
+                similarity = self.fuzzy(query)
+                indexes = list(similarity)
+            indexes = {index for index in indexes + remembered.get(group, []) if index not in seen}
+            # Похожие названия дополнительно упорядочены по похожести слов
+            best = heapq.nsmallest(
+                limit - len(found), indexes,
+                key=lambda index: (-weights.get(index, 0.0), -similarity.get(index, 0.0), self.keys[index]),
+            )
+            seen.update(best)
+            found += [self.names[index] for index in best]
+            if len(found) == limit:
+                break
+        return found
+
+    def complete(self, text):
+        '''
+        Варианты дополнения по Tab: названия, которые начинаются с text,
+        а если таких нет - результаты нечеткого поиска.
+        '''
+        matches = self.prefix_range(self.sorted_keys, self.sorted_indexes, normalize(text))
+        if matches:
+            return [self.names[index] for index in matches]
+        return self.search(text)
+
+
+def input_with_completion(prompt, index):
+    '''input() с дополнением названий из index по Tab (если есть readline).'''
+    if readline is None:
+        return input(prompt)
+    matches = []
+
+    def completer(text, state):
+        if state == 0:
+            matches[:] = index.complete(text)
+        return matches[state] if state < len(matches) else None
+
+    old_completer = readline.get_completer()
+    old_delims = readline.get_completer_delims()
+    readline.set_completer(completer)
+    # Названия команд содержат пробелы: дополняется вся строка, а не последнее слово
+    readline.set_completer_delims("")
+    if "libedit" in (readline.__doc__ or ""):
+        # readline в macOS - это libedit с другим синтаксисом настроек
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+    try:
+        return input(prompt)
+    finally:
+        readline.set_completer(old_completer)
+        readline.set_completer_delims(old_delims)
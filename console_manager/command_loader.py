@@ -0,0 +1,210 @@
+import sys
+import os
+import json
+import hashlib
+from collections.abc import Mapping
+from lazy_import import LazyModule
+from output_filter import RAW_VIEW, OUTPUT_VIEWS
+
+# yaml нужен только при разборе файлов, при попадании в кэш он не импортируется
+yaml = LazyModule("yaml")
+
+# Каталог кэша разобранных файлов команд; версия меняется при изменении формата кэша
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ssh_console_manager")
+CACHE_VERSION = 5
+
+# Режимы выполнения команд: интерактивный shell с PTY, exec без PTY
+# или follow - слежение за логом с продолжением с того же места после обрыва соединения
+SHELL_MODE = "shell"
+EXEC_MODE = "exec"
+FOLLOW_MODE = "follow"
+COMMAND_MODES = (SHELL_MODE, EXEC_MODE, FOLLOW_MODE)
+
+
+'''StandCommands: команды всех стендов, шаблоны которых подставляются при первом
+обращении к стенду, а не для всех стендов сразу при запуске.
+В modes хранится режим выполнения каждой команды (shell, exec или follow),
+в caches - ttl кэша вывода для команд, которые только читают данные, в log_files - шаблоны путей к логам,
+в views - режим отображения вывода (raw, plain, highlight или viewport).'''
+class StandCommands(Mapping):
+    def __init__(self, base_paths, logs_path, templates, modes=None, caches=None, log_files=None, views=None):
+        self.base_paths = base_paths
+        self.logs_path = logs_path
+        self.templates = templates
+        self.modes = modes or {}
+        self.caches = caches or {}
+        self.log_files = log_files or {}
+        self.views = views or {}
+        self.expanded = {}
+
+    def expand(self, stand, template):
+        '''Подставляет пути стенда в шаблон.'''
+        base_path = self.base_paths[stand]
+        return template.format(
+            base_path=base_path,
+            src_path=f"{base_path}/src",
+            logs_path=self.logs_path,
+            stand=stand
+        )
+
+    def __getitem__(self, stand):
+        if stand not in self.expanded:
+            self.expanded[stand] = {
+                name: self.expand(stand, template)
+                for name, template in self.templates.items()
+            }
+        return self.expanded[stand]
+
+    def __iter__(self):
+        return iter(self.base_paths)
+
+    def __len__(self):
+        return len(self.base_paths)
+
+    def mode(self, name):
+        '''Возвращает режим выполнения команды name.'''
+        return self.modes.get(name, SHELL_MODE)
+
+    def view(self, name):
+        '''Возвращает режим отображения вывода команды name.'''
+        return self.views.get(name, RAW_VIEW)
+
+    def log_file(self, stand, name):
+        '''Возвращает путь к логу, который выводит команда name на стенде, или None.'''
+        log_file = self.log_files.get(name)
+        return self.expand(stand, log_file) if log_file else None
+
+    def cache(self, stand, name):
+        '''Возвращает (ttl, файл лога или None) для кэшируемой команды name на стенде или None.'''
+        ttl = self.caches.get(name)
+        if ttl is None:
+            return None
+        return ttl, self.log_file(stand, name)
+
+
+class CommandLoader:
+    @staticmethod
+    def safe_loader():
+        '''Возвращает загрузчик YAML: C-реализация заметно быстрее, но есть не во всех сборках PyYAML.'''
+        return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+    @staticmethod
+    def resolve_path(file_path):
+        '''Возвращает путь к файлу данных с учетом сборки PyInstaller.'''
+        if getattr(sys, 'frozen', False):  # Проверяем, запущена ли программа как исполняемый файл
+            file_path = os.path.join(sys._MEIPASS, file_path)  # Используем _MEIPASS для доступа к данным в скомпилированном файле
+        return file_path
+
+    @staticmethod
+    def load_yaml(file_path):
+        '''Разбирает YAML файл быстрым загрузчиком (CSafeLoader, если он доступен).'''
+        with open(CommandLoader.resolve_path(file_path), "rb") as file:
+            return yaml.load(file, Loader=CommandLoader.safe_loader())
+
+    @staticmethod
+    def cache_path(file_path):
+        '''Возвращает путь к файлу кэша для файла команд.'''
+        # Путь _MEIPASS меняется при каждом запуске собранного файла, поэтому ключ кэша - только имя файла
+        return os.path.join(CACHE_DIR, os.path.basename(file_path) + ".cache.json")
+
+    @staticmethod
+    def read_cache(cache_file):
+        '''Читает кэш, если он есть и подходящей версии.'''
+        try:
+            with open(cache_file, "r", encoding="utf-8") as file:
+                cached = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return cached if cached.get("version") == CACHE_VERSION else None
+
+    @staticmethod
+    def write_cache(cache_file, cached):
+        '''Атомарно записывает кэш; ошибки записи не мешают работе программы.'''
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as file:
+                json.dump(cached, file, ensure_ascii=False)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+
+    @staticmethod
+    def split_commands(commands):
+        '''
+        Разделяет описания команд на шаблоны, режимы выполнения, ttl кэша, шаблоны путей к логам и режимы отображения.
+        Команда задается строкой (режим shell) или словарем с ключами command, mode,
+        cache (ttl в секундах), log_file (шаблон пути к логу, который выводит команда) и view (режим отображения вывода).
+        '''
+        templates, modes, caches, log_files, views = {}, {}, {}, {}, {}
+        for name, value in commands.items():
+            if isinstance(value, dict):
+                templates[name] = value["command"]
+                modes[name] = value.get("mode", SHELL_MODE)
+                if modes[name] not in COMMAND_MODES:
+                    raise ValueError(f"Неизвестный режим команды '{name}': {modes[name]}")
+                if "cache" in value:
+                    # Кэшируется только вывод неинтерактивных команд
+                    if modes[name] != EXEC_MODE:
+                        raise ValueError(f"Кэшировать можно только команды в режиме exec: '{name}'")
+                    caches[name] = int(value["cache"])
+                if "log_file" in value:
+                    log_files[name] = value["log_file"]
+                elif modes[name] == FOLLOW_MODE:
+                    raise ValueError(f"Для режима follow нужен log_file: '{name}'")
+                if "view" in value:
+                    views[name] = value["view"]
+                    if views[name] not in OUTPUT_VIEWS:
+                        raise ValueError(f"Неизвестный режим отображения команды '{name}': {views[name]}")
+            else:
+                templates[name] = value
+        return templates, modes, caches, log_files, views
+
+    @staticmethod
+    def load_config(file_path):
+        '''
+        Возвращает пути и шаблоны команд из YAML файла.
+        Разобранный файл кэшируется: при совпадении mtime и размера кэш берется без чтения файла,
+        иначе сверяется хэш содержимого, и YAML разбирается заново только при его изменении.
+        '''
+        file_path = CommandLoader.resolve_path(file_path)
+        stat = os.stat(file_path)
+        cache_file = CommandLoader.cache_path(file_path)
+        cached = CommandLoader.read_cache(cache_file)
+        if cached and cached["mtime"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+            return cached["config"]
+
+        with open(file_path, "rb") as file:
+            raw = file.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        if cached and cached["hash"] == digest:
+            config = cached["config"]
+        else:
+            parsed = yaml.load(raw, Loader=CommandLoader.safe_loader())
+            paths = parsed["paths"]
+            templates, modes, caches, log_files, views = CommandLoader.split_commands(parsed["commands"])
+            config = {
+                "logs": paths["logs"],
+                "base": paths["base"],
+                "commands": templates,
+                "modes": modes,
+                "caches": caches,
+                "log_files": log_files,
+                "views": views,
+            }
+
+        CommandLoader.write_cache(cache_file, {
+            "version": CACHE_VERSION,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": digest,
+            "config": config,
+        })
+        return config
+
+    @staticmethod
+    def load_commands(file_path):
+        '''Загружает команды и пути из YAML файла и создает функции для их сборки.'''
+        config = CommandLoader.load_config(file_path)
+        return StandCommands(config["base"], config["logs"], config["commands"], config["modes"], config["caches"], config["log_files"], config["views"])
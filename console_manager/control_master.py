@@ -0,0 +1,400 @@
+import os
+import sys
+import hmac
+import time
+import socket
+import logging
+import selectors
+import threading
+import subprocess
+from lazy_import import LazyModule
+from ssh_client import ConnectionPool
+
+paramiko = LazyModule("paramiko")
+# Серверная часть нужна только процессу брокера: ее класс наследует paramiko.ServerInterface
+broker_session = LazyModule("broker_session")
+
+# Каталог брокера: Unix-сокет и ключ, которым брокер представляется локальным клиентам.
+# Доступ к брокеру ограничен правами на каталог и сокет (только владелец), как у ControlPath в OpenSSH
+CONTROL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ssh_console_manager", "control")
+CONTROL_PATH = os.path.join(CONTROL_DIR, "broker.sock")
+HOST_KEY_FILE = os.path.join(CONTROL_DIR, "broker_host_key")
+
+# Через сколько секунд без открытых каналов брокер закрывает соединение с сервером,
+# а без соединений и клиентов - завершается сам
+DEFAULT_IDLE_TIMEOUT = 600
+
+# Как часто брокер проверяет простаивающие соединения (в секундах)
+REAP_INTERVAL = 5
+
+# Сколько ждать запуска брокера в фоне, прежде чем подключиться напрямую (в секундах)
+START_TIMEOUT = 5.0
+START_POLL_INTERVAL = 0.05
+
+# Размер буфера одного чтения при пересылке данных канала (в байтах)
+RELAY_BUFFER_SIZE = 64 * 1024
+
+# Журнал SSH-соединений брокера с локальными клиентами
+TRANSPORT_LOGGER = f"{__name__}.transport"
+
+# Как часто пересылка проверяет, что клиент закрыл канал (в секундах)
+RELAY_CHECK_INTERVAL = 0.5
+
+# Сколько канал клиента может ждать запроса shell, exec или подсистемы (в секундах);
+# после этого брокер считает канал брошенным и закрывает его канал на сервере
+PENDING_CHANNEL_TIMEOUT = 30
+
+
+def is_supported():
+    '''Проверяет, что на платформе есть Unix-сокеты (Mac/Linux).'''
+    return os.name != "nt" and hasattr(socket, "AF_UNIX")
+
+
+def broker_username(hostname, port, username):
+    '''Возвращает имя пользователя для брокера: в нем передается сервер, к которому нужен канал.'''
+    return f"{username}@{hostname}:{port}"
+
+
+def parse_broker_username(name):
+    '''Разбирает имя пользователя брокера на (hostname, port, username).'''
+    username, _, address = name.rpartition("@")
+    hostname, _, port = address.rpartition(":")
+    if not username or not hostname:
+        raise ValueError(f"Некорректный адрес: {name}")
+    return hostname, int(port), username
+
+
+def open_socket(control_path):
+    '''Подключается к Unix-сокету брокера. Возвращает сокет или None, если брокер не запущен.'''
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(control_path)
+        return sock
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+
+
+def is_running(control_path=CONTROL_PATH):
+    '''Проверяет, что брокер принимает подключения на control_path.'''
+    if not is_supported():
+        return False
+    sock = open_socket(control_path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def start_broker(control_path=CONTROL_PATH, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    '''
+    Запускает брокер в фоновом процессе и ждет, пока он начнет принимать подключения.
+
+    :return: Сокет, подключенный к брокеру, или None, если брокер не запустился за START_TIMEOUT.
+    '''
+    if getattr(sys, "frozen", False):
+        command = [sys.executable]
+    else:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")]
+    command += ["--control-path", control_path, "broker", "--idle-timeout", str(idle_timeout)]
+    # Отдельная сессия: брокер переживает закрытие терминала, из которого запущена программа
+    subprocess.Popen(
+        command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        sock = open_socket(control_path)
+        if sock is not None:
+            return sock
+        time.sleep(START_POLL_INTERVAL)
+    return None
+
+
+def connect(control_path, hostname, port, username, password, start=False):
+    '''
+    Подключается к серверу через брокер.
+
+    :param start: Запустить брокер в фоне, если он еще не запущен.
+    :return: paramiko.SSHClient, каналы которого брокер открывает в своем соединении с сервером,
+             или None, если брокер не запущен.
+    :raises paramiko.AuthenticationException: Если сервер (или брокер) не принял пароль.
+    '''
+    if not is_supported():
+        return None
+    sock = open_socket(control_path)
+    if sock is None and start:
+        sock = start_broker(control_path)
+    if sock is None:
+        return None
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        client.connect(
+            hostname, port=port, username=broker_username(hostname, port, username), password=password,
+            sock=sock, look_for_keys=False, allow_agent=False,
+        )
+        return client
+    except BaseException:
+        # Сначала останавливается поток транспорта, иначе он читал бы из закрытого сокета
+        client.close()
+        sock.close()
+        raise
+
+
+'''ControlMaster: брокер SSH-соединений, как ControlMaster в OpenSSH.
+Держит аутентифицированные соединения с серверами (ConnectionPool) и принимает на Unix-сокете
+подключения запущенных экземпляров программы: для них брокер - локальный SSH-сервер, каналы
+которого он открывает в уже установленном соединении. Поэтому повторный запуск программы
+не делает TCP-подключение, обмен ключами и проверку пароля на сервере.
+Пароль проверяется на сервере при первом подключении и запоминается в памяти брокера:
+следующие клиенты должны передать тот же пароль. Соединение без каналов закрывается через
+idle_timeout секунд, а без соединений и клиентов брокер завершается сам.'''
+class ControlMaster:
+    def __init__(self, control_path=CONTROL_PATH, idle_timeout=DEFAULT_IDLE_TIMEOUT, host_key_file=HOST_KEY_FILE):
+        self.control_path = control_path
+        self.idle_timeout = idle_timeout
+        self.host_key_file = host_key_file
+        self.pool = ConnectionPool()
+        self.passwords = {}
+        # Блокировки целей: проверка пароля, подключение и сохранение пароля идут под одной из них
+        self.target_locks = {}
+        self.channels = {}
+        self.last_used = {}
+        self.relayed = {}
+        self.local_sessions = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.listener = None
+        self.last_activity = time.monotonic()
+        self.logger = logging.getLogger(__name__)
+
+    def load_host_key(self):
+        '''Загружает ключ брокера или создает его при первом запуске.'''
+        if os.path.exists(self.host_key_file):
+            return paramiko.RSAKey(filename=self.host_key_file)
+        key = paramiko.RSAKey.generate(2048)
+        key.write_private_key_file(self.host_key_file)
+        return key
+
+    def acquire(self, target, password):
+        '''
+        Проверяет пароль клиента и устанавливает соединение с сервером, если его еще нет.
+        Пока один клиент подключается к цели, остальные ждут и проверяются уже по его паролю,
+        поэтому готовое соединение не достанется клиенту, который не знает пароль.
+        '''
+        hostname, port, username = target
+        with self.lock:
+            target_lock = self.target_locks.setdefault(target, threading.Lock())
+        with target_lock:
+            with self.lock:
+                known = self.passwords.get(target)
+            if known is None:
+                # Пароль проверяет сервер: соединение, оставшееся в пуле без пароля, не переиспользуется
+                self.pool.close_client(hostname, port, username)
+            elif not hmac.compare_digest(known.encode("utf-8"), password.encode("utf-8")):
+                raise paramiko.AuthenticationException("пароль не совпадает с паролем открытого соединения")
+            self.pool.get_client(hostname, port, username, password)
+            with self.lock:
+                self.passwords[target] = password
+                self.last_used[target] = time.monotonic()
+        self.logger.info(f"Клиент подключен к {username}@{hostname}:{port}")
+
+    def open_session(self, target):
+        '''Открывает канал в соединении с сервером (переподключаясь, если оно оборвалось).'''
+        hostname, port, username = target
+        with self.lock:
+            password = self.passwords[target]
+        client = self.pool.get_client(hostname, port, username, password)
+        channel = client.get_transport().open_session()
+        with self.lock:
+            self.channels[target] = self.channels.get(target, 0) + 1
+            self.last_used[target] = time.monotonic()
+        return channel
+
+    def release(self, target):
+        '''Отмечает, что канал в соединении с сервером закрыт.'''
+        with self.lock:
+            self.channels[target] -= 1
+            self.last_used[target] = time.monotonic()
+
+    def relay(self, local, upstream, target):
+        '''Пересылает данные между каналом клиента и каналом сервера в двух потоках.'''
+        with self.lock:
+            self.relayed[local] = upstream
+
+        def from_server():
+            try:
+                with selectors.DefaultSelector() as selector:
+                    selector.register(upstream, selectors.EVENT_READ)
+                    while not local.closed:
+                        selector.select(RELAY_CHECK_INTERVAL)
+                        while upstream.recv_ready():
+                            local.sendall(upstream.recv(RELAY_BUFFER_SIZE))
+                        while upstream.recv_stderr_ready():
+                            local.sendall_stderr(upstream.recv_stderr(RELAY_BUFFER_SIZE))
+                        if (upstream.eof_received or upstream.closed) and not (
+                            upstream.recv_ready() or upstream.recv_stderr_ready()
+                        ):
+                            break
+                if local.closed:
+                    return
+                local.shutdown_write()
+                # Код завершения приходит после EOF; при обрыве соединения его не будет (-1),
+                # и канал клиента закрывается без кода, как при прямом подключении.
+                # Канал с кодом закрывает сам клиент: иначе закрытие могло бы обогнать
+                # ответ брокера на запрос exec, и клиент считал бы запрос отклоненным
+                exit_status = upstream.recv_exit_status()
+                if exit_status != -1:
+                    local.send_exit_status(exit_status)
+                else:
+                    local.close()
+            except (OSError, EOFError, paramiko.SSHException):
+                local.close()
+            finally:
+                upstream.close()
+                with self.lock:
+                    self.relayed.pop(local, None)
+                self.release(target)
+
+        def from_client():
+            # Канал сервера закрывает только from_server: paramiko при закрытии канала закрывает
+            # и его дескриптор, который ждет from_server
+            try:
+                while True:
+                    data = local.recv(RELAY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    upstream.sendall(data)
+                if not local.closed:
+                    upstream.shutdown_write()
+            except (OSError, EOFError, paramiko.SSHException):
+                local.close()
+
+        threading.Thread(target=from_server, name="broker-from-server", daemon=True).start()
+        threading.Thread(target=from_client, name="broker-from-client", daemon=True).start()
+
+    def reap(self):
+        '''
+        Закрывает соединения без каналов дольше idle_timeout.
+
+        :return: True, если брокеру пора завершиться: нет ни соединений, ни клиентов.
+        '''
+        with self.lock:
+            sessions = list(self.local_sessions)
+        # Каналы, которые клиенты открыли, но не запустили, иначе держали бы соединение занятым
+        for transport, session in sessions:
+            session.discard_pending(transport.is_active())
+        now = time.monotonic()
+        with self.lock:
+            idle = [
+                target for target, used in self.last_used.items()
+                if not self.channels.get(target) and now - used > self.idle_timeout
+            ]
+            for target in idle:
+                del self.last_used[target]
+                del self.passwords[target]
+                self.channels.pop(target, None)
+            self.local_sessions = [
+                (transport, session) for transport, session in self.local_sessions if transport.is_active()
+            ]
+            busy = bool(self.last_used or self.local_sessions)
+        for hostname, port, username in idle:
+            self.logger.info(f"Соединение с {username}@{hostname}:{port} простаивало {self.idle_timeout} с и закрыто")
+            self.pool.close_client(hostname, port, username)
+        if busy:
+            self.last_activity = now
+        return now - self.last_activity > self.idle_timeout
+
+    def bind(self):
+        '''Создает Unix-сокет брокера, доступный только владельцу.'''
+        directory = os.path.dirname(self.control_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if is_running(self.control_path):
+            raise RuntimeError(f"Брокер уже запущен: {self.control_path}")
+        if os.path.exists(self.control_path):
+            # Сокет остался от брокера, который завершился аварийно
+            os.remove(self.control_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.control_path)
+        finally:
+            os.umask(old_umask)
+        listener.listen(64)
+        listener.settimeout(REAP_INTERVAL)
+        return listener
+
+    def accept(self, connection, host_key):
+        '''Запускает SSH-сервер для подключившегося клиента.'''
+        # Клиент SSH сразу отправляет свою версию протокола, а проверка is_running
+        # закрывает соединение, ничего не отправив: для нее транспорт не запускается
+        try:
+            connection.settimeout(START_TIMEOUT)
+            probe = not connection.recv(1, socket.MSG_PEEK)
+            connection.settimeout(None)
+        except OSError:
+            probe = True
+        if probe:
+            connection.close()
+            return
+        transport = paramiko.Transport(connection)
+        # Клиент закрывает сокет, не дочитав ответы на закрытие каналов, и paramiko пишет об этом
+        # ошибку: журнал локальных соединений отделен от журнала соединений с серверами
+        transport.set_log_channel(TRANSPORT_LOGGER)
+        transport.add_server_key(host_key)
+        session = broker_session.BrokerSession(self)
+        try:
+            transport.start_server(server=session)
+        except (OSError, EOFError, paramiko.SSHException) as e:
+            self.logger.debug(f"Клиент отключился до начала сессии: {e}")
+            transport.close()
+            return
+        with self.lock:
+            self.local_sessions.append((transport, session))
+
+    def serve(self):
+        '''Принимает клиентов, пока брокер не остановлен или не завершится по простою.'''
+        self.listener = self.bind()
+        self.logger.info(f"Брокер соединений слушает {self.control_path}")
+        last_reap = time.monotonic()
+        try:
+            host_key = self.load_host_key()
+            while not self.stopped.is_set():
+                try:
+                    connection, _ = self.listener.accept()
+                except socket.timeout:
+                    connection = None
+                except OSError:
+                    break
+                if connection is not None:
+                    # Обмен ключами с клиентом идет в отдельном потоке и не задерживает других клиентов
+                    threading.Thread(target=self.accept, args=(connection, host_key), name="broker-accept", daemon=True).start()
+                if time.monotonic() - last_reap >= REAP_INTERVAL:
+                    last_reap = time.monotonic()
+                    if self.reap():
+                        self.logger.info("Брокер простаивал и завершает работу")
+                        break
+        finally:
+            self.close()
+
+    def stop(self):
+        '''Останавливает брокер из другого потока.'''
+        self.stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+
+    def close(self):
+        '''Закрывает сокет, клиентов и соединения с серверами.'''
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.remove(self.control_path)
+            except OSError:
+                pass
+        with self.lock:
+            sessions, self.local_sessions = self.local_sessions, []
+        for transport, _ in sessions:
+            transport.close()
+        self.pool.close()
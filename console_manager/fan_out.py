@@ -0,0 +1,75 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Сколько стендов обрабатывается одновременно по умолчанию
+DEFAULT_MAX_WORKERS = 8
+
+'''FanOut: выполняет одну и ту же команду на нескольких стендах параллельно.
+Каналы открываются поверх соединений из пула SSHClient, число одновременно обрабатываемых
+стендов ограничено max_workers, а каждая строка вывода помечается именем стенда.'''
+class FanOut:
+    def __init__(self, ssh_client, commands, max_workers=DEFAULT_MAX_WORKERS, output=sys.stdout):
+        self.ssh_client = ssh_client
+        self.commands = commands
+        self.max_workers = max_workers
+        self.output = output
+        self.print_lock = threading.Lock()
+
+    def print_line(self, stand, line, is_error=False):
+        '''Выводит строку с префиксом стенда, не смешивая ее со строками других потоков.'''
+        marker = "!" if is_error else "|"
+        text = f"[{stand}] {marker} {line}\n"
+        with self.print_lock:
+            self.output.write(text)
+            self.output.flush()
+        if self.ssh_client.recorder:
+            self.ssh_client.recorder.write(text)
+
+    def run_on_stand(self, stand, command, command_name="", label=None):
+        '''
+        Выполняет команду на одном стенде и возвращает (стенд, код завершения, время).
+
+        :param label: Префикс строк вывода вместо имени стенда (например, шаг сценария).
+        '''
+        label = label or stand
+        started = time.perf_counter()
+        pending = {False: b"", True: b""}
+
+        def on_output(data, is_error):
+            # Печатаем только целые строки, неполный хвост ждет следующего чанка
+            *lines, pending[is_error] = (pending[is_error] + data).split(b"\n")
+            for line in lines:
+                self.print_line(label, line.decode("utf-8", errors="replace").rstrip("\r"), is_error)
+
+        try:
+            # Метрики сессии помечаются стендом и командой в потоке этого стенда
+            with self.ssh_client.metrics.scope(stand, command_name):
+                exit_status = self.ssh_client.run_command(command, on_output)
+        except Exception as e:
+            self.print_line(label, f"Ошибка при выполнении команды: {e}", True)
+            exit_status = None
+
+        for is_error, rest in pending.items():
+            if rest:
+                self.print_line(label, rest.decode("utf-8", errors="replace").rstrip("\r"), is_error)
+        return stand, exit_status, time.perf_counter() - started
+
+    def run(self, command_name, stands, suffix=""):
+        '''Запускает команду command_name на стендах stands и возвращает результаты в порядке стендов.'''
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self.run_on_stand, stand, self.commands[stand][command_name] + suffix, command_name)
+                for stand in stands
+            ]
+            return [future.result() for future in futures]
+
+    def print_summary(self, results):
+        '''Выводит сводную таблицу кодов завершения по стендам.'''
+        width = max([len("Стенд")] + [len(stand) for stand, _, _ in results])
+        self.output.write(f"\n{'Стенд':<{width}}  Код   Время, с\n")
+        for stand, exit_status, elapsed in results:
+            status = "ошибка" if exit_status is None else str(exit_status)
+            self.output.write(f"{stand:<{width}}  {status:<6}{elapsed:.2f}\n")
+        self.output.flush()
@@ -0,0 +1,110 @@
+import time
+
+# Сколько ждать продолжения после одиночного ESC, прежде чем считать его клавишей Escape (в секундах)
+ESC_TIMEOUT = 0.05
+
+# Сколько байт ввода читать за один вызов
+INPUT_BUFFER_SIZE = 4096
+
+# Маркеры bracketed paste, которыми терминал обрамляет вставленный текст
+PASTE_START = b"\x1b[200~"
+PASTE_END = b"\x1b[201~"
+
+# msvcrt.getwch возвращает эти символы перед кодом специальной клавиши
+WINDOWS_KEY_PREFIXES = ("\x00", "\xe0")
+
+# Коды специальных клавиш Windows и соответствующие им последовательности xterm
+WINDOWS_KEYS = {
+    "H": "\x1bOA",     # вверх
+    "P": "\x1bOB",     # вниз
+    "M": "\x1bOC",     # вправо
+    "K": "\x1bOD",     # влево
+    "G": "\x1b[H",     # Home
+    "O": "\x1b[F",     # End
+    "R": "\x1b[2~",    # Insert
+    "S": "\x1b[3~",    # Delete
+    "I": "\x1b[5~",    # Page Up
+    "Q": "\x1b[6~",    # Page Down
+    ";": "\x1bOP",     # F1
+    "<": "\x1bOQ",     # F2
+    "=": "\x1bOR",     # F3
+    ">": "\x1bOS",     # F4
+    "?": "\x1b[15~",   # F5
+    "@": "\x1b[17~",   # F6
+    "A": "\x1b[18~",   # F7
+    "B": "\x1b[19~",   # F8
+    "C": "\x1b[20~",   # F9
+    "D": "\x1b[21~",   # F10
+    "\x85": "\x1b[23~",  # F11
+    "\x86": "\x1b[24~",  # F12
+    "s": "\x1b[1;5D",  # Ctrl + влево
+    "t": "\x1b[1;5C",  # Ctrl + вправо
+}
+
+
+'''KeyDecoder: разбирает ввод с клавиатуры на обычные символы и escape-последовательности
+(CSI и SS3: стрелки, Home/End, F1-F12, а также Alt + клавиша) и возвращает его одной пачкой
+для отправки в канал. Маркеры bracketed paste убираются, сам вставленный текст отправляется
+целиком. Неполная последовательность в конце прочитанного ждет продолжения не дольше ESC_TIMEOUT.'''
+class KeyDecoder:
+    def __init__(self, strip_paste_markers=True):
+        self.strip_paste_markers = strip_paste_markers
+        self.pending = b""
+        self.pending_since = 0.0
+
+    @staticmethod
+    def sequence_end(data, start):
+        '''Возвращает индекс конца escape-последовательности, которая начинается в start, или None, если она неполная.'''
+        if start + 1 >= len(data):
+            return None
+        kind = data[start + 1]
+        if kind == ord("["):
+            # CSI: параметры и промежуточные байты 0x20-0x3F, затем финальный байт
+            index = start + 2
+            while index < len(data) and 0x20 <= data[index] <= 0x3F:
+                index += 1
+            if index >= len(data):
+                return None
+            return index + 1
+        if kind == ord("O"):
+            # SS3: ровно один символ после ESC O
+            return start + 3 if start + 2 < len(data) else None
+        # Alt + клавиша: ESC и следующий символ
+        return start + 2
+
+    def feed(self, data):
+        '''Разбирает очередную порцию ввода и возвращает байты для отправки в канал.'''
+        data = self.pending + data
+        self.pending = b""
+        output = bytearray()
+        index = 0
+        while index < len(data):
+            escape = data.find(b"\x1b", index)
+            if escape == -1:
+                output += data[index:]
+                break
+            output += data[index:escape]
+            end = self.sequence_end(data, escape)
+            if end is None:
+                self.pending = data[escape:]
+                self.pending_since = time.monotonic()
+                break
+            sequence = data[escape:end]
+            if not (self.strip_paste_markers and sequence in (PASTE_START, PASTE_END)):
+                output += sequence
+            index = end
+        return bytes(output)
+
+    def expired(self):
+        '''Проверяет, что неполная последовательность ждет продолжения дольше ESC_TIMEOUT.'''
+        return bool(self.pending) and time.monotonic() - self.pending_since >= ESC_TIMEOUT
+
+    def flush(self):
+        '''Возвращает отложенные байты как есть (например, одиночное нажатие Escape).'''
+        data, self.pending = self.pending, b""
+        return data
+
+
+def translate_windows_key(code):
+    '''Переводит код специальной клавиши Windows (второй символ после префикса) в последовательность xterm.'''
+    return WINDOWS_KEYS.get(code, "")
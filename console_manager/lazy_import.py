@@ -0,0 +1,25 @@
+import sys
+
+
+'''LazyModule: модуль, который импортируется только при первом обращении к его атрибуту.
+Тяжелые зависимости (paramiko с cryptography, yaml) не замедляют запуск программы,
+пока они действительно не понадобятся.'''
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _import_module(self):
+        '''Импортирует модуль, если он еще не импортирован, и возвращает его.'''
+        if self._module is None:
+            # Импорт через __import__, чтобы его видел профилировщик запуска
+            __import__(self._name)
+            self.__dict__["_module"] = sys.modules[self._name]
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._import_module(), attr)
+
+    def __repr__(self):
+        state = "загружен" if self._module is not None else "не загружен"
+        return f"<LazyModule {self._name} ({state})>"
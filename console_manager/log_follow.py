@@ -0,0 +1,179 @@
+import re
+import sys
+import time
+import random
+import selectors
+from lazy_import import LazyModule
+from output_stream import OutputStream
+from result_cache import ResultCache
+
+paramiko = LazyModule("paramiko")
+
+# Сколько последних строк лога показать перед слежением
+DEFAULT_TAIL_LINES = 10
+
+# Задержка перед первой попыткой переподключения; каждая следующая вдвое дольше (в секундах)
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+# Сколько неудачных попыток переподключения подряд допускается (None - без ограничения)
+DEFAULT_MAX_RETRIES = 20
+
+# Размер буфера одного чтения из канала (в байтах)
+RECV_BUFFER_SIZE = 64 * 1024
+
+# Скрипт слежения: первая строка вывода - смещение в файле, с которого идут байты.
+# Отрицательное смещение означает "последние строки лога", смещение больше размера файла - ротацию.
+FOLLOW_SCRIPT = (
+    'f={file}; o={offset}; s=$(wc -c < "$f") || exit; '
+    'if [ "$o" -lt 0 ]; then o=$((s - $(tail -n {lines} "$f" | wc -c))); fi; '
+    'if [ "$o" -lt 0 ] || [ "$s" -lt "$o" ]; then o=0; fi; '
+    'echo "$o"; exec tail -c +$((o + 1)) -f "$f"'
+)
+
+
+class FollowError(Exception):
+    '''Слежение за логом не удалось: сервер ответил не так, как ожидает скрипт слежения.'''
+
+
+class ConnectionLost(FollowError):
+    '''Соединение с сервером оборвалось во время слежения за логом.'''
+
+
+'''LogFollower: следит за логом на сервере (как tail -f) и переживает обрывы соединения.
+Запоминается смещение в файле после последнего полученного байта; после обрыва соединение
+восстанавливается с экспоненциальной задержкой, и чтение продолжается с этого смещения
+через tail -c +N, поэтому уже показанные строки не выводятся повторно.
+По сети передается лог целиком, а фильтры include/exclude (регулярные выражения)
+применяются к строкам локально: так смещение всегда соответствует байтам файла.'''
+class LogFollower:
+    def __init__(self, ssh_client, log_file, lines=DEFAULT_TAIL_LINES, include=(), exclude=(), output=sys.stdout, errors=sys.stderr, max_retries=DEFAULT_MAX_RETRIES):
+        self.ssh_client = ssh_client
+        self.log_file = log_file
+        self.lines = lines
+        self.include = [re.compile(pattern) for pattern in include]
+        self.exclude = [re.compile(pattern) for pattern in exclude]
+        self.output = output
+        self.errors = errors
+        self.max_retries = max_retries
+        self.offset = None
+        self.pending = b""
+        self.reconnects = 0
+
+    def script(self):
+        '''Возвращает команду, которая выводит лог начиная с текущего смещения.'''
+        offset = -1 if self.offset is None else self.offset
+        return FOLLOW_SCRIPT.format(file=ResultCache.quote_path(self.log_file), offset=offset, lines=int(self.lines))
+
+    def keep(self, line):
+        '''Проверяет строку фильтрами include/exclude.'''
+        text = line.decode("utf-8", errors="replace")
+        if self.include and not any(pattern.search(text) for pattern in self.include):
+            return False
+        return not any(pattern.search(text) for pattern in self.exclude)
+
+    def write(self, stdout, data):
+        '''Выводит новые байты лога и сдвигает смещение.'''
+        self.offset += len(data)
+        if not (self.include or self.exclude):
+            stdout.write(data)
+            return
+        # Фильтруем только целые строки, неполный хвост ждет следующего чанка (в том числе после переподключения)
+        *lines, self.pending = (self.pending + data).split(b"\n")
+        for line in lines:
+            if self.keep(line):
+                stdout.write(line + b"\n")
+
+    def start_from(self, offset):
+        '''Применяет смещение, с которого сервер начал отдавать лог.'''
+        if self.offset is not None and offset != self.offset:
+            print(f"\nЛог {self.log_file} ротирован, чтение с начала файла.", file=self.errors)
+            self.pending = b""
+        self.offset = offset
+
+    def stream(self, stdout, stderr):
+        '''
+        Читает лог через один exec-канал, пока он не закроется.
+
+        :return: Код завершения tail на сервере.
+        :raises ConnectionLost: Если канал закрылся из-за обрыва соединения.
+        :raises FollowError: Если первая строка вывода - не смещение (например, приветствие сервера).
+        '''
+        channel = self.ssh_client.open_exec_channel(self.script())
+        header = b""
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(channel, selectors.EVENT_READ)
+                while True:
+                    selector.select()
+                    while channel.recv_ready():
+                        data = channel.recv(RECV_BUFFER_SIZE)
+                        self.ssh_client.metrics.add("bytes_in", len(data))
+                        if header is not None:
+                            # Первая строка - смещение, с которого сервер начал отдавать лог
+                            header += data
+                            if b"\n" not in header:
+                                continue
+                            line, _, data = header.partition(b"\n")
+                            try:
+                                offset = int(line)
+                            except ValueError:
+                                raise FollowError(f"вместо смещения в логе получено: {line[:200]!r}") from None
+                            self.start_from(offset)
+                            header = None
+                        self.write(stdout, data)
+                    stdout.flush()
+                    while channel.recv_stderr_ready():
+                        stderr.write(channel.recv_stderr(RECV_BUFFER_SIZE))
+                    stderr.flush()
+                    if (channel.eof_received or channel.closed) and not (
+                        channel.recv_ready() or channel.recv_stderr_ready()
+                    ):
+                        break
+
+            # EOF может прийти раньше кода завершения: пока соединение живо, код дожидаемся.
+            # При обрыве paramiko закрывает канал, не получив код завершения
+            transport = channel.get_transport()
+            connected = transport is not None and transport.is_active()
+            exit_status = channel.recv_exit_status() if connected else channel.exit_status
+            if exit_status == -1 and not (transport is not None and transport.is_active()):
+                raise ConnectionLost("канал закрыт без кода завершения")
+            return exit_status
+        finally:
+            channel.close()
+
+    def reconnect_delay(self, failures):
+        '''Возвращает задержку перед очередной попыткой: экспоненциальный рост со случайным разбросом.'''
+        delay = min(MAX_RECONNECT_DELAY, RECONNECT_DELAY * 2 ** (failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def follow(self):
+        '''
+        Следит за логом до завершения tail на сервере или прерывания пользователем (KeyboardInterrupt).
+
+        :return: Код завершения tail.
+        :raises ConnectionLost: Если соединение не удалось восстановить за max_retries попыток подряд.
+        '''
+        stdout = OutputStream(self.output)
+        stderr = OutputStream(self.errors)
+        failures = 0
+        try:
+            while True:
+                offset = self.offset
+                try:
+                    return self.stream(stdout, stderr)
+                except paramiko.AuthenticationException:
+                    raise
+                except (ConnectionLost, OSError, EOFError, paramiko.SSHException) as e:
+                    # Счетчик неудач сбрасывается, если до обрыва успели что-то получить
+                    failures = 1 if self.offset != offset else failures + 1
+                    if self.max_retries is not None and failures > self.max_retries:
+                        raise ConnectionLost(f"не удалось переподключиться за {self.max_retries} попыток: {e}") from e
+                    delay = self.reconnect_delay(failures)
+                    stdout.flush()
+                    print(f"\nСоединение потеряно ({e}). Переподключение через {delay:.1f} с (попытка {failures})...", file=self.errors)
+                    time.sleep(delay)
+                    self.reconnects += 1
+        finally:
+            stdout.close()
+            stderr.close()
@@ -0,0 +1,101 @@
+import re
+import shlex
+import sys
+import time
+import zlib
+from output_stream import OutputStream
+
+# Метка времени в строке лога (2024-01-31 12:00:00 или 2024-01-31T12:00:00); без {n}, так как mawk их не понимает
+AWK_TIMESTAMP = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9][ T][0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
+
+# Строки без метки времени (например, traceback) наследуют решение по последней метке
+AWK_TIME_FILTER = (
+    'BEGIN { keep = (since == "") } '
+    '{ if (match($0, /' + AWK_TIMESTAMP + '/)) { '
+    'ts = substr($0, RSTART, RLENGTH); sub("T", " ", ts); '
+    'keep = (since == "" || ts >= since) && (until == "" || ts <= until) } '
+    'if (keep) { print; fflush() } }'
+)
+
+
+'''LogQuery: фильтрует лог на стороне сервера, чтобы по сети передавалось только нужное.
+Из параметров строится конвейер grep/awk/head, который дописывается к команде из commands.yaml;
+вывод можно сжать gzip на сервере и распаковывать потоково на локальной машине.'''
+class LogQuery:
+    def __init__(self, include=(), exclude=(), levels=(), since=None, until=None, max_lines=None, max_bytes=None, compress=False):
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.levels = list(levels)
+        self.since = since
+        self.until = until
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.compress = compress
+
+        for level in self.levels:
+            if not re.fullmatch(r"\w+", level):
+                raise ValueError(f"Некорректный уровень логирования: {level}")
+
+    def filters(self):
+        '''Возвращает этапы конвейера фильтрации на стороне сервера.'''
+        stages = []
+        if self.since or self.until:
+            stages.append(
+                f"awk -v since={shlex.quote(self.since or '')} -v until={shlex.quote(self.until or '')} "
+                + shlex.quote(AWK_TIME_FILTER)
+            )
+        if self.include:
+            stages.append("grep --line-buffered " + " ".join(f"-e {shlex.quote(p)}" for p in self.include))
+        if self.exclude:
+            stages.append("grep --line-buffered -v " + " ".join(f"-e {shlex.quote(p)}" for p in self.exclude))
+        if self.levels:
+            stages.append("grep --line-buffered -E " + shlex.quote(r"\b(" + "|".join(self.levels) + r")\b"))
+        if self.max_lines:
+            stages.append(f"head -n {int(self.max_lines)}")
+        if self.max_bytes:
+            stages.append(f"head -c {int(self.max_bytes)}")
+        if self.compress:
+            stages.append("gzip -c -1")
+        return stages
+
+    def build(self, command):
+        '''Дописывает конвейер фильтрации к команде просмотра лога.'''
+        return " | ".join([command] + self.filters())
+
+    def run(self, ssh_client, command, output=sys.stdout, errors=sys.stderr):
+        '''
+        Выполняет запрос через exec-канал и выводит результат.
+
+        :return: Словарь со статистикой: код завершения, переданные и выведенные байты, время до первой строки.
+        '''
+        stdout = OutputStream(output)
+        stderr = OutputStream(errors)
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16) if self.compress else None
+        stats = {"exit_status": None, "received": 0, "written": 0, "first_line": None}
+        started = time.perf_counter()
+
+        def on_output(data, is_error):
+            if is_error:
+                stderr.write(data)
+                stderr.flush()
+                return
+            stats["received"] += len(data)
+            if decompressor:
+                data = decompressor.decompress(data)
+            if stats["first_line"] is None and b"\n" in data:
+                stats["first_line"] = time.perf_counter() - started
+            stats["written"] += len(data)
+            stdout.write(data)
+            stdout.flush()
+
+        try:
+            stats["exit_status"] = ssh_client.run_command(self.build(command), on_output)
+            if decompressor:
+                rest = decompressor.flush()
+                stats["written"] += len(rest)
+                stdout.write(rest)
+        finally:
+            stdout.close()
+            stderr.close()
+        stats["elapsed"] = time.perf_counter() - started
+        return stats
@@ -0,0 +1,172 @@
+import argparse
+import sys
+from startup_profiler import profiler
+from asciicast import AsciicastPlayer
+from cli import CLI
+from command_loader import CommandLoader
+from fan_out import DEFAULT_MAX_WORKERS
+from log_query import LogQuery
+from log_follow import DEFAULT_TAIL_LINES, DEFAULT_MAX_RETRIES
+from sftp_download import DEFAULT_WORKERS as DOWNLOAD_WORKERS
+from result_cache import ResultCache
+from control_master import ControlMaster, CONTROL_PATH, DEFAULT_IDLE_TIMEOUT, is_supported as control_supported
+
+def positive_float(value):
+    '''Тип аргумента argparse: число больше нуля.'''
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"нужно число больше нуля: {value}")
+    return number
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Выполнение команд на тестовых стендах по SSH.")
+    parser.add_argument("--record", metavar="FILE", help="записывать вывод сессий в файл (с ротацией по размеру)")
+    parser.add_argument("--compress-records", action="store_true", help="сжимать ротированные файлы записи gzip")
+    parser.add_argument("--profile-startup", action="store_true", help="вывести при выходе время этапов запуска и импортов")
+    parser.add_argument("--cast-dir", metavar="DIR", help="записывать каждую интерактивную сессию в DIR в формате asciicast")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать кэш результатов команд")
+    parser.add_argument(
+        "--control", choices=("off", "use", "auto"), default="use",
+        help="брокер соединений: use - подключаться через запущенный брокер, auto - запускать его при необходимости, off - всегда напрямую",
+    )
+    parser.add_argument("--control-path", default=CONTROL_PATH, help="Unix-сокет брокера соединений")
+    parser.add_argument("--metrics-file", metavar="FILE", help="сохранить метрики сессий при выходе: FILE.json - в JSON, иначе в формате Prometheus")
+    subparsers = parser.add_subparsers(dest="mode")
+
+    run_parser = subparsers.add_parser("run", help="выполнить команду на нескольких стендах без интерактивного меню")
+    run_parser.add_argument("command", help="название команды из commands.yaml, например 'restart celery'")
+    run_parser.add_argument("--stands", default="all", help="'all' или список стендов через запятую")
+    run_parser.add_argument("--grep", default="", help="параметр grep для фильтрации вывода")
+    run_parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="сколько стендов обрабатывать одновременно")
+
+    logs_parser = subparsers.add_parser("logs", help="просмотр лога с фильтрацией на стороне сервера")
+    logs_parser.add_argument("command", help="команда просмотра лога, например 'full celery logs'")
+    logs_parser.add_argument("--stand", required=True, help="стенд")
+    logs_parser.add_argument("--include", action="append", default=[], help="оставить строки с шаблоном (можно несколько)")
+    logs_parser.add_argument("--exclude", action="append", default=[], help="убрать строки с шаблоном (можно несколько)")
+    logs_parser.add_argument("--level", action="append", default=[], help="уровень логирования, например ERROR (можно несколько)")
+    logs_parser.add_argument("--since", help="начиная с времени 'ГГГГ-ММ-ДД ЧЧ:ММ:СС'")
+    logs_parser.add_argument("--until", help="заканчивая временем 'ГГГГ-ММ-ДД ЧЧ:ММ:СС'")
+    logs_parser.add_argument("--max-lines", type=int, help="не больше N строк")
+    logs_parser.add_argument("--max-bytes", type=int, help="не больше N байт")
+    logs_parser.add_argument("--compress", action="store_true", help="сжимать вывод gzip на сервере")
+
+    playbook_parser = subparsers.add_parser("playbook", help="выполнить сценарий команд из YAML файла")
+    playbook_parser.add_argument("file", help="файл сценария со списком шагов (стенд, команда, параметры)")
+    playbook_parser.add_argument("--workers", type=int, help="сколько шагов выполнять одновременно (по умолчанию из сценария или 8)")
+    playbook_parser.add_argument("--fail-fast", action="store_true", help="не запускать новые шаги после первой ошибки")
+    playbook_parser.add_argument("--report", metavar="FILE", help="сохранить результаты шагов в JSON")
+
+    follow_parser = subparsers.add_parser("follow", help="следить за логом с продолжением после обрыва соединения")
+    follow_parser.add_argument("command", help="команда в режиме follow, например 'tail celery logs'")
+    follow_parser.add_argument("--stand", required=True, help="стенд")
+    follow_parser.add_argument("--include", action="append", default=[], help="показывать строки с регулярным выражением (можно несколько)")
+    follow_parser.add_argument("--exclude", action="append", default=[], help="скрывать строки с регулярным выражением (можно несколько)")
+    follow_parser.add_argument("--lines", type=int, default=DEFAULT_TAIL_LINES, help="сколько последних строк показать в начале")
+    follow_parser.add_argument("--retries", type=int, default=DEFAULT_MAX_RETRIES, help="сколько неудачных переподключений подряд допускается")
+
+    download_parser = subparsers.add_parser("download", help="скачать каталог логов стенда по SFTP")
+    download_parser.add_argument("--stand", required=True, help="стенд")
+    download_parser.add_argument("--to", metavar="DIR", help="локальный каталог (по умолчанию - имя стенда)")
+    download_parser.add_argument("--path", help="файл или каталог на сервере (по умолчанию - logs из commands.yaml)")
+    download_parser.add_argument("--match", help="шаблон имени файла, например 'celery_*.log'")
+    download_parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="сколько SFTP-каналов использовать одновременно")
+    download_parser.add_argument("--decompress", action="store_true", help="распаковывать файлы .gz при скачивании")
+
+    replay_parser = subparsers.add_parser("replay", help="воспроизвести запись сессии asciicast")
+    replay_parser.add_argument("file", help="файл записи .cast")
+    replay_parser.add_argument("--speed", type=positive_float, default=1.0, help="ускорение воспроизведения")
+    replay_parser.add_argument("--instant", action="store_true", help="вывести запись сразу, без пауз")
+    replay_parser.add_argument("--seek", type=float, default=0.0, help="начать с указанной секунды записи")
+
+    cache_parser = subparsers.add_parser("cache", help="статистика кэша результатов команд")
+    cache_parser.add_argument("--clear", action="store_true", help="очистить кэш")
+
+    broker_parser = subparsers.add_parser("broker", help="держать SSH-соединения открытыми для следующих запусков программы")
+    broker_parser.add_argument("--idle-timeout", type=int, default=DEFAULT_IDLE_TIMEOUT, help="через сколько секунд без сессий закрывать соединение")
+    return parser.parse_args()
+
+def print_cache_stats(result_cache, clear=False):
+    '''Выводит статистику кэша результатов и при необходимости очищает его.'''
+    stats = result_cache.stats
+    requests = stats["hits"] + stats["misses"] + stats["refreshes"]
+    hit_rate = (stats["hits"] + stats["refreshes"]) / requests * 100 if requests else 0.0
+    size = sum(entry["size"] for entry in result_cache.entries.values())
+    print(f"Записей: {len(result_cache.entries)}, размер: {size} байт (не больше {result_cache.max_bytes})")
+    print(f"Попадания: {stats['hits']}, дочитывания логов: {stats['refreshes']}, промахи: {stats['misses']}, вытеснения: {stats['evictions']}")
+    print(f"Доля запросов с использованием кэша: {hit_rate:.1f}%")
+    print(f"Отдано из кэша: {stats['served_bytes']} байт, получено от сервера: {stats['fetched_bytes']} байт")
+    if clear:
+        result_cache.clear()
+        print("Кэш очищен.")
+
+def run_broker(control_path, idle_timeout):
+    '''Запускает брокер соединений и работает до его завершения по простою.'''
+    if not control_supported():
+        print("Брокер соединений работает только на Mac/Linux.")
+        return 2
+    try:
+        ControlMaster(control_path, idle_timeout).serve()
+    except RuntimeError as e:
+        print(e)
+        return 1
+    return 0
+
+def main():
+    args = parse_args()
+    if args.profile_startup:
+        profiler.enable()
+        # Отсчет идет от импорта startup_profiler, поэтому отметка показывает время импортов программы
+        profiler.mark("импорт модулей и аргументы")
+    try:
+        if args.mode == "replay":
+            AsciicastPlayer(args.file).play(speed=args.speed, instant=args.instant, start=args.seek)
+            return 0
+        if args.mode == "cache":
+            print_cache_stats(ResultCache(), args.clear)
+            return 0
+        if args.mode == "broker":
+            return run_broker(args.control_path, args.idle_timeout)
+
+        with profiler.phase("загрузка команд"):
+            commands = CommandLoader.load_commands("commands.yaml")
+        cli = CLI(
+            commands, record_path=args.record, compress_records=args.compress_records, cast_dir=args.cast_dir, use_cache=not args.no_cache,
+            control_path=None if args.control == "off" else args.control_path, start_broker=args.control == "auto",
+        )
+        try:
+            return run_mode(cli, args)
+        finally:
+            if args.metrics_file:
+                cli.metrics.export(args.metrics_file)
+    finally:
+        profiler.report()
+
+def run_mode(cli, args):
+    '''Запускает выбранный режим CLI и возвращает код выхода программы.'''
+    if args.mode == "run":
+        stands = [stand.strip() for stand in args.stands.split(",") if stand.strip()]
+        return cli.run(args.command, stands, args.grep, args.workers)
+    if args.mode == "logs":
+        log_query = LogQuery(
+            include=args.include, exclude=args.exclude, levels=args.level,
+            since=args.since, until=args.until,
+            max_lines=args.max_lines, max_bytes=args.max_bytes, compress=args.compress,
+        )
+        return cli.query_logs(args.command, args.stand, log_query)
+    if args.mode == "download":
+        return cli.download(args.stand, args.to, args.path, args.match, args.workers, args.decompress)
+    if args.mode == "playbook":
+        return cli.playbook(args.file, args.workers, args.fail_fast, args.report)
+    if args.mode == "follow":
+        return cli.follow(args.command, args.stand, args.include, args.exclude, args.lines, args.retries)
+    cli.start()
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\nПрограмма завершена пользователем.")
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
\ No newline at end of file
@@ -0,0 +1,211 @@
+import re
+import time
+from output_stream import OutputStream
+
+# Режимы отображения вывода команды: как есть, без управляющих последовательностей,
+# с подсветкой уровней логирования или в окне высотой с терминал, которое пропускает уехавшие за экран строки
+RAW_VIEW = "raw"
+PLAIN_VIEW = "plain"
+HIGHLIGHT_VIEW = "highlight"
+VIEWPORT_VIEW = "viewport"
+OUTPUT_VIEWS = (RAW_VIEW, PLAIN_VIEW, HIGHLIGHT_VIEW, VIEWPORT_VIEW)
+
+# Управляющие последовательности терминала: CSI (цвета, перемещение курсора), OSC (заголовок окна)
+# и короткие ESC-последовательности (выбор кодировки, сохранение курсора)
+ANSI_SEQUENCE_PATTERN = re.compile(rb'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[ -/]*[0-Z\\^-~])')
+
+# Самая длинная незавершенная последовательность, которую ждем из следующего чанка (в байтах);
+# длиннее - это не последовательность, а мусор, и он выводится как есть
+MAX_SEQUENCE_LENGTH = 256
+
+# Неполная строка длиннее этого (в байтах) выводится частями, а не копится до перевода строки
+MAX_LINE_LENGTH = 64 * 1024
+
+# Подсвечиваемые уровни логирования: ошибки красным, предупреждения желтым.
+# Подсветка - замена подстрок, а не регулярное выражение: bytes.replace в разы быстрее на мегабайтах лога
+RESET_COLOR = b"\x1b[0m"
+LOG_LEVEL_COLORS = tuple(
+    (level, color + level + RESET_COLOR)
+    for levels, color in (((b"ERROR", b"CRITICAL", b"FATAL", b"Traceback"), b"\x1b[31m"), ((b"WARNING",), b"\x1b[33m"))
+    for level in levels
+)
+
+# Начала слов уровней: такой конец вывода придерживается до следующего сброса,
+# чтобы слово, разрезанное между сбросами ("ERR" + "OR"), все равно было подсвечено
+LEVEL_PREFIXES = frozenset(level[:length] for level, _ in LOG_LEVEL_COLORS for length in range(1, len(level)))
+MAX_LEVEL_PREFIX = max(len(prefix) for prefix in LEVEL_PREFIXES)
+
+
+def tail_offset(data, keep):
+    '''Возвращает смещение начала последних keep строк в data (data заканчивается переводом строки).'''
+    position = len(data) - 1
+    for _ in range(keep):
+        position = data.rfind(b"\n", 0, position)
+        if position == -1:
+            return 0
+    return position + 1
+
+
+'''AnsiStripper: удаляет управляющие последовательности из потока чанков.
+Последовательность, разрезанная между чанками, не выводится обрывком: ее начало
+придерживается до следующего чанка.'''
+class AnsiStripper:
+    def __init__(self):
+        self.held = b""
+
+    def feed(self, data):
+        '''Возвращает чанк без управляющих последовательностей.'''
+        if self.held:
+            data = self.held + data
+            self.held = b""
+        start = data.rfind(b"\x1b")
+        if start != -1 and len(data) - start < MAX_SEQUENCE_LENGTH and not ANSI_SEQUENCE_PATTERN.match(data, start):
+            self.held = data[start:]
+            data = data[:start]
+        return ANSI_SEQUENCE_PATTERN.sub(b"", data)
+
+    def close(self):
+        '''Возвращает придержанный обрывок: поток закончился, и последовательность уже не завершится.'''
+        held, self.held = self.held, b""
+        return held
+
+
+def level_prefix_length(data):
+    '''Возвращает длину конца data, который может оказаться началом слова уровня (0 - такого нет).'''
+    for length in range(min(MAX_LEVEL_PREFIX, len(data)), 0, -1):
+        if data[-length:] in LEVEL_PREFIXES:
+            return length
+    return 0
+
+
+def highlight_levels(data):
+    '''Подсвечивает уровни логирования в выводе.'''
+    for level, colored in LOG_LEVEL_COLORS:
+        if level in data:
+            data = data.replace(level, colored)
+    return data
+
+
+'''OutputFilter: поток вывода с тем же интерфейсом, что и OutputStream, который пропускает вывод
+через фильтры режима view: удаление управляющих последовательностей, подсветку уровней
+логирования и окно на height строк. Вывод копится до сброса; если между сбросами пришло больше
+height строк, на экран попадают только последние height, а вместо остальных - одна строка
+с их количеством. Так миллионы строк лога не упираются в скорость отрисовки терминала
+(особенно консоли Windows): сброс не чаще min_flush_interval выводит не больше экрана.'''
+class OutputFilter:
+    def __init__(self, stream, view=PLAIN_VIEW, height=None, encoding="utf-8", min_flush_interval=0.0):
+        self.output = OutputStream(stream, encoding)
+        self.encoding = encoding
+        self.stripper = AnsiStripper()
+        self.highlight = view in (HIGHLIGHT_VIEW, VIEWPORT_VIEW)
+        self.height = max(1, height - 1) if view == VIEWPORT_VIEW and height else None
+        self.screen = bytearray()
+        self.lines = 0
+        self.partial = b""
+        self.line_open = False
+        self.dropped = 0
+        self.total_dropped = 0
+        self.pending = 0
+        self.min_flush_interval = min_flush_interval
+        self.last_flush = 0.0
+
+    def write(self, data):
+        '''Записывает чанк байтов без немедленного сброса потока.'''
+        self.pending += len(data)
+        data = self.partial + self.stripper.feed(data)
+        end = data.rfind(b"\n") + 1
+        self.partial = data[end:]
+        if end:
+            self.add_lines(data[:end] if end < len(data) else data)
+        if len(self.partial) > MAX_LINE_LENGTH:
+            self.screen += self.partial
+            self.partial = b""
+
+    def add_lines(self, block):
+        '''Добавляет полные строки в окно, вытесняя из него строки, которые уже не поместятся на экран.'''
+        if self.height is None:
+            self.screen += block
+            return
+        count = block.count(b"\n")
+        if count >= self.height:
+            # Блок сам по себе больше окна: от него и от накопленного остается только хвост
+            self.dropped += self.lines + count - self.height
+            self.screen = bytearray(block[tail_offset(block, self.height):])
+            self.lines = self.height
+            return
+        self.screen += block
+        self.lines += count
+        if self.lines > self.height:
+            del self.screen[:tail_offset(self.screen, self.height)]
+            self.dropped += self.lines - self.height
+            self.lines = self.height
+
+    def render(self, final=False):
+        '''Выводит накопленные строки окна и неполную последнюю строку.'''
+        if self.dropped:
+            # Если на экран уже выведено начало строки, пометка о пропуске начинается с новой строки
+            prefix = "\n" if self.line_open else ""
+            self.output.write(f"{prefix}... пропущено строк: {self.dropped} ...\n".encode(self.encoding))
+            self.total_dropped += self.dropped
+            self.dropped = 0
+        data = bytes(self.screen) + self.partial
+        if final:
+            data += self.stripper.close()
+        self.screen.clear()
+        self.lines = 0
+        self.partial = b""
+        if self.highlight and not final:
+            # Возможное начало слова уровня ждет продолжения; остальная неполная строка (например,
+            # вопрос программы) выводится сразу
+            held = level_prefix_length(data)
+            if held:
+                self.partial = data[-held:]
+                data = data[:-held]
+        if data:
+            self.output.write(highlight_levels(data) if self.highlight else data)
+            self.line_open = not data.endswith(b"\n")
+
+    def flush(self):
+        '''Выводит и сбрасывает накопленное, если с прошлого сброса что-то было записано.'''
+        if not self.pending:
+            return
+        self.render()
+        self.output.flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def paced_flush(self):
+        '''
+        Сбрасывает вывод, если с прошлого сброса прошло не меньше min_flush_interval.
+
+        :return: Через сколько секунд нужно вызвать paced_flush снова или None, если сбрасывать нечего.
+        '''
+        if not self.pending:
+            return None
+        remaining = self.last_flush + self.min_flush_interval - time.monotonic()
+        if remaining <= 0:
+            self.flush()
+            return None
+        return remaining
+
+    def close(self):
+        '''Выводит остаток вывода и сообщает, сколько строк пропущено окном.'''
+        self.render(final=True)
+        if self.total_dropped:
+            prefix = "\n" if self.line_open else ""
+            self.output.write(f"{prefix}... всего пропущено строк: {self.total_dropped}, полный вывод - в записи сессии (--record) ...\n".encode(self.encoding))
+        self.output.close()
+
+
+def create_output(stream, view=RAW_VIEW, height=None, min_flush_interval=0.0):
+    '''
+    Создает поток вывода для режима отображения view.
+    Подсветка и окно нужны только в терминале: при выводе в файл или канал
+    управляющие последовательности удаляются, а строки не пропускаются.
+    '''
+    if view == RAW_VIEW:
+        return OutputStream(stream, min_flush_interval=min_flush_interval)
+    isatty = getattr(stream, "isatty", None)
+    if view != PLAIN_VIEW and not (isatty and isatty()):
+        view = PLAIN_VIEW
+    return OutputFilter(stream, view, height, min_flush_interval=min_flush_interval)
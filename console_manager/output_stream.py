@@ -0,0 +1,63 @@
+import codecs
+import time
+
+'''OutputStream: выводит байты, полученные от сервера, в локальный поток (stdout/stderr).
+Если у потока есть бинарный буфер, байты пишутся в него напрямую без декодирования.
+Иначе они декодируются инкрементально, чтобы многобайтовые символы (например, кириллица),
+разрезанные между двумя чанками, не терялись.
+paced_flush сбрасывает вывод не чаще min_flush_interval, чтобы полноэкранные программы
+не перерисовывали терминал чаще, чем он успевает отобразить.'''
+class OutputStream:
+    def __init__(self, stream, encoding="utf-8", min_flush_interval=0.0):
+        self.stream = stream
+        self.buffer = getattr(stream, "buffer", None)
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.pending = 0
+        self.min_flush_interval = min_flush_interval
+        self.last_flush = 0.0
+
+        # Сбрасываем текст, накопленный в текстовом слое, чтобы не нарушить порядок вывода
+        self.stream.flush()
+
+    def write(self, data):
+        '''Записывает чанк байтов без немедленного сброса потока.'''
+        if self.buffer is not None:
+            self.buffer.write(data)
+        else:
+            text = self.decoder.decode(data)
+            if text:
+                self.stream.write(text)
+        self.pending += len(data)
+
+    def flush(self):
+        '''Сбрасывает накопленный вывод, если с прошлого сброса что-то было записано.'''
+        if not self.pending:
+            return
+        if self.buffer is not None:
+            self.buffer.flush()
+        self.stream.flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def paced_flush(self):
+        '''
+        Сбрасывает вывод, если с прошлого сброса прошло не меньше min_flush_interval.
+
+        :return: Через сколько секунд нужно вызвать paced_flush снова или None, если сбрасывать нечего.
+        '''
+        if not self.pending:
+            return None
+        remaining = self.last_flush + self.min_flush_interval - time.monotonic()
+        if remaining <= 0:
+            self.flush()
+            return None
+        return remaining
+
+    def close(self):
+        '''Дописывает остаток недекодированных байтов и сбрасывает поток.'''
+        if self.buffer is None:
+            text = self.decoder.decode(b"", final=True)
+            if text:
+                self.stream.write(text)
+                self.pending += len(text)
+        self.flush()
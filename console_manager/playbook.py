@@ -0,0 +1,251 @@
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from command_loader import CommandLoader, FOLLOW_MODE
+from fan_out import FanOut, DEFAULT_MAX_WORKERS
+from lazy_import import LazyModule
+
+yaml = LazyModule("yaml")
+
+# Состояния шага сценария в отчете
+STEP_OK = "ok"
+STEP_FAILED = "failed"
+STEP_SKIPPED = "skipped"
+
+# Ключи, которые можно задать у шага сценария
+STEP_KEYS = {"id", "stand", "command", "params", "grep", "needs", "allow_failure"}
+
+
+'''PlaybookStep: один шаг сценария - команда из commands.yaml на одном стенде.
+params дописывается к команде как есть (как имя скрипта в "run script"), grep - как в меню (" | grep ...").'''
+class PlaybookStep:
+    def __init__(self, step_id, stand, command_name, params="", grep="", needs=(), allow_failure=False):
+        self.id = step_id
+        self.stand = stand
+        self.command_name = command_name
+        self.params = params
+        self.grep = grep
+        self.needs = list(needs)
+        self.allow_failure = allow_failure
+
+    def command(self, commands):
+        '''Подставляет шаблон команды для стенда и дописывает параметры.'''
+        command = commands[self.stand][self.command_name] + self.params
+        if self.grep:
+            command += " | grep " + self.grep
+        return command
+
+
+'''Playbook: сценарий из YAML - список шагов (стенд, команда, параметры) с зависимостями.
+Шаг с несколькими стендами разворачивается в отдельные шаги "id[стенд]", а зависимость
+от такого шага означает зависимость от всех его стендов. Сценарий проверяется целиком
+до запуска: неизвестные стенды, команды и зависимости, а также циклы - ошибка ValueError.'''
+class Playbook:
+    def __init__(self, steps, fail_fast=False, max_workers=DEFAULT_MAX_WORKERS):
+        self.steps = steps
+        self.fail_fast = fail_fast
+        self.max_workers = max_workers
+
+    @staticmethod
+    def load(file_path, commands):
+        '''Загружает сценарий из YAML файла и проверяет его по командам commands.yaml.'''
+        with open(file_path, "rb") as file:
+            parsed = yaml.load(file, Loader=CommandLoader.safe_loader())
+        if isinstance(parsed, list):
+            parsed = {"steps": parsed}
+        if not isinstance(parsed, dict) or not isinstance(parsed.get("steps"), list):
+            raise ValueError("Сценарий должен содержать список шагов steps")
+        return Playbook(
+            Playbook.parse_steps(parsed["steps"], commands),
+            fail_fast=bool(parsed.get("fail_fast", False)),
+            max_workers=int(parsed.get("workers", DEFAULT_MAX_WORKERS)),
+        )
+
+    @staticmethod
+    def parse_steps(raw_steps, commands):
+        '''Разворачивает описания шагов в PlaybookStep и проверяет их.'''
+        steps = []
+        groups = {}
+        for index, raw in enumerate(raw_steps, 1):
+            if not isinstance(raw, dict):
+                raise ValueError(f"Шаг {index}: ожидается словарь с ключами stand и command")
+            unknown = set(raw) - STEP_KEYS
+            if unknown:
+                raise ValueError(f"Шаг {index}: неизвестные ключи {', '.join(sorted(unknown))}")
+            if "stand" not in raw or "command" not in raw:
+                raise ValueError(f"Шаг {index}: нужны stand и command")
+
+            group = str(raw.get("id", f"step{index}"))
+            if group in groups:
+                raise ValueError(f"Шаг {index}: повторяющийся id '{group}'")
+            stands = raw["stand"] if isinstance(raw["stand"], list) else [raw["stand"]]
+            if stands == ["all"]:
+                stands = list(commands)
+            for position, stand in enumerate(stands):
+                if stand in stands[:position]:
+                    raise ValueError(f"Шаг '{group}': стенд '{stand}' указан дважды")
+            command_name = raw["command"]
+            needs = raw.get("needs", [])
+            needs = needs if isinstance(needs, list) else [needs]
+
+            groups[group] = []
+            for stand in stands:
+                if stand not in commands:
+                    raise ValueError(f"Шаг '{group}': неизвестный стенд '{stand}'")
+                if command_name not in commands[stand]:
+                    raise ValueError(f"Шаг '{group}': неизвестная команда '{command_name}'")
+                mode = getattr(commands, "mode", None)
+                if mode and mode(command_name) == FOLLOW_MODE:
+                    raise ValueError(f"Шаг '{group}': команда в режиме follow не завершается сама и не может быть шагом сценария")
+                step_id = group if len(stands) == 1 else f"{group}[{stand}]"
+                step = PlaybookStep(
+                    step_id, stand, command_name,
+                    params=str(raw.get("params", "")), grep=str(raw.get("grep", "")),
+                    needs=[str(need) for need in needs], allow_failure=bool(raw.get("allow_failure", False)),
+                )
+                groups[group].append(step.id)
+                steps.append(step)
+
+        # Зависимости от группы заменяются зависимостями от всех ее шагов
+        for step in steps:
+            resolved = []
+            for need in step.needs:
+                if need not in groups:
+                    raise ValueError(f"Шаг '{step.id}': неизвестная зависимость '{need}'")
+                resolved += groups[need]
+            step.needs = resolved
+        Playbook.check_cycles(steps)
+        return steps
+
+    @staticmethod
+    def check_cycles(steps):
+        '''Проверяет, что зависимости не образуют цикл (алгоритм Кана).'''
+        waiting = {step.id: len(step.needs) for step in steps}
+        dependents = {step.id: [] for step in steps}
+        for step in steps:
+            for need in step.needs:
+                dependents[need].append(step.id)
+        ready = [step_id for step_id, count in waiting.items() if count == 0]
+        while ready:
+            for dependent in dependents[ready.pop()]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+        cycle = [step_id for step_id, count in waiting.items() if count > 0]
+        if cycle:
+            raise ValueError(f"Циклические зависимости между шагами: {', '.join(cycle)}")
+
+
+'''PlaybookRunner: выполняет сценарий через exec-каналы одного SSH-соединения из пула.
+Шаг запускается, как только выполнены все его зависимости, поэтому независимые шаги идут
+параллельно (не больше max_workers), а каналы мультиплексируются по одному соединению.
+Если шаг завершился с ошибкой, зависимые от него шаги пропускаются (кроме шагов после
+allow_failure); при fail_fast после первой ошибки новые шаги не запускаются.'''
+class PlaybookRunner:
+    def __init__(self, ssh_client, commands, playbook, output=sys.stdout):
+        self.ssh_client = ssh_client
+        self.commands = commands
+        self.playbook = playbook
+        self.output = output
+        self.fan_out = FanOut(ssh_client, commands, max_workers=playbook.max_workers, output=output)
+        self.steps = {step.id: step for step in playbook.steps}
+        self.results = {}
+        self.elapsed = 0.0
+
+    def run_step(self, step, started):
+        '''Выполняет шаг и возвращает его результат.'''
+        offset = time.perf_counter() - started
+        _, exit_status, elapsed = self.fan_out.run_on_stand(step.stand, step.command(self.commands), step.command_name, label=step.id)
+        return {
+            "id": step.id, "stand": step.stand, "command": step.command_name,
+            "status": STEP_OK if exit_status == 0 else STEP_FAILED,
+            "exit_status": exit_status, "started": offset, "elapsed": elapsed,
+        }
+
+    def skip(self, step, reason):
+        '''Отмечает шаг пропущенным.'''
+        self.fan_out.print_line(step.id, f"Шаг пропущен: {reason}", True)
+        self.results[step.id] = {
+            "id": step.id, "stand": step.stand, "command": step.command_name,
+            "status": STEP_SKIPPED, "exit_status": None, "started": None, "elapsed": 0.0, "reason": reason,
+        }
+
+    def blocked_by(self, step):
+        '''Возвращает зависимость, из-за которой шаг нельзя выполнить, или None.'''
+        for need in step.needs:
+            result = self.results[need]
+            if result["status"] == STEP_SKIPPED:
+                return f"пропущен шаг {need}"
+            if result["status"] == STEP_FAILED and not self.steps[need].allow_failure:
+                return f"ошибка в шаге {need}"
+        return None
+
+    def run(self):
+        '''
+        Выполняет сценарий.
+
+        :return: Результаты шагов в порядке сценария: словари с id, стендом, командой, состоянием,
+                 кодом завершения, временем начала от старта сценария и длительностью.
+        '''
+        started = time.perf_counter()
+        pending = list(self.playbook.steps)
+        running = {}
+        failed = False
+        with ThreadPoolExecutor(max_workers=self.playbook.max_workers) as executor:
+            while pending or running:
+                for step in list(pending):
+                    if failed and self.playbook.fail_fast:
+                        pending.remove(step)
+                        self.skip(step, "сценарий остановлен после ошибки")
+                        continue
+                    if not all(need in self.results for need in step.needs):
+                        continue
+                    pending.remove(step)
+                    reason = self.blocked_by(step)
+                    if reason:
+                        self.skip(step, reason)
+                    else:
+                        running[executor.submit(self.run_step, step, started)] = step
+                if not running:
+                    # Пропуск шага мог разблокировать другие шаги (они тоже будут пропущены)
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    result = future.result()
+                    self.results[step.id] = result
+                    if result["status"] == STEP_FAILED and not step.allow_failure:
+                        failed = True
+        self.elapsed = time.perf_counter() - started
+        return [self.results[step.id] for step in self.playbook.steps]
+
+    def print_summary(self, results):
+        '''Выводит таблицу шагов: состояние, код завершения, начало и длительность.'''
+        width = max([len("Шаг")] + [len(result["id"]) for result in results])
+        self.output.write(f"\n{'Шаг':<{width}}  {'Стенд':<12} {'Состояние':<10} {'Код':<6} {'Начало, с':>9} {'Время, с':>9}\n")
+        for result in results:
+            exit_status = "-" if result["exit_status"] is None else str(result["exit_status"])
+            offset = "-" if result["started"] is None else f"{result['started']:.2f}"
+            self.output.write(
+                f"{result['id']:<{width}}  {result['stand']:<12} {result['status']:<10} {exit_status:<6} "
+                f"{offset:>9} {result['elapsed']:>9.2f}\n"
+            )
+        counts = {status: sum(result["status"] == status for result in results) for status in (STEP_OK, STEP_FAILED, STEP_SKIPPED)}
+        self.output.write(
+            f"Успешно: {counts[STEP_OK]}, с ошибкой: {counts[STEP_FAILED]}, пропущено: {counts[STEP_SKIPPED]}. "
+            f"Всего {self.elapsed:.2f} с\n"
+        )
+        self.output.flush()
+
+    def succeeded(self, results):
+        '''Проверяет, что все шаги выполнены успешно (ошибки шагов с allow_failure не считаются).'''
+        return all(
+            result["status"] == STEP_OK or (result["status"] == STEP_FAILED and self.steps[result["id"]].allow_failure)
+            for result in results
+        )
+
+    def save_report(self, results, file_path):
+        '''Сохраняет результаты шагов в JSON.'''
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump({"elapsed": self.elapsed, "steps": results}, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,55 @@
+import re
+
+# Сколько последних байт хранить между чанками при поиске prompt по регулярному выражению
+PROMPT_WINDOW_SIZE = 256
+
+'''PromptMatcher: ищет prompt в потоке вывода, который приходит от сервера чанками.
+Между чанками хранится только хвост ограниченного размера, поэтому prompt, разрезанный
+между двумя вызовами recv, не теряется, а каждый новый чанк просматривается один раз.
+Prompt может быть строкой или скомпилированным регулярным выражением.'''
+class PromptMatcher:
+    def __init__(self, prompt, window_size=PROMPT_WINDOW_SIZE):
+        if isinstance(prompt, re.Pattern):
+            self.literal = None
+            self.pattern = self.to_bytes_pattern(prompt)
+            self.window_size = window_size
+        else:
+            self.literal = prompt.encode("utf-8") if isinstance(prompt, str) else prompt
+            self.pattern = None
+            # Для строки достаточно хвоста на один байт короче самого prompt
+            self.window_size = len(self.literal) - 1
+        self.tail = b""
+
+    @staticmethod
+    def to_bytes_pattern(pattern):
+        '''Приводит строковое регулярное выражение к байтовому, так как вывод канала не декодируется.'''
+        if isinstance(pattern.pattern, bytes):
+            return pattern
+        return re.compile(pattern.pattern.encode("utf-8"), pattern.flags & ~re.UNICODE)
+
+    def search(self, data):
+        '''Проверяет, встречается ли prompt в data.'''
+        if self.literal is not None:
+            return self.literal in data
+        return self.pattern.search(data) is not None
+
+    def feed(self, data):
+        '''Принимает очередной чанк и возвращает True, если prompt найден.'''
+        if self.literal is not None:
+            # Стык хвоста и начала чанка проверяем отдельно, чтобы не копировать весь чанк
+            boundary = self.tail + data[:self.window_size]
+            found = self.search(boundary) or self.search(data)
+        else:
+            # Выражение ищется в хвосте и чанке целиком: на обрезанном стыке выражение с якорем
+            # конца ($) совпало бы с выводом, который на самом деле продолжается. Совпадение,
+            # целиком лежащее в хвосте, уже найдено в прошлом чанке и не считается
+            boundary = self.tail + data
+            found = any(match.end() > len(self.tail) for match in self.pattern.finditer(boundary))
+
+        if self.window_size <= 0:
+            self.tail = b""
+        elif len(data) >= self.window_size:
+            self.tail = data[-self.window_size:]
+        else:
+            self.tail = boundary[-self.window_size:]
+        return found
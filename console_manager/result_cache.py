@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import shlex
+import hashlib
+import threading
+
+# Каталог кэша результатов команд (рядом с кэшем файла команд)
+RESULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ssh_console_manager", "results")
+
+# Сколько места на диске может занимать кэш результатов (в байтах)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Версия формата индекса; при ее изменении старый кэш не используется
+INDEX_VERSION = 1
+
+# Скрипт дочитывания лога: первая строка вывода - смещение, с которого читали, и конец прочитанного.
+# Если файл стал меньше сохраненного смещения (ротация), он читается с начала.
+# Читаются только целые строки: строка, которую еще дописывают, остается до следующего обновления,
+# иначе фильтр увидел бы ее двумя обрывками. Поэтому конец - после последнего перевода строки.
+# Код завершения фильтра не важен: grep без совпадений в дописанной части - это не ошибка.
+LOG_REFRESH_SCRIPT = (
+    'f={file}; o={offset}; s=$(wc -c < "$f") || exit; '
+    'if [ "$s" -lt "$o" ]; then o=0; fi; '
+    'if [ "$s" -gt "$o" ] && [ -n "$(tail -c +$s "$f" | head -c 1)" ]; then '
+    's=$((s - $(tail -c +$((o + 1)) "$f" | head -c $((s - o)) | tail -n 1 | wc -c))); fi; '
+    'echo "$o $s"; tail -c +$((o + 1)) "$f" | head -c $((s - o)){suffix}; exit 0'
+)
+
+
+'''ResultCache: кэш на диске для вывода команд, которые только читают данные (логи, статусы).
+Ключ записи - стенд и подставленная команда. Запись моложе ttl отдается без обращения к серверу,
+старая запись лога дочитывается с сохраненного смещения (только дописанные байты),
+остальные команды выполняются заново. Общий размер кэша ограничен max_bytes:
+при превышении удаляются давно не использованные записи (LRU).
+Счетчики попаданий и промахов сохраняются в индексе вместе с записями.
+Блокировка защищает кэш только от потоков одного процесса. Индекс и файлы записей заменяются
+атомарно, поэтому другой процесс программы не прочитает их недописанными, но при одновременной
+работе нескольких процессов последний сохраненный индекс затирает записи и счетчики остальных.'''
+class ResultCache:
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "evictions": 0, "served_bytes": 0, "fetched_bytes": 0}
+        self.load_index()
+
+    @staticmethod
+    def key(stand, command):
+        '''Возвращает ключ записи для стенда и подставленной команды.'''
+        return hashlib.sha256(f"{stand}\0{command}".encode("utf-8")).hexdigest()
+
+    def data_path(self, key):
+        '''Возвращает путь к файлу с выводом команды.'''
+        return os.path.join(self.cache_dir, key + ".out")
+
+    def load_index(self):
+        '''Читает индекс записей; поврежденный или старый индекс считается пустым.'''
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+        if index.get("version") != INDEX_VERSION:
+            return
+        self.entries = index["entries"]
+        self.stats.update(index["stats"])
+
+    def save_index(self):
+        '''Атомарно записывает индекс; ошибки записи не мешают работе программы.'''
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as file:
+                json.dump({"version": INDEX_VERSION, "entries": self.entries, "stats": self.stats}, file, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except OSError:
+            pass
+
+    def read(self, key):
+        '''Возвращает сохраненный вывод записи или None, если файла уже нет.'''
+        try:
+            with open(self.data_path(key), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def store(self, key, stand, command, data, offset=None, append=False):
+        '''Сохраняет (или дописывает) вывод команды и обновляет запись индекса.'''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if append:
+            with open(self.data_path(key), "ab") as file:
+                file.write(data)
+        else:
+            # Запись целиком заменяется атомарно: параллельный процесс видит старый или новый файл, но не обрывок
+            tmp_file = f"{self.data_path(key)}.{os.getpid()}.tmp"
+            with open(tmp_file, "wb") as file:
+                file.write(data)
+            os.replace(tmp_file, self.data_path(key))
+        now = time.time()
+        entry = self.entries.get(key) if append else None
+        if entry is None:
+            entry = {"stand": stand, "command": command, "size": 0}
+        entry["size"] = entry["size"] + len(data) if append else len(data)
+        entry["offset"] = offset
+        entry["created"] = now
+        entry["used"] = now
+        self.entries[key] = entry
+        self.evict()
+
+    def evict(self):
+        '''Удаляет давно не использованные записи, пока кэш не уложится в max_bytes.'''
+        total = sum(entry["size"] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda key: self.entries[key]["used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries.pop(key)["size"]
+            self.stats["evictions"] += 1
+            try:
+                os.remove(self.data_path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        '''Удаляет все записи и обнуляет счетчики.'''
+        with self.lock:
+            for key in self.entries:
+                try:
+                    os.remove(self.data_path(key))
+                except OSError:
+                    pass
+            self.entries = {}
+            self.stats = dict.fromkeys(self.stats, 0)
+            self.save_index()
+
+    def fetch(self, ssh_client, stand, command, ttl, log_file=None, suffix=""):
+        '''
+        Возвращает вывод команды из кэша, при необходимости обращаясь к серверу через exec-канал.
+
+        :param command: Подставленная команда вместе с suffix (ключ записи).
+        :param ttl: Сколько секунд запись считается свежей.
+        :param log_file: Файл лога, который выводит команда; он читается с сохраненного смещения (только дописанное).
+        :param suffix: Фильтр (например, " | grep ..."), который применяется и к дочитанной части лога.
+        :return: Словарь: вывод (data), stderr (errors), код завершения, источник ("hit", "refresh" - дочитан
+                 только конец лога, или "miss" - команда выполнена целиком),
+                 возраст записи и число байт, полученных от сервера (fetched).
+        '''
+        key = self.key(stand, command)
+        with self.lock:
+            entry = self.entries.get(key)
+            cached = self.read(key) if entry else None
+            if cached is None:
+                entry = None
+            elif time.time() - entry["created"] <= ttl:
+                entry["used"] = time.time()
+                self.stats["hits"] += 1
+                self.stats["served_bytes"] += len(cached)
+                self.save_index()
+                return {"data": cached, "errors": b"", "exit_status": 0, "source": "hit", "age": time.time() - entry["created"], "fetched": 0}
+
+        if log_file:
+            offset = entry["offset"] if entry else 0
+            script = LOG_REFRESH_SCRIPT.format(file=self.quote_path(log_file), offset=int(offset), suffix=suffix)
+            exit_status, output, errors = self.run(ssh_client, script)
+            header, _, data = output.partition(b"\n")
+            try:
+                start, end = (int(value) for value in header.split())
+            except ValueError:
+                # Файла нет или вывод неожиданный: показываем как есть и не кэшируем
+                exit_status, data, start, end = exit_status or 1, output, 0, None
+        else:
+            exit_status, data, errors = self.run(ssh_client, command)
+            start, end = 0, None
+
+        # Дочитыванием считается только продолжение лога с сохраненного смещения; устаревшая запись
+        # команды без лога и ротированный лог получены от сервера целиком - это промах
+        refreshed = bool(entry and log_file and exit_status == 0 and start == entry["offset"])
+        with self.lock:
+            self.stats["refreshes" if refreshed else "misses"] += 1
+            self.stats["fetched_bytes"] += len(data)
+            fetched = len(data)
+            # Неудачный вывод не кэшируем
+            if exit_status == 0:
+                if refreshed:
+                    # Дописанные байты добавляются к записи, остальное отдается из кэша
+                    self.stats["served_bytes"] += len(cached)
+                    self.store(key, stand, command, data, offset=end, append=True)
+                    data = cached + data
+                else:
+                    # Новая запись, команда без лога или ротированный лог (смещение сброшено в 0)
+                    self.store(key, stand, command, data, offset=end)
+            self.save_index()
+        return {
+            "data": data, "errors": errors, "exit_status": exit_status,
+            "source": "refresh" if refreshed else "miss", "age": 0.0, "fetched": fetched,
+        }
+
+    @staticmethod
+    def quote_path(path):
+        '''Экранирует путь для shell, оставляя раскрытие ~ в начале пути.'''
+        if path.startswith("~/"):
+            return "~/" + shlex.quote(path[2:])
+        return shlex.quote(path)
+
+    @staticmethod
+    def run(ssh_client, command):
+        '''Выполняет команду через exec-канал и возвращает (код завершения, stdout, stderr).'''
+        chunks = {False: [], True: []}
+        exit_status = ssh_client.run_command(command, lambda data, is_error: chunks[is_error].append(data))
+        return exit_status, b"".join(chunks[False]), b"".join(chunks[True])
@@ -0,0 +1,192 @@
+import os
+import json
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Границы корзин гистограмм времени (в секундах)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Префикс метрик в формате Prometheus
+METRIC_PREFIX = "ssh_console_"
+
+# Описания метрик: гистограммы времени и счетчики байтов
+HISTOGRAMS = {
+    "connect_seconds": "Время установки SSH-соединения",
+    "shell_setup_seconds": "Время подготовки shell-канала",
+    "first_byte_seconds": "Время от отправки команды до первого байта вывода",
+    "session_seconds": "Длительность выполнения команды",
+}
+COUNTERS = {
+    "bytes_in": "Байт получено от сервера",
+    "bytes_out": "Байт отправлено на сервер",
+}
+
+
+'''Histogram: гистограмма значений с фиксированными корзинами (как в Prometheus).
+Хранит только счетчики корзин, сумму, минимум и максимум, поэтому не растет с числом измерений;
+квантили оцениваются линейной интерполяцией внутри корзины.'''
+class Histogram:
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        '''Добавляет измерение.'''
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        '''Оценивает квантиль q (от 0 до 1) по корзинам.'''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else self.min
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        '''Возвращает гистограмму в виде словаря для экспорта в JSON.'''
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+'''SessionMetrics: собирает метрики SSH-сессий по стендам и командам.
+Стенд и команда берутся из scope(), который открывает вызывающий код (CLI, FanOut);
+scope хранится в потоке, поэтому параллельные стенды не смешиваются.
+Результат можно вывести таблицей (summary) или сохранить в JSON / текстовый файл Prometheus (export).'''
+class SessionMetrics:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @contextmanager
+    def scope(self, stand, command):
+        '''Помечает все измерения внутри блока стендом и командой.'''
+        previous = getattr(self.local, "labels", None)
+        self.local.labels = (stand, command)
+        try:
+            yield
+        finally:
+            self.local.labels = previous
+
+    def labels(self):
+        '''Возвращает (стенд, команда) текущего scope.'''
+        return getattr(self.local, "labels", None) or ("", "")
+
+    def observe(self, name, value):
+        '''Добавляет измерение в гистограмму name для текущего стенда и команды.'''
+        key = (name,) + self.labels()
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def add(self, name, value):
+        '''Увеличивает счетчик name для текущего стенда и команды.'''
+        key = (name,) + self.labels()
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        '''Возвращает таблицу по стендам и командам: число команд, медианы, p95 и пропускная способность.'''
+        with self.lock:
+            rows = sorted({key[1:] for key in self.histograms if key[0] == "session_seconds"})
+            lines = [f"{'Стенд':<12} {'Команда':<24} {'N':>4} {'Медиана':>9} {'p95':>9} {'1-й байт':>9} {'Получено':>10} {'КБ/с':>9}"]
+            for stand, command in rows:
+                session = self.histograms[("session_seconds", stand, command)]
+                first_byte = self.histograms.get(("first_byte_seconds", stand, command))
+                received = self.counters.get(("bytes_in", stand, command), 0)
+                throughput = received / session.sum / 1024 if session.sum else 0.0
+                first_byte_text = f"{first_byte.quantile(0.5):.3f}" if first_byte else "-"
+                lines.append(
+                    f"{stand or '-':<12} {command or '-':<24} {session.count:>4} {session.quantile(0.5):>9.3f} "
+                    f"{session.quantile(0.95):>9.3f} {first_byte_text:>9} {received:>10} {throughput:>9.1f}"
+                )
+            connect = [histogram for key, histogram in self.histograms.items() if key[0] == "connect_seconds"]
+            if connect:
+                count = sum(histogram.count for histogram in connect)
+                total = sum(histogram.sum for histogram in connect)
+                lines.append(f"Подключений: {count}, среднее время подключения: {total / count:.3f} с")
+        return "\n".join(lines) if rows else ""
+
+    def to_dict(self):
+        '''Возвращает все метрики в виде словаря для экспорта в JSON.'''
+        with self.lock:
+            return {
+                "histograms": [
+                    {"name": name, "stand": stand, "command": command, **histogram.to_dict()}
+                    for (name, stand, command), histogram in sorted(self.histograms.items())
+                ],
+                "counters": [
+                    {"name": name, "stand": stand, "command": command, "value": value}
+                    for (name, stand, command), value in sorted(self.counters.items())
+                ],
+            }
+
+    @staticmethod
+    def escape_label(value):
+        '''Экранирует значение метки в формате Prometheus.'''
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def to_prometheus(self):
+        '''Возвращает метрики в текстовом формате Prometheus (для textfile collector node_exporter).'''
+        lines = []
+        with self.lock:
+            for name, description in HISTOGRAMS.items():
+                series = sorted((key[1:], histogram) for key, histogram in self.histograms.items() if key[0] == name)
+                if not series:
+                    continue
+                metric = METRIC_PREFIX + name
+                lines += [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+                for (stand, command), histogram in series:
+                    labels = f'stand="{self.escape_label(stand)}",command="{self.escape_label(command)}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+            for name, description in COUNTERS.items():
+                series = sorted((key[1:], value) for key, value in self.counters.items() if key[0] == name)
+                if not series:
+                    continue
+                metric = f"{METRIC_PREFIX}{name}_total"
+                lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+                for (stand, command), value in series:
+                    lines.append(f'{metric}{{stand="{self.escape_label(stand)}",command="{self.escape_label(command)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, file_path):
+        '''Атомарно сохраняет метрики в файл: .json - в JSON, иначе в текстовом формате Prometheus.'''
+        if file_path.endswith(".json"):
+            content = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus()
+        tmp_file = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_file, file_path)
@@ -0,0 +1,125 @@
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+
+# Файл, в который по умолчанию записываются данные сессий
+DEFAULT_RECORD_FILE = "logs.txt"
+
+# Размер файла, после которого он ротируется (в байтах), и число хранимых старых файлов
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# Размер буфера записи в файл и максимальное число чанков в очереди
+WRITE_BUFFER_SIZE = 256 * 1024
+QUEUE_SIZE = 4096
+
+
+'''SessionRecorder: записывает данные сессий в файл в фоновом потоке.
+Вызов write только кладет чанк в очередь, а поток-писатель пишет накопленные чанки
+одной операцией в буферизованный файл, ротирует его по размеру и при необходимости сжимает
+старые файлы gzip. Поэтому запись почти не замедляет вывод сессии.'''
+class SessionRecorder:
+    def __init__(self, file_path=DEFAULT_RECORD_FILE, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, compress=False):
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.logger = logging.getLogger(__name__)
+
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.file = None
+        self.size = 0
+        self.thread = threading.Thread(target=self.writer_loop, name="session-recorder", daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        '''Ставит данные (строку или байты) в очередь на запись.'''
+        if not self.thread.is_alive():
+            return
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.queue.put(data)
+
+    def open(self):
+        '''Открывает файл записи в режиме добавления.'''
+        self.file = open(self.file_path, "ab", buffering=WRITE_BUFFER_SIZE)
+        self.size = self.file.tell()
+
+    def backup_name(self, index):
+        '''Возвращает имя старого файла с номером index.'''
+        name = f"{self.file_path}.{index}"
+        return name + ".gz" if self.compress else name
+
+    def rotate(self):
+        '''Сдвигает старые файлы и начинает новый файл записи.'''
+        self.file.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(self.backup_name(index)):
+                    os.replace(self.backup_name(index), self.backup_name(index + 1))
+            if self.compress:
+                with open(self.file_path, "rb") as source, gzip.open(self.backup_name(1), "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.file_path)
+            else:
+                os.replace(self.file_path, self.backup_name(1))
+        else:
+            os.remove(self.file_path)
+        self.open()
+
+    def writer_loop(self):
+        '''Фоновый поток: забирает чанки из очереди и пишет их пачками.'''
+        try:
+            self.open()
+            finished = False
+            while not finished:
+                chunks = [self.queue.get()]
+                # Забираем все, что уже накопилось, чтобы записать одной операцией
+                while True:
+                    try:
+                        chunks.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in chunks:
+                    chunks = chunks[:chunks.index(None)]
+                    finished = True
+
+                data = b"".join(chunks)
+                if data:
+                    self.file.write(data)
+                    self.size += len(data)
+                    if self.max_bytes and self.size >= self.max_bytes:
+                        self.rotate()
+                if self.queue.empty():
+                    self.file.flush()
+        except Exception as e:
+            self.logger.warning("Ошибка при записи в файл %s: %s", self.file_path, e)
+        finally:
+            if self.file is not None:
+                self.file.close()
+
+    def close(self):
+        '''Дописывает очередь, закрывает файл и останавливает поток-писатель.'''
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+def setup_queue_logging(level, handler):
+    '''
+    Настраивает корневой логгер так, чтобы записи только ставились в очередь,
+    а форматировались и выводились обработчиком handler в отдельном потоке.
+
+    :return: Запущенный QueueListener, который нужно остановить при завершении.
+    '''
+    log_queue = queue.Queue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import stat
+import time
+import zlib
+import fnmatch
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Сколько SFTP-каналов (потоков) скачивают файлы одновременно
+DEFAULT_WORKERS = 4
+
+# Файлы больше этого размера делятся на части, которые скачиваются параллельно по разным каналам (в байтах)
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# Размер одного запроса чтения SFTP (больше paramiko не запрашивает) и сколько запросов держать в полете на канал
+READ_SIZE = 32 * 1024
+MAX_CONCURRENT_REQUESTS = 64
+
+# Как часто сохранять прогресс недокачанного файла (в байтах)
+PROGRESS_SAVE_INTERVAL = 4 * 1024 * 1024
+
+# Недокачанный файл и файл с его прогрессом лежат рядом с итоговым
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+
+
+'''SFTPDownloader: скачивает файл или каталог (например, logs_path стенда) по SFTP.
+Чтения идут конвейером (readv/prefetch держат в полете до MAX_CONCURRENT_REQUESTS запросов),
+большие файлы делятся на части по CHUNK_SIZE, которые скачиваются параллельно по нескольким
+SFTP-каналам одного соединения. Прогресс каждой части сохраняется рядом с файлом (.part.json),
+поэтому прерванная загрузка продолжается с того же места, если файл на сервере не изменился.
+Файлы .gz можно распаковывать на лету (такие файлы скачиваются одним потоком и без продолжения).'''
+class SFTPDownloader:
+    def __init__(self, ssh_client, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, decompress=False, output=sys.stdout):
+        self.ssh_client = ssh_client
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.decompress = decompress
+        self.output = output
+        self.local = threading.local()
+        self.sftp_clients = []
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.stats = {"files": 0, "skipped": 0, "resumed": 0, "bytes": 0, "written": 0}
+
+    def sftp(self):
+        '''Возвращает SFTP-клиент текущего потока: у каждого потока свой канал.'''
+        if getattr(self.local, "sftp", None) is None:
+            self.local.sftp = self.ssh_client.open_sftp()
+            with self.lock:
+                self.sftp_clients.append(self.local.sftp)
+        return self.local.sftp
+
+    def close(self):
+        '''Закрывает SFTP-каналы.'''
+        for sftp in self.sftp_clients:
+            sftp.close()
+        self.sftp_clients = []
+
+    def list_files(self, remote_path, pattern=None):
+        '''Возвращает [(удаленный путь, относительный путь, атрибуты)] для файла или всех файлов каталога.'''
+        sftp = self.sftp()
+        attr = sftp.stat(remote_path)
+        if not stat.S_ISDIR(attr.st_mode):
+            return [(remote_path, os.path.basename(remote_path), attr)]
+
+        files = []
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            directory = f"{remote_path}/{relative}" if relative else remote_path
+            for entry in sftp.listdir_attr(directory):
+                entry_path = f"{relative}/{entry.filename}" if relative else entry.filename
+                if stat.S_ISDIR(entry.st_mode):
+                    pending.append(entry_path)
+                elif stat.S_ISREG(entry.st_mode) and (pattern is None or fnmatch.fnmatch(entry.filename, pattern)):
+                    files.append((f"{remote_path}/{entry_path}", entry_path, entry))
+        return sorted(files, key=lambda item: item[1])
+
+    def report(self, text):
+        '''Выводит строку о ходе загрузки, не смешивая ее со строками других потоков.'''
+        with self.lock:
+            self.output.write(text + "\n")
+            self.output.flush()
+
+    @staticmethod
+    def read_state(state_file, attr):
+        '''Возвращает прогресс недокачанного файла, если файл на сервере с тех пор не изменился.'''
+        try:
+            with open(state_file, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if state.get("size") != attr.st_size or state.get("mtime") != attr.st_mtime:
+            return None
+        return state
+
+    @staticmethod
+    def write_state(state_file, state):
+        '''Атомарно сохраняет прогресс недокачанного файла.'''
+        tmp_file = state_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(tmp_file, state_file)
+
+    def plan(self, remote_file, local_file, attr):
+        '''
+        Готовит загрузку файла: создает .part нужного размера и делит файл на части.
+
+        :return: Состояние загрузки или None, если файл уже скачан.
+        '''
+        if os.path.exists(local_file):
+            local_stat = os.stat(local_file)
+            if local_stat.st_size == attr.st_size and int(local_stat.st_mtime) == attr.st_mtime:
+                return None
+
+        part_file = local_file + PART_SUFFIX
+        state_file = local_file + STATE_SUFFIX
+        state = self.read_state(state_file, attr) if os.path.exists(part_file) else None
+        if state is None:
+            os.makedirs(os.path.dirname(local_file) or ".", exist_ok=True)
+            with open(part_file, "wb") as file:
+                file.truncate(attr.st_size)
+            chunks = max(1, -(-attr.st_size // self.chunk_size))
+            state = {"size": attr.st_size, "mtime": attr.st_mtime, "chunk_size": self.chunk_size, "done": [0] * chunks}
+            self.write_state(state_file, state)
+        elif any(state["done"]):
+            with self.lock:
+                self.stats["resumed"] += 1
+
+        state.update(remote_file=remote_file, local_file=local_file, lock=threading.Lock(), left=len(state["done"]))
+        return state
+
+    def save_progress(self, state):
+        '''Сохраняет прогресс файла (без служебных полей).'''
+        self.write_state(state["local_file"] + STATE_SUFFIX, {
+            key: state[key] for key in ("size", "mtime", "chunk_size", "done")
+        })
+
+    def download_chunk(self, state, index):
+        '''Скачивает одну часть файла с места, на котором она остановилась.'''
+        start = index * state["chunk_size"]
+        end = min(start + state["chunk_size"], state["size"])
+        offset = start + state["done"][index]
+        if offset < end:
+            with self.sftp().open(state["remote_file"], "rb") as remote, open(state["local_file"] + PART_SUFFIX, "r+b") as local:
+                local.seek(offset)
+                # Часть читается пачками: после каждой прогресс сохраняется и проверяется отмена.
+                # Пачка дочитывается целиком, чтобы поток prefetch не остался писать в закрытый канал.
+                for batch_start in range(offset, end, PROGRESS_SAVE_INTERVAL):
+                    if self.cancelled:
+                        return
+                    batch_end = min(batch_start + PROGRESS_SAVE_INTERVAL, end)
+                    requests = [
+                        (position, min(READ_SIZE, batch_end - position))
+                        for position in range(batch_start, batch_end, READ_SIZE)
+                    ]
+                    for data in remote.readv(requests, MAX_CONCURRENT_REQUESTS):
+                        local.write(data)
+                    # Прогресс сохраняется только после того, как данные записаны в файл
+                    local.flush()
+                    with self.lock:
+                        self.stats["bytes"] += batch_end - batch_start
+                    with state["lock"]:
+                        state["done"][index] += batch_end - batch_start
+                        if batch_end < end:
+                            self.save_progress(state)
+        with state["lock"]:
+            state["left"] -= 1
+            if state["left"]:
+                self.save_progress(state)
+                return
+        self.finish(state)
+
+    def finish(self, state):
+        '''Переименовывает скачанный файл в итоговый и сохраняет время изменения с сервера.'''
+        local_file = state["local_file"]
+        os.replace(local_file + PART_SUFFIX, local_file)
+        os.utime(local_file, (state["mtime"], state["mtime"]))
+        os.remove(local_file + STATE_SUFFIX)
+        with self.lock:
+            self.stats["files"] += 1
+            self.stats["written"] += state["size"]
+        self.report(f"{local_file}: {state['size']} байт")
+
+    def download_decompressed(self, remote_file, local_file, attr):
+        '''Скачивает файл .gz одним потоком и распаковывает его на лету.'''
+        os.makedirs(os.path.dirname(local_file) or ".", exist_ok=True)
+        part_file = local_file + PART_SUFFIX
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        written = 0
+        with self.sftp().open(remote_file, "rb") as remote, open(part_file, "wb") as local:
+            remote.prefetch(attr.st_size, MAX_CONCURRENT_REQUESTS)
+            while True:
+                data = remote.read(CHUNK_SIZE // 16)
+                if not data:
+                    break
+                with self.lock:
+                    self.stats["bytes"] += len(data)
+                # В одном файле может быть несколько gzip-потоков подряд (например, после logrotate)
+                while data:
+                    chunk = decompressor.decompress(data)
+                    local.write(chunk)
+                    written += len(chunk)
+                    if not decompressor.eof:
+                        break
+                    data = decompressor.unused_data
+                    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        os.replace(part_file, local_file)
+        with self.lock:
+            self.stats["files"] += 1
+            self.stats["written"] += written
+        self.report(f"{local_file}: {attr.st_size} байт, распаковано {written} байт")
+
+    def download(self, remote_path, local_dir, pattern=None):
+        '''
+        Скачивает файл или каталог remote_path в local_dir.
+
+        :param pattern: Шаблон имени файла (например, "*.log"), остальные файлы каталога пропускаются.
+        :return: Словарь со статистикой: файлы, пропущенные и продолженные файлы, байты, время.
+        '''
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = []
+                for remote_file, relative, attr in self.list_files(remote_path, pattern):
+                    local_file = os.path.join(local_dir, *relative.split("/"))
+                    if self.decompress and relative.endswith(".gz"):
+                        futures.append(executor.submit(self.download_decompressed, remote_file, local_file[:-3], attr))
+                        continue
+                    state = self.plan(remote_file, local_file, attr)
+                    if state is None:
+                        self.stats["skipped"] += 1
+                        continue
+                    futures.extend(executor.submit(self.download_chunk, state, index) for index in range(len(state["done"])))
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    # При ошибке или Ctrl+C не ждем оставшиеся части: прогресс начатых сохранится
+                    self.cancelled = True
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            self.close()
+        self.stats["elapsed"] = time.perf_counter() - started
+        return self.stats
@@ -0,0 +1,479 @@
+import sys
+import selectors
+import socket
+import logging
+import threading
+import time
+import os
+import re
+import shutil
+from lazy_import import LazyModule
+from output_stream import OutputStream
+from output_filter import create_output, RAW_VIEW
+from prompt_matcher import PromptMatcher
+from session_recorder import SessionRecorder, DEFAULT_RECORD_FILE, setup_queue_logging
+from asciicast import AsciicastWriter
+from terminal import get_terminal
+from session_metrics import SessionMetrics
+
+# paramiko вместе с cryptography импортируется долго, поэтому загружается при первом подключении
+paramiko = LazyModule("paramiko")
+# Брокер соединений импортирует ConnectionPool, поэтому подключается лениво
+control_master = LazyModule("control_master")
+
+# Размер буфера одного чтения из канала (в байтах)
+RECV_BUFFER_SIZE = 64 * 1024
+
+# Сколько байт вычитывать из канала подряд, прежде чем сбросить вывод и проверить ввод
+FLUSH_THRESHOLD = 1024 * 1024
+
+# Минимальный интервал между сбросами вывода на экран при потоке перерисовок (в секундах)
+FRAME_INTERVAL = 1 / 60
+
+# Управляющие последовательности CSI во вводе пользователя (например, стрелки ^[[D и ^[[C)
+CONTROL_SEQUENCE_PATTERN = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+# Интервал keepalive-пакетов, которыми поддерживается открытое соединение (в секундах)
+KEEPALIVE_INTERVAL = 30
+
+# Команда, которая возвращает shell в исходное состояние перед возвратом в пул: домашний каталог
+# и без активированного virtualenv (после "run script"), чтобы следующая команда на другом стенде
+# не унаследовала их. Кавычки в echo нужны, чтобы маркер не совпал с эхом самой команды
+SHELL_RESET_COMMAND = "cd ~; deactivate 2>/dev/null; echo shell'_'reset\n"
+
+# Конец вывода SHELL_RESET_COMMAND: маркер и prompt после него. Shell выдается следующей команде
+# только после prompt, иначе запоздавший prompt она примет за конец своего вывода
+SHELL_RESET_PATTERN = re.compile(rb"shell_reset\r?\n[^\n]*[$#%>] $")
+
+# Сколько ждать выполнения SHELL_RESET_COMMAND, прежде чем закрыть shell вместо переиспользования (в секундах)
+SHELL_RESET_TIMEOUT = 5.0
+
+
+'''ConnectionPool: держит открытые SSH-соединения и простаивающие shell-каналы для каждого хоста.
+Соединение и login shell переиспользуются между командами и стендами, а не создаются заново.
+Перед возвратом в пул shell выполняет SHELL_RESET_COMMAND, а выдается следующей команде
+только после того, как эта команда выполнена и shell вывел prompt.'''
+class ConnectionPool:
+    def __init__(self, keepalive_interval=KEEPALIVE_INTERVAL, metrics=None, control_path=None, start_broker=False):
+        self.keepalive_interval = keepalive_interval
+        self.metrics = metrics
+        self.control_path = control_path
+        self.start_broker = start_broker
+        self.clients = {}
+        self.shells = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_alive(client):
+        '''Проверяет, что транспорт соединения еще активен.'''
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    @staticmethod
+    def is_reusable(channel):
+        '''Проверяет, что shell-канал не закрыт и его можно отдать следующей команде.'''
+        return not (channel.closed or channel.eof_received or channel.exit_status_ready())
+
+    def get_client(self, hostname, port, username, password):
+        '''Возвращает активное соединение с хостом, при необходимости устанавливая его заново.'''
+        key = (hostname, port, username)
+        with self.lock:
+            client = self.clients.get(key)
+            if client is not None and self.is_alive(client):
+                return client
+            if client is not None:
+                self.logger.warning(f"Соединение с {hostname} потеряно, переподключаемся.")
+                self.discard(client)
+
+            started = time.perf_counter()
+            client = self.connect_via_broker(hostname, port, username, password)
+            if client is None:
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.connect(hostname, port=port, username=username, password=password)
+            if self.metrics:
+                self.metrics.observe("connect_seconds", time.perf_counter() - started)
+            transport = client.get_transport()
+            transport.set_keepalive(self.keepalive_interval)
+            if transport.sock.family in (socket.AF_INET, socket.AF_INET6):
+                # Как ssh для интерактивных сессий: без Nagle команда и нажатия клавиш не ждут
+                # подтверждения предыдущего пакета (задержанный ACK добавлял ~40 мс к каждой команде)
+                transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.clients[key] = client
+            return client
+
+    def connect_via_broker(self, hostname, port, username, password):
+        '''
+        Подключается через брокер соединений, если он задан и запущен.
+
+        :return: Соединение через брокер или None, если нужно подключиться напрямую.
+        '''
+        if self.control_path is None:
+            return None
+        try:
+            return control_master.connect(self.control_path, hostname, port, username, password, start=self.start_broker)
+        except paramiko.AuthenticationException:
+            raise
+        except (OSError, EOFError, paramiko.SSHException) as e:
+            self.logger.warning(f"Брокер соединений недоступен ({e}), подключаемся напрямую.")
+            return None
+
+    def close_client(self, hostname, port, username):
+        '''Закрывает соединение с хостом, если оно есть в пуле.'''
+        with self.lock:
+            client = self.clients.pop((hostname, port, username), None)
+            if client is not None:
+                self.discard(client)
+
+    def acquire_shell(self, client, width, height):
+        '''Возвращает простаивающий shell-канал соединения или открывает новый.'''
+        while True:
+            with self.lock:
+                idle = self.shells.get(client, [])
+                channel = idle.pop() if idle else None
+            if channel is None:
+                return client.invoke_shell(term='xterm', width=width, height=height)
+            # Ожидание идет вне блокировки, чтобы не задерживать другие потоки пула
+            if not self.is_reusable(channel) or not self.wait_reset(channel):
+                channel.close()
+                continue
+            channel.resize_pty(width=width, height=height)
+            return channel
+
+    @staticmethod
+    def wait_reset(channel):
+        '''Вычитывает вывод shell до prompt после маркера SHELL_RESET_COMMAND. Возвращает False, если его нет.'''
+        matcher = PromptMatcher(SHELL_RESET_PATTERN)
+        deadline = time.monotonic() + SHELL_RESET_TIMEOUT
+        with selectors.DefaultSelector() as selector:
+            selector.register(channel, selectors.EVENT_READ)
+            while True:
+                while channel.recv_ready():
+                    if matcher.feed(channel.recv(RECV_BUFFER_SIZE)):
+                        return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or channel.closed or channel.eof_received:
+                    return False
+                selector.select(remaining)
+
+    def release_shell(self, client, channel):
+        '''Сбрасывает состояние shell-канала и возвращает его в пул, если им еще можно пользоваться, иначе закрывает его.'''
+        if not self.is_reusable(channel) or not self.is_alive(client):
+            channel.close()
+            return
+        try:
+            channel.sendall(SHELL_RESET_COMMAND)
+        except (OSError, EOFError, paramiko.SSHException):
+            channel.close()
+            return
+        with self.lock:
+            self.shells.setdefault(client, []).append(channel)
+
+    def discard(self, client):
+        '''Закрывает соединение и все его shell-каналы.'''
+        for channel in self.shells.pop(client, []):
+            channel.close()
+        client.close()
+
+    def close(self):
+        '''Закрывает все соединения пула.'''
+        with self.lock:
+            for client in self.clients.values():
+                self.discard(client)
+            self.clients.clear()
+
+
+class SSHClient:
+    def __init__(self, hostname, port, username, password, enable_logging=False, recv_buffer_size=RECV_BUFFER_SIZE, pool=None, record_path=None, compress_records=False, cast_dir=None, terminal=None, metrics=None, control_path=None, start_broker=False):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.recv_buffer_size = recv_buffer_size
+        self.client = None
+
+        # Метрики сессий: время подключения и выполнения, первый байт, объем данных по стендам и командам
+        self.metrics = metrics if metrics is not None else SessionMetrics()
+
+        # Пул, переданный снаружи, может быть общим, поэтому закрываем только собственный
+        self.owns_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool(metrics=self.metrics, control_path=control_path, start_broker=start_broker)
+        self.setup_times = []
+
+        # Запись вывода сессий в файл выполняется в фоновом потоке
+        self.compress_records = compress_records
+        self.recorder = SessionRecorder(record_path, compress=compress_records) if record_path else None
+        # Каталог, в который каждая интерактивная сессия записывается в формате asciicast
+        self.cast_dir = cast_dir
+        # Терминальный бэкенд интерактивных сессий; по умолчанию выбирается по платформе при запуске сессии
+        self.terminal = terminal
+
+        # Настройка логирования: записи форматируются и выводятся в отдельном потоке
+        self.logger = logging.getLogger(__name__)
+        self.log_listener = None
+        if enable_logging:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+            self.log_listener = setup_queue_logging(logging.DEBUG, handler)
+        else:
+            logging.basicConfig(level=logging.CRITICAL)  # Отключить логирование (показываются только критические ошибки)
+
+    def initialize(self):
+        '''Получает SSH-соединение из пула.'''
+        self.client = self.pool.get_client(self.hostname, self.port, self.username, self.password)
+        self.logger.info("SSH-соединение успешно установлено.")
+
+    def close(self):
+        '''Закрывает SSH-соединение.'''
+        if self.client:
+            if self.owns_pool:
+                self.pool.close()
+            self.client = None
+            self.logger.info("SSH-соединение закрыто.")
+        if self.recorder:
+            self.recorder.close()
+        if self.log_listener:
+            self.log_listener.stop()
+            self.log_listener = None
+    
+    def remove_control_sequences(self, text):
+        '''Удаляет управляющие последовательности из текста'''
+        # Выражение скомпилировано заранее, а sub без совпадений просто возвращает текст за один проход
+        return CONTROL_SEQUENCE_PATTERN.sub('', text)
+    
+    def write_to_file(self, data):
+        """
+        Записывает данные в файл записи сессий (по умолчанию logs.txt).
+        Запись выполняется в фоновом потоке, метод не ждет обращения к диску.
+
+        :param data: Данные, которые нужно записать в файл (строка).
+        """
+        if self.recorder is None:
+            self.recorder = SessionRecorder(DEFAULT_RECORD_FILE, compress=self.compress_records)
+        self.recorder.write(data + '\n')
+
+    def start_cast(self, command, width, height):
+        '''Начинает запись сессии в формате asciicast, если задан каталог записей.'''
+        if not self.cast_dir:
+            return None
+        os.makedirs(self.cast_dir, exist_ok=True)
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{len(self.setup_times)}.cast"
+        return AsciicastWriter(os.path.join(self.cast_dir, name), width, height, command)
+
+    def send_input(self, channel, data, cast=None):
+        '''Отправляет пачку ввода пользователя (байты) в канал одной записью и записывает ее в asciicast.'''
+        channel.sendall(data)
+        self.metrics.add("bytes_out", len(data))
+        if cast:
+            cast.input(data)
+
+    def open_exec_channel(self, command):
+        '''Открывает exec-канал без PTY и запускает в нем команду.'''
+        client = self.pool.get_client(self.hostname, self.port, self.username, self.password)
+        channel = client.get_transport().open_session()
+        try:
+            channel.exec_command(command)
+        except Exception:
+            channel.close()
+            raise
+        self.logger.info(f"Выполняется команда: {command}")
+        return channel
+
+    def open_sftp(self):
+        '''Открывает SFTP-канал поверх соединения из пула.'''
+        client = self.pool.get_client(self.hostname, self.port, self.username, self.password)
+        return client.open_sftp()
+
+    def run_command(self, command, on_output, on_idle=None):
+        '''
+        Выполняет команду без PTY через exec-канал и возвращает ее код завершения.
+
+        :param command: Команда для выполнения.
+        :param on_output: Функция on_output(data, is_error), которая вызывается для каждого чанка stdout/stderr.
+        :param on_idle: Функция без аргументов, которая вызывается после каждой пачки вывода и возвращает,
+                        через сколько секунд вызвать ее снова, даже если новых данных нет (или None).
+        '''
+        started = time.perf_counter()
+        first_byte = None
+        channel = self.open_exec_channel(command)
+        self.metrics.add("bytes_out", len(command))
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(channel, selectors.EVENT_READ)
+                timeout = None
+                while True:
+                    selector.select(timeout)
+                    if first_byte is None and (channel.recv_ready() or channel.recv_stderr_ready()):
+                        first_byte = time.perf_counter() - started
+                        self.metrics.observe("first_byte_seconds", first_byte)
+                    while channel.recv_ready():
+                        data = channel.recv(self.recv_buffer_size)
+                        self.metrics.add("bytes_in", len(data))
+                        on_output(data, False)
+                    while channel.recv_stderr_ready():
+                        data = channel.recv_stderr(self.recv_buffer_size)
+                        self.metrics.add("bytes_in", len(data))
+                        on_output(data, True)
+                    # Данные всегда приходят раньше EOF, поэтому после EOF достаточно проверить буферы
+                    if (channel.eof_received or channel.closed) and not (
+                        channel.recv_ready() or channel.recv_stderr_ready()
+                    ):
+                        break
+                    if on_idle:
+                        timeout = on_idle()
+
+            exit_status = channel.recv_exit_status()
+            self.logger.info(f"Команда завершена с кодом: {exit_status}")
+            return exit_status
+        finally:
+            channel.close()
+            self.metrics.observe("session_seconds", time.perf_counter() - started)
+
+    def exec_command(self, command, view=RAW_VIEW):
+        '''
+        Выполняет неинтерактивную команду без PTY и login shell.
+        stdout и stderr сервера выводятся в соответствующие локальные потоки.
+
+        :param view: Режим отображения stdout (см. output_filter); в запись сессии вывод попадает как есть.
+        :return: Код завершения команды или None, если выполнение прервано пользователем.
+        '''
+        stdout = create_output(sys.stdout, view, shutil.get_terminal_size().lines, min_flush_interval=FRAME_INTERVAL)
+        stderr = OutputStream(sys.stderr)
+
+        def on_output(data, is_error):
+            if is_error:
+                stderr.write(data)
+                stderr.flush()
+            else:
+                stdout.write(data)
+                if view == RAW_VIEW:
+                    stdout.flush()
+            if self.recorder:
+                self.recorder.write(data)
+
+        try:
+            return self.run_command(command, on_output, None if view == RAW_VIEW else stdout.paced_flush)
+        except KeyboardInterrupt:
+            # Канал уже закрыт в run_command, возвращаемся в меню
+            self.logger.info(f"Команда прервана пользователем: {command}")
+            return None
+        finally:
+            stdout.close()
+            stderr.close()
+
+    def execute_command(self, command, prompt, view=RAW_VIEW):
+        '''
+        Открывает интерактивную сессию.
+
+        :param command: Команда, которая отправляется в shell.
+        :param prompt: Строка или регулярное выражение, появление которого в выводе завершает сессию.
+        :param view: Режим отображения вывода (см. output_filter); prompt, запись сессии и asciicast получают вывод как есть.
+        '''
+        terminal = self.terminal if self.terminal is not None else get_terminal()
+        height, width = terminal.get_size()
+        started = time.perf_counter()
+        self.client = self.pool.get_client(self.hostname, self.port, self.username, self.password)
+        channel = self.pool.acquire_shell(self.client, width, height)
+        setup_time = time.perf_counter() - started
+        self.setup_times.append((command, setup_time))
+        self.metrics.observe("shell_setup_seconds", setup_time)
+        self.logger.info(f"Подготовка сессии заняла {setup_time * 1000:.1f} мс")
+        cast = self.start_cast(command, width, height)
+        channel.send(command + "\n")
+        self.metrics.add("bytes_out", len(command) + 1)
+        sent = time.perf_counter()
+        first_byte = None
+        self.logger.info(f"Отправлена команда: {command}")
+
+        selector = selectors.DefaultSelector()
+        stdout = create_output(terminal.stdout, view, height, min_flush_interval=FRAME_INTERVAL)
+        stderr = OutputStream(terminal.stderr)
+        prompt_matcher = PromptMatcher(prompt)
+        prompt_found = False
+        try:
+            channel.settimeout(0.0)
+
+            # Ждем событий канала вместе с источниками событий терминала, вместо опроса в цикле
+            selector.register(channel, selectors.EVENT_READ)
+            terminal.start(selector)
+
+            flush_timeout = None
+            while True:
+                events = selector.select(terminal.timeout(flush_timeout))
+                ready = [key.fileobj for key, _ in events]
+
+                size = terminal.poll_resize(ready)
+                if size is not None:
+                    height, width = size
+                    channel.resize_pty(width=width, height=height)
+                    self.logger.info(f"Размер терминала изменен: {width}x{height}")
+
+                if channel in ready:
+                    # Вычитываем все, что уже пришло, и сбрасываем вывод один раз на пачку
+                    received = 0
+                    while channel.recv_ready() and received < FLUSH_THRESHOLD:
+                        output = channel.recv(self.recv_buffer_size)
+                        received += len(output)
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - sent
+                            self.metrics.observe("first_byte_seconds", first_byte)
+                        self.logger.debug("Получено от сервера: %r", output)
+                        stdout.write(output)
+                        if self.recorder:
+                            self.recorder.write(output)
+                        if cast:
+                            cast.output(output)
+                        if prompt_matcher.feed(output):
+                            prompt_found = True
+                            break
+
+                    # Shell не закрываем: после prompt он возвращается в пул для следующей команды
+                    if prompt_found:
+                        self.metrics.add("bytes_in", received)
+                        break
+
+                    while channel.recv_stderr_ready():
+                        error_output = channel.recv_stderr(self.recv_buffer_size)
+                        received += len(error_output)
+                        self.logger.error("Получена ошибка от сервера: %r", error_output)
+                        stderr.write(error_output)
+                        if self.recorder:
+                            self.recorder.write(error_output)
+                    stderr.flush()
+                    self.metrics.add("bytes_in", received)
+
+                    # Канал будит селектор и при закрытии, поэтому выходим, когда данных больше нет
+                    if not channel.recv_ready() and (
+                        channel.exit_status_ready() or channel.eof_received or channel.closed
+                    ):
+                        break
+
+                # Ввод пользователя отправляется в канал одной пачкой
+                keys = terminal.read_input(ready)
+                if keys:
+                    self.send_input(channel, keys, cast)
+
+                # Пока есть несброшенный вывод, селектор ждет не дольше следующего кадра
+                flush_timeout = stdout.paced_flush()
+
+            if not prompt_found:
+                exit_status = channel.recv_exit_status()
+                self.logger.info(f"Сессия завершена с кодом: {exit_status}")
+        except Exception as e:
+            self.logger.error(f"Ошибка при работе с сессией: {e}")
+        finally:
+            self.metrics.observe("session_seconds", time.perf_counter() - started)
+            terminal.stop()
+            selector.close()
+            stdout.close()
+            stderr.close()
+            if cast:
+                cast.close()
+            try:
+                if prompt_found:
+                    self.pool.release_shell(self.client, channel)
+                else:
+                    channel.close()
+            except Exception as e:
+                self.logger.error(f"Ошибка при закрытии канала: {e}")
@@ -0,0 +1,81 @@
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Сколько самых долгих импортов показывать в отчете
+TOP_IMPORTS = 15
+
+
+'''StartupProfiler: измеряет длительность этапов запуска и импорта модулей.
+Включается параметром --profile-startup; пока он выключен, phase() ничего не делает.
+Время импорта считается только для первых импортов верхнего уровня, поэтому вложенные
+импорты входят во время модуля, который их вызвал.'''
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.phases = []
+        self.imports = {}
+        self.local = threading.local()
+        self.original_import = None
+
+    def enable(self):
+        '''Включает профилирование и перехватывает импорты.'''
+        if self.enabled:
+            return
+        self.enabled = True
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.track_import
+
+    def track_import(self, name, *args, **kwargs):
+        '''Замена builtins.__import__, которая засекает время первых импортов.'''
+        depth = getattr(self.local, "depth", 0)
+        if depth or name in sys.modules:
+            return self.original_import(name, *args, **kwargs)
+
+        self.local.depth = 1
+        started = time.perf_counter()
+        try:
+            return self.original_import(name, *args, **kwargs)
+        finally:
+            self.local.depth = 0
+            self.imports[name] = self.imports.get(name, 0.0) + time.perf_counter() - started
+
+    @contextmanager
+    def phase(self, name):
+        '''Засекает длительность этапа name.'''
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, started - self.started, time.perf_counter() - started))
+
+    def mark(self, name):
+        '''Отмечает момент времени (например, показ первого меню) как этап нулевой длительности.'''
+        if self.enabled:
+            self.phases.append((name, time.perf_counter() - self.started, 0.0))
+
+    def report(self, output=None):
+        '''Выводит разбивку запуска по этапам и самым долгим импортам.'''
+        if not self.enabled:
+            return
+        output = output or sys.stderr
+        output.write("\nПрофиль запуска (мс):\n")
+        output.write(f"{'Этап':<32}{'Начало':>10}{'Длительность':>14}\n")
+        for name, start, duration in self.phases:
+            output.write(f"{name:<32}{start * 1000:>10.1f}{duration * 1000:>14.1f}\n")
+
+        output.write(f"\n{'Импорт':<32}{'Время':>10}\n")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+        for name, duration in slowest:
+            output.write(f"{name:<32}{duration * 1000:>10.1f}\n")
+        output.flush()
+
+
+# Общий профилировщик процесса
+profiler = StartupProfiler()
@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+import shutil
+import signal
+import selectors
+from key_decoder import KeyDecoder, INPUT_BUFFER_SIZE, ESC_TIMEOUT, WINDOWS_KEY_PREFIXES, translate_windows_key
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import termios
+    import tty
+
+# Консоль Windows нельзя передать в select, поэтому клавиатура опрашивается
+# между ожиданиями данных канала с этим интервалом (в секундах)
+KEYBOARD_POLL_INTERVAL = 0.02
+
+# В Windows нет SIGWINCH, поэтому размер окна проверяется с этим интервалом (в секундах)
+RESIZE_POLL_INTERVAL = 0.25
+
+# Размер окна по умолчанию для терминала без окна (строки, столбцы)
+DEFAULT_SIZE = (24, 80)
+
+
+def min_timeout(first, second):
+    '''Возвращает меньший из двух таймаутов селектора, где None означает ожидание без ограничения.'''
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return min(first, second)
+
+
+'''Terminal: интерфейс терминального бэкенда интерактивной сессии.
+Цикл сессии в SSHClient.execute_command ждет на селекторе, в котором зарегистрирован канал,
+а бэкенд добавляет туда свои источники событий (stdin, сигнал об изменении размера окна),
+отдает ввод пользователя пачками байтов и сообщает о новом размере окна.
+Сам по себе Terminal ничего не читает: это бэкенд сессии без ввода.'''
+class Terminal:
+    def __init__(self, stdout=None, stderr=None):
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.stderr = stderr if stderr is not None else sys.stderr
+        self.selector = None
+
+    def get_size(self):
+        '''Возвращает размер окна терминала (строки, столбцы).'''
+        columns, rows = shutil.get_terminal_size()
+        return rows, columns
+
+    def start(self, selector):
+        '''Подготавливает терминал к сессии и регистрирует свои источники событий в селекторе.'''
+        self.selector = selector
+
+    def stop(self):
+        '''Возвращает терминал в исходное состояние после сессии.'''
+        self.selector = None
+
+    def timeout(self, flush_timeout):
+        '''Возвращает таймаут ожидания селектора с учетом таймаута сброса вывода.'''
+        return flush_timeout
+
+    def read_input(self, ready):
+        '''Возвращает накопленный ввод пользователя (байты) или b"", если отправлять нечего.
+
+        :param ready: Источники событий, сработавшие при последнем ожидании селектора.
+        '''
+        return b""
+
+    def poll_resize(self, ready):
+        '''Возвращает новый размер окна (строки, столбцы), если он изменился, иначе None.'''
+        return None
+
+
+'''PipeTerminal: терминал без окна для тестов, бенчмарков и запуска не из консоли.
+Ввод читается из файла или pipe (stdin) без перевода в raw-режим и без разбора
+escape-последовательностей, размер окна фиксированный (при size=None берется размер текущего окна).
+Вывод пишется в переданные потоки.
+Источник ввода регистрируется в селекторе, поэтому бэкенд работает только там,
+где select поддерживает pipe (Mac/Linux).'''
+class PipeTerminal(Terminal):
+    def __init__(self, stdin=None, stdout=None, stderr=None, size=DEFAULT_SIZE):
+        super().__init__(stdout, stderr)
+        self.stdin = stdin
+        self.size = size
+        self.stdin_open = False
+
+    def get_size(self):
+        return self.size if self.size is not None else super().get_size()
+
+    def start(self, selector):
+        super().start(selector)
+        if self.stdin is None:
+            return
+        try:
+            selector.register(self.stdin, selectors.EVENT_READ)
+            self.stdin_open = True
+        except PermissionError:
+            # epoll не принимает обычные файлы (например, stdin < /dev/null): сессия идет без ввода
+            pass
+
+    def stop(self):
+        self.stdin_open = False
+        super().stop()
+
+    def read_stdin(self, ready):
+        '''Читает все, что уже есть в stdin, или возвращает None, если stdin не готов.'''
+        if not self.stdin_open or self.stdin not in ready:
+            return None
+        data = os.read(self.stdin.fileno(), INPUT_BUFFER_SIZE)
+        if not data:
+            # stdin закрыт: дальше ждем только канал
+            self.selector.unregister(self.stdin)
+            self.stdin_open = False
+        return data
+
+    def read_input(self, ready):
+        return self.read_stdin(ready) or b""
+
+
+'''PosixTerminal: терминал Mac/Linux. stdin переводится в raw-режим и ждет в селекторе вместе с каналом,
+нажатия клавиш разбираются KeyDecoder. Сигнал SIGWINCH будит селектор через pipe,
+а размер PTY меняется уже в цикле сессии.'''
+class PosixTerminal(PipeTerminal):
+    def __init__(self, stdin=None, stdout=None, stderr=None):
+        super().__init__(stdin if stdin is not None else sys.stdin, stdout, stderr, size=None)
+        self.key_decoder = KeyDecoder()
+        self.old_tty = None
+        self.resize_reader = None
+        self.resize_writer = None
+        self.previous_resize_handler = None
+
+    def on_resize(self, signum, frame):
+        try:
+            os.write(self.resize_writer, b"\0")
+        except BlockingIOError:
+            pass
+
+    def start(self, selector):
+        self.old_tty = termios.tcgetattr(self.stdin)
+        self.resize_reader, self.resize_writer = os.pipe()
+        os.set_blocking(self.resize_writer, False)
+        self.previous_resize_handler = signal.signal(signal.SIGWINCH, self.on_resize)
+        tty.setraw(self.stdin)
+        super().start(selector)
+        selector.register(self.resize_reader, selectors.EVENT_READ)
+
+    def stop(self):
+        if self.old_tty is not None:
+            termios.tcsetattr(self.stdin, termios.TCSADRAIN, self.old_tty)
+            self.old_tty = None
+        if self.previous_resize_handler is not None:
+            signal.signal(signal.SIGWINCH, self.previous_resize_handler)
+            self.previous_resize_handler = None
+        if self.resize_reader is not None:
+            os.close(self.resize_reader)
+            os.close(self.resize_writer)
+            self.resize_reader = self.resize_writer = None
+        super().stop()
+
+    def timeout(self, flush_timeout):
+        # Неполная escape-последовательность ждет продолжения не дольше ESC_TIMEOUT
+        if self.key_decoder.pending:
+            return min_timeout(flush_timeout, ESC_TIMEOUT)
+        return flush_timeout
+
+    def read_input(self, ready):
+        data = self.read_stdin(ready)
+        if data is not None:
+            return self.key_decoder.feed(data)
+        if self.key_decoder.expired():
+            return self.key_decoder.flush()
+        return b""
+
+    def poll_resize(self, ready):
+        if self.resize_reader not in ready:
+            return None
+        os.read(self.resize_reader, 1024)
+        return self.get_size()
+
+
+'''WindowsTerminal: терминал Windows. Консоль нельзя передать в select, поэтому селектор ждет
+только канал не дольше KEYBOARD_POLL_INTERVAL, а между ожиданиями клавиатура опрашивается через msvcrt.
+Размер окна проверяется раз в RESIZE_POLL_INTERVAL.'''
+class WindowsTerminal(Terminal):
+    def __init__(self, stdout=None, stderr=None):
+        super().__init__(stdout, stderr)
+        self.size = None
+        self.last_resize_check = 0.0
+
+    def start(self, selector):
+        super().start(selector)
+        self.size = self.get_size()
+        self.last_resize_check = time.monotonic()
+
+    def timeout(self, flush_timeout):
+        return min_timeout(flush_timeout, KEYBOARD_POLL_INTERVAL)
+
+    def read_input(self, ready):
+        # Забираем все нажатые клавиши и отправляем их одной пачкой
+        keys = []
+        while msvcrt.kbhit():
+            char = msvcrt.getwch()
+            if char in WINDOWS_KEY_PREFIXES:
+                keys.append(translate_windows_key(msvcrt.getwch()))
+            else:
+                keys.append(char)
+        return "".join(keys).encode("utf-8")
+
+    def poll_resize(self, ready):
+        if time.monotonic() - self.last_resize_check < RESIZE_POLL_INTERVAL:
+            return None
+        self.last_resize_check = time.monotonic()
+        size = self.get_size()
+        if size == self.size:
+            return None
+        self.size = size
+        return size
+
+
+def get_terminal():
+    '''Выбирает терминальный бэкенд для текущей платформы и stdin.'''
+    if os.name == "nt":
+        return WindowsTerminal()
+    if sys.stdin.isatty():
+        return PosixTerminal()
+    return PipeTerminal(sys.stdin)
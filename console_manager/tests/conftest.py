@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Модули программы импортируются как скрипты (как из main.py), стенд-заглушка - из benchmarks
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, "benchmarks"))
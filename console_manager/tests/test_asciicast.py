@@ -0,0 +1,54 @@
+import io
+import json
+import argparse
+import pytest
+from asciicast import AsciicastWriter, AsciicastPlayer
+from main import positive_float
+
+
+@pytest.fixture
+def cast_file(tmp_path):
+    '''Запись с выводом в 0, 0.5 и 2.5 секунды и вводом между ними.'''
+    path = tmp_path / "session.cast"
+    events = [[0.0, "o", "$ "], [0.4, "i", "ls\r"], [0.5, "o", "ls\r\n"], [2.5, "o", "файл\r\n"]]
+    lines = [json.dumps({"version": 2, "width": 80, "height": 24})] + [json.dumps(event, ensure_ascii=False) for event in events]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("speed", [0, -1])
+def test_play_rejects_non_positive_speed(cast_file, speed):
+    with pytest.raises(ValueError, match="больше нуля"):
+        AsciicastPlayer(cast_file).play(speed=speed, output=io.StringIO())
+
+
+def test_play_outputs_only_server_output(cast_file):
+    output = io.StringIO()
+    AsciicastPlayer(cast_file).play(speed=100, output=output)
+    assert output.getvalue() == "$ ls\r\nфайл\r\n"
+
+
+def test_seek_without_index(cast_file):
+    output = io.StringIO()
+    AsciicastPlayer(cast_file).play(instant=True, start=1.0, output=output)
+    assert output.getvalue() == "файл\r\n"
+
+
+def test_writer_round_trip(tmp_path):
+    path = str(tmp_path / "written.cast")
+    writer = AsciicastWriter(path, 80, 24, command="echo")
+    # Многобайтовый символ, разрезанный между чанками, записывается целиком
+    data = "привет\r\n".encode("utf-8")
+    writer.output(data[:3])
+    writer.output(data[3:])
+    writer.input(b"q")
+    writer.close()
+    output = io.StringIO()
+    AsciicastPlayer(path).play(instant=True, output=output)
+    assert output.getvalue() == "привет\r\n"
+
+
+def test_speed_argument():
+    assert positive_float("2.5") == 2.5
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_float("0")
@@ -0,0 +1,76 @@
+import time
+import asyncio
+import pytest
+from stand_server import StandServer, USERNAME, PASSWORD
+from async_session import AsyncSessionEngine
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "big.log").write_bytes(b"".join(f"line {number}\n".encode() for number in range(100000)))
+    with StandServer(str(tmp_path)) as server:
+        yield server
+
+
+def run_with_engine(server, action, **options):
+    '''Выполняет корутину action(engine) в новом цикле событий и закрывает движок.'''
+    async def main():
+        engine = AsyncSessionEngine(server.hostname, server.port, USERNAME, PASSWORD, **options)
+        try:
+            return await action(engine)
+        finally:
+            engine.close()
+    return asyncio.run(main())
+
+
+def test_run_collects_output_and_status(server):
+    async def action(engine):
+        return await engine.run("echo hello"), await engine.run("cat missing.log")
+
+    (status, stdout, stderr), (error_status, _, error_output) = run_with_engine(server, action)
+    assert (status, stdout, stderr) == (0, b"hello\n", b"")
+    assert error_status != 0 and error_output
+
+
+def test_stream_returns_large_output_in_chunks(server, tmp_path):
+    async def action(engine):
+        chunks = [data async for data, is_error in engine.stream("cat big.log") if not is_error]
+        return chunks
+
+    chunks = run_with_engine(server, action, recv_buffer_size=4096)
+    assert b"".join(chunks) == (tmp_path / "big.log").read_bytes()
+    assert max(len(chunk) for chunk in chunks) <= 4096
+
+
+def test_sessions_limited_by_max_sessions(server):
+    async def action(engine):
+        started = time.monotonic()
+        results = await asyncio.gather(*(engine.run("sleep 0.3") for _ in range(4)))
+        return results, time.monotonic() - started
+
+    results, elapsed = run_with_engine(server, action, max_sessions=2)
+    assert [status for status, _, _ in results] == [0] * 4
+    # Две волны по две сессии
+    assert elapsed >= 0.55
+
+
+def test_cancel_closes_channel(server):
+    async def action(engine):
+        session = engine.session("sleep 30")
+
+        async def consume():
+            async for _ in session.stream():
+                pass
+
+        task = asyncio.create_task(consume())
+        while session.channel is None:
+            await asyncio.sleep(0.01)
+        started = time.monotonic()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return session, time.monotonic() - started
+
+    session, elapsed = run_with_engine(server, action)
+    assert session.channel.closed
+    assert elapsed < 1.0
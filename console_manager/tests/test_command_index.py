@@ -0,0 +1,49 @@
+import pytest
+from command_index import CommandIndex, CommandHistory
+
+NAMES = ["restart celery", "celery logs", "logs", "restart nginx", "nginx logs", "run script", "cached logs"]
+
+
+@pytest.fixture
+def history(tmp_path):
+    return CommandHistory(str(tmp_path / "history.json"))
+
+
+def test_match_groups_order():
+    index = CommandIndex(NAMES)
+    # Точное совпадение, затем начало названия, начало слова и подстрока
+    assert index.search("logs") == ["logs", "cached logs", "celery logs", "nginx logs"]
+    assert index.search("cel") == ["celery logs", "restart celery"]
+    assert index.search("ginx") == ["nginx logs", "restart nginx"]
+
+
+def test_typo_and_case():
+    index = CommandIndex(NAMES)
+    assert index.search("restrat  CELERY")[0] == "restart celery"
+    assert index.lookup("Run  Script") == "run script"
+    assert index.lookup("run") is None
+
+
+def test_history_ranks_within_group(history):
+    index = CommandIndex(NAMES, history, scope="command")
+    history.record("command", "restart nginx")
+    history.record("command", "nginx logs")
+    history.record("command", "nginx logs")
+    assert index.search("nginx") == ["nginx logs", "restart nginx"]
+    assert index.search("re") == ["restart nginx", "restart celery"]
+    assert index.ranked(3) == ["nginx logs", "restart nginx", "restart celery"]
+    # История другой области не влияет на порядок
+    history.record("stand", "restart celery")
+    assert index.ranked(1) == ["nginx logs"]
+
+
+def test_history_persists(history):
+    history.record("stand", "dev")
+    assert CommandHistory(history.history_file).score("stand", "dev") == pytest.approx(1.0, rel=1e-3)
+
+
+def test_complete_falls_back_to_search():
+    index = CommandIndex(NAMES)
+    assert index.complete("restart") == ["restart celery", "restart nginx"]
+    assert index.complete("ngnx")[0] in ("nginx logs", "restart nginx")
+    assert index.search("", limit=2) == NAMES[:2]
@@ -0,0 +1,57 @@
+import pytest
+import command_loader
+from command_loader import CommandLoader, SHELL_MODE, EXEC_MODE
+
+COMMANDS_YAML = '''
+paths:
+  logs: /var/log/app
+  base:
+    dev: /srv/dev
+    test: /srv/test
+commands:
+  restart: "cd {src_path} && ./restart {stand}"
+  logs:
+    command: "cat {logs_path}/{stand}.log"
+    mode: exec
+    cache: 30
+    log_file: "{logs_path}/{stand}.log"
+    view: viewport
+'''
+
+
+@pytest.fixture
+def commands_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(command_loader, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "commands.yaml"
+    path.write_text(COMMANDS_YAML, encoding="utf-8")
+    return str(path)
+
+
+def test_templates_expanded_per_stand(commands_file):
+    commands = CommandLoader.load_commands(commands_file)
+    assert list(commands) == ["dev", "test"]
+    assert commands["dev"]["restart"] == "cd /srv/dev/src && ./restart dev"
+    # Шаблоны подставляются только для стендов, к которым обращались
+    assert list(commands.expanded) == ["dev"]
+    assert commands["test"]["logs"] == "cat /var/log/app/test.log"
+    assert (commands.mode("restart"), commands.mode("logs")) == (SHELL_MODE, EXEC_MODE)
+    assert commands.view("logs") == "viewport"
+    assert commands.cache("dev", "logs") == (30, "/var/log/app/dev.log")
+    assert commands.cache("dev", "restart") is None
+
+
+def test_cached_config_matches_parsed(commands_file):
+    parsed = CommandLoader.load_config(commands_file)
+    assert CommandLoader.read_cache(CommandLoader.cache_path(commands_file))["config"] == parsed
+    assert CommandLoader.load_config(commands_file) == parsed
+
+
+@pytest.mark.parametrize("value, message", [
+    ({"command": "x", "mode": "batch"}, "Неизвестный режим команды"),
+    ({"command": "x", "cache": 10}, "только команды в режиме exec"),
+    ({"command": "x", "mode": "follow"}, "нужен log_file"),
+    ({"command": "x", "view": "color"}, "Неизвестный режим отображения"),
+])
+def test_invalid_command(value, message):
+    with pytest.raises(ValueError, match=message):
+        CommandLoader.split_commands({"bad": value})
@@ -0,0 +1,101 @@
+import io
+import re
+import socket
+import threading
+import pytest
+import ssh_client
+from stand_server import StandServer, USERNAME, PASSWORD, POSTFIX
+from ssh_client import SSHClient, ConnectionPool
+from terminal import PipeTerminal
+
+# Задержка канала: prompt после сброса shell приходит заметно позже маркера
+LINK_LATENCY = 0.05
+
+
+def prompt(path):
+    return re.compile(re.escape(f"{USERNAME}@{POSTFIX}:{path}$"))
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "stands").mkdir()
+    with StandServer(str(tmp_path), latency=LINK_LATENCY) as server:
+        output = io.StringIO()
+        client = SSHClient(server.hostname, server.port, USERNAME, PASSWORD, terminal=PipeTerminal(stdout=output, stderr=io.StringIO()))
+        yield client, output
+        client.close()
+
+
+def test_reused_shell_waits_for_prompt_after_reset(client):
+    client, output = client
+    client.execute_command("cd stands && echo first", prompt("~/stands"))
+    assert "first" in output.getvalue()
+    shells = client.pool.shells[client.client]
+    assert len(shells) == 1
+
+    # Shell из пула уже в домашнем каталоге: запоздавший prompt сброса не должен завершить команду раньше вывода
+    output.seek(0)
+    output.truncate()
+    client.execute_command("echo second", prompt("~"))
+    assert "second\r\n" in output.getvalue() or "second\n" in output.getvalue()
+    assert client.pool.shells[client.client] == shells
+
+
+class ScriptedChannel:
+    '''Канал, который отдает заранее заданные чанки вывода; сокет нужен только для селектора.'''
+    def __init__(self, chunks):
+        self.reader, self.writer = socket.socketpair()
+        self.chunks = []
+        self.received = []
+        self.closed = False
+        self.eof_received = False
+        self.timers = [threading.Timer(delay, self.deliver, (data,)) for delay, data in chunks]
+        for timer in self.timers:
+            timer.start()
+
+    def deliver(self, data):
+        self.chunks.append(data)
+        self.writer.send(b"x")
+
+    def fileno(self):
+        return self.reader.fileno()
+
+    def recv_ready(self):
+        return bool(self.chunks)
+
+    def recv(self, size):
+        self.reader.recv(1)
+        self.received.append(self.chunks.pop(0))
+        return self.received[-1]
+
+    def close(self):
+        for timer in self.timers:
+            timer.cancel()
+            timer.join()
+        self.reader.close()
+        self.writer.close()
+
+
+def test_wait_reset_consumes_late_prompt():
+    late_prompt = f"{USERNAME}@{POSTFIX}:~$ ".encode()
+    channel = ScriptedChannel([
+        (0.0, b"cd ~; deactivate 2>/dev/null; echo shell'_'reset\r\n"),
+        (0.0, b"shell_reset\r\n"),
+        (0.2, late_prompt),
+    ])
+    try:
+        assert ConnectionPool.wait_reset(channel)
+        # Prompt после маркера вычитан до выдачи shell, следующая команда его не увидит
+        assert channel.received[-1] == late_prompt
+        assert not channel.recv_ready()
+    finally:
+        channel.close()
+
+
+def test_wait_reset_fails_without_prompt(monkeypatch):
+    monkeypatch.setattr(ssh_client, "SHELL_RESET_TIMEOUT", 0.3)
+    channel = ScriptedChannel([(0.0, b"shell_reset\r\n"), (0.05, b"still running\r\n")])
+    try:
+        assert not ConnectionPool.wait_reset(channel)
+    finally:
+        channel.close()
@@ -0,0 +1,57 @@
+import time
+import threading
+import pytest
+import paramiko
+from stand_server import StandServer, USERNAME, PASSWORD
+from control_master import ControlMaster
+
+# Задержка канала: подключение к серверу занимает несколько обменов пакетами
+LINK_LATENCY = 0.05
+
+
+@pytest.fixture
+def broker(tmp_path):
+    with StandServer(str(tmp_path), latency=LINK_LATENCY) as server:
+        master = ControlMaster(control_path=str(tmp_path / "control.sock"))
+        yield master, (server.hostname, server.port, USERNAME)
+        master.pool.close()
+
+
+def acquire_concurrently(master, target, passwords):
+    '''Подключает клиентов с паролями passwords почти одновременно; возвращает {пароль: ошибка или None}.'''
+    results = {}
+
+    def acquire(password):
+        try:
+            master.acquire(target, password)
+            results[password] = None
+        except paramiko.AuthenticationException as e:
+            results[password] = e
+
+    threads = []
+    for password in passwords:
+        threads.append(threading.Thread(target=acquire, args=(password,)))
+        threads[-1].start()
+        # Второй клиент приходит, пока первый еще подключается
+        time.sleep(LINK_LATENCY)
+    for thread in threads:
+        thread.join(30)
+    return results
+
+
+@pytest.mark.parametrize("order", [(PASSWORD, "wrong"), ("wrong", PASSWORD)])
+def test_wrong_password_does_not_share_connection(broker, order):
+    master, target = broker
+    results = acquire_concurrently(master, target, order)
+    assert results[PASSWORD] is None
+    assert isinstance(results["wrong"], paramiko.AuthenticationException)
+    assert master.passwords[target] == PASSWORD
+
+
+def test_later_client_checked_against_first_password(broker):
+    master, target = broker
+    master.acquire(target, PASSWORD)
+    with pytest.raises(paramiko.AuthenticationException):
+        master.acquire(target, "wrong")
+    master.acquire(target, PASSWORD)
+    assert master.passwords[target] == PASSWORD
@@ -0,0 +1,35 @@
+from key_decoder import KeyDecoder, PASTE_START, PASTE_END, translate_windows_key
+
+
+def test_plain_text_and_sequences_pass_through():
+    decoder = KeyDecoder()
+    assert decoder.feed(b"ls\x1b[A\x1bOP\x1b[1;5Dx\x1bb") == b"ls\x1b[A\x1bOP\x1b[1;5Dx\x1bb"
+    assert decoder.pending == b""
+
+
+def test_sequence_split_between_reads():
+    decoder = KeyDecoder()
+    # Начало последовательности ждет продолжения и не уходит в канал обрывком
+    assert decoder.feed(b"a\x1b[1;") == b"a"
+    assert decoder.feed(b"5C") == b"\x1b[1;5C"
+    assert decoder.feed(b"\x1bO") == b""
+    assert decoder.feed(b"B") == b"\x1bOB"
+
+
+def test_lone_escape_is_flushed_as_is():
+    decoder = KeyDecoder()
+    assert decoder.feed(b"\x1b") == b""
+    assert decoder.flush() == b"\x1b"
+    assert not decoder.expired()
+
+
+def test_paste_markers():
+    pasted = PASTE_START + b"echo \x1b[31m\n" + PASTE_END
+    assert KeyDecoder().feed(pasted) == b"echo \x1b[31m\n"
+    assert KeyDecoder(strip_paste_markers=False).feed(pasted) == pasted
+
+
+def test_windows_keys():
+    assert translate_windows_key("H") == "\x1bOA"
+    assert translate_windows_key("\x86") == "\x1b[24~"
+    assert translate_windows_key("z") == ""
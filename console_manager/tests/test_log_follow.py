@@ -0,0 +1,117 @@
+import io
+import os
+import time
+import threading
+import pytest
+from stand_server import StandServer, USERNAME, PASSWORD, INTERRUPTED_STATUS
+from ssh_client import SSHClient
+from log_follow import LogFollower
+from command_loader import StandCommands, FOLLOW_MODE
+from cli import CLI
+
+# Сколько ждать, пока строки лога дойдут до вывода (в секундах)
+WAIT_TIMEOUT = 10.0
+
+
+def wait_for(condition, what):
+    '''Ждет, пока condition() станет истинным.'''
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail(f"не дождались: {what}")
+        time.sleep(0.02)
+
+
+def append_lines(path, numbers):
+    '''Дописывает в лог строки с номерами numbers.'''
+    with open(path, "a", encoding="utf-8") as file:
+        file.writelines(f"line {number}\n" for number in numbers)
+
+
+@pytest.fixture
+def stand(tmp_path):
+    '''Стенд-заглушка с логом из 20 строк в ~/logs/app.log.'''
+    os.makedirs(tmp_path / "logs")
+    log_path = tmp_path / "logs" / "app.log"
+    append_lines(log_path, range(20))
+    with StandServer(str(tmp_path)) as server:
+        yield server, log_path
+
+
+def start_follow(server, **options):
+    '''Запускает LogFollower в отдельном потоке; возвращает (follower, вывод, поток, результат).'''
+    client = SSHClient(server.hostname, server.port, USERNAME, PASSWORD)
+    output = io.StringIO()
+    follower = LogFollower(client, "~/logs/app.log", lines=5, output=output, errors=io.StringIO(), **options)
+    # Переподключение без паузы, чтобы тест не ждал экспоненциальную задержку
+    follower.reconnect_delay = lambda failures: 0.05
+    result = {}
+
+    def run():
+        try:
+            result["status"] = follower.follow()
+        except Exception as e:
+            result["error"] = e
+        finally:
+            client.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return follower, output, thread, result
+
+
+def test_follow_resumes_after_connection_drop(stand):
+    server, log_path = stand
+    follower, output, thread, result = start_follow(server)
+    wait_for(lambda: "line 19\n" in output.getvalue(), "последние строки лога")
+
+    # Обрыв посреди слежения: пока клиента нет, лог дописывается, а потом - после переподключения
+    server.drop_connections()
+    append_lines(log_path, range(20, 25))
+    wait_for(lambda: follower.reconnects >= 1, "переподключение")
+    append_lines(log_path, range(25, 30))
+    wait_for(lambda: "line 29\n" in output.getvalue(), "строки, дописанные после обрыва")
+
+    server.interrupt_commands()
+    thread.join(WAIT_TIMEOUT)
+    assert result == {"status": INTERRUPTED_STATUS}
+    # Каждая строка выведена ровно один раз: после обрыва чтение продолжилось с того же смещения
+    assert output.getvalue() == "".join(f"line {number}\n" for number in range(15, 30))
+
+
+def test_follow_restarts_rotated_log(stand):
+    server, log_path = stand
+    follower, output, thread, result = start_follow(server)
+    wait_for(lambda: "line 19\n" in output.getvalue(), "последние строки лога")
+
+    server.drop_connections()
+    # Ротация во время обрыва: новый файл меньше сохраненного смещения и читается с начала
+    with open(log_path, "w", encoding="utf-8") as file:
+        file.write("rotated 0\n")
+    wait_for(lambda: "rotated 0\n" in output.getvalue(), "начало нового файла")
+
+    server.interrupt_commands()
+    thread.join(WAIT_TIMEOUT)
+    assert result == {"status": INTERRUPTED_STATUS}
+    assert output.getvalue().endswith("line 19\nrotated 0\n")
+
+
+def follow_commands():
+    return StandCommands(
+        {"dev": "/srv/dev"}, "/var/log", {"tail app": "tail -f {logs_path}/app.log"},
+        modes={"tail app": FOLLOW_MODE}, log_files={"tail app": "{logs_path}/app.log"},
+    )
+
+
+def test_follow_rejects_invalid_pattern(capsys):
+    # Неверное выражение отклоняется до подключения к серверу, а не обрывает программу
+    assert CLI(follow_commands()).follow("tail app", "dev", include=["[ERROR"]) == 2
+    assert "неверное регулярное выражение '[ERROR'" in capsys.readouterr().out
+    assert CLI(follow_commands()).follow("tail app", "dev", exclude=["("]) == 2
+
+
+def test_menu_asks_pattern_again(monkeypatch, capsys):
+    answers = iter(["(", "ERROR|WARN"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    assert CLI(follow_commands()).ask_follow_pattern() == "ERROR|WARN"
+    assert "Попробуйте снова" in capsys.readouterr().out
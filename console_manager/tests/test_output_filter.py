@@ -0,0 +1,90 @@
+import io
+import pytest
+from output_filter import AnsiStripper, OutputFilter, PLAIN_VIEW, HIGHLIGHT_VIEW, VIEWPORT_VIEW, highlight_levels
+
+
+def test_stripper_removes_sequences():
+    stripper = AnsiStripper()
+    data = b"\x1b[1;31mERROR\x1b[0m \x1b]0;title\x07ok\x1b(B\x1b7\n"
+    assert stripper.feed(data) == b"ERROR ok\n"
+    assert stripper.close() == b""
+
+
+def test_stripper_holds_sequence_split_between_chunks():
+    stripper = AnsiStripper()
+    assert stripper.feed(b"red \x1b[3") == b"red "
+    assert stripper.feed(b"1mtext") == b"text"
+    assert stripper.feed(b"end\x1b") == b"end"
+    assert stripper.close() == b"\x1b"
+
+
+def test_highlight_levels():
+    assert highlight_levels(b"WARNING x\n") == b"\x1b[33mWARNING\x1b[0m x\n"
+    assert highlight_levels(b"INFO x\n") == b"INFO x\n"
+
+
+def render(view, chunks, height=None):
+    '''Пропускает чанки через OutputFilter и возвращает (вывод, фильтр).'''
+    stream = io.StringIO()
+    output = OutputFilter(stream, view, height)
+    for chunk in chunks:
+        output.write(chunk)
+    output.close()
+    return stream.getvalue(), output
+
+
+def test_plain_view_keeps_all_lines():
+    lines = [f"\x1b[32mline {number}\x1b[0m\n".encode() for number in range(100)]
+    text, _ = render(PLAIN_VIEW, lines, height=10)
+    assert text == "".join(f"line {number}\n" for number in range(100))
+
+
+def test_viewport_keeps_last_screen():
+    # Окно на экран высотой 5: 4 строки вывода и строка-пометка о пропуске
+    text, output = render(VIEWPORT_VIEW, [f"line {number}\n".encode() for number in range(10)], height=5)
+    assert text.splitlines() == [
+        "... пропущено строк: 6 ...", "line 6", "line 7", "line 8", "line 9",
+        "... всего пропущено строк: 6, полный вывод - в записи сессии (--record) ...",
+    ]
+    assert output.total_dropped == 6
+
+
+def test_viewport_note_starts_on_new_line():
+    stream = io.StringIO()
+    output = OutputFilter(stream, VIEWPORT_VIEW, height=3)
+    output.write(b"partial")
+    output.flush()
+    output.write(b" line\n" + b"".join(f"line {number}\n".encode() for number in range(5)))
+    output.flush()
+    assert stream.getvalue().startswith("partial\n... пропущено строк: 4 ...\nline 3\nline 4\n")
+
+
+def test_highlight_view():
+    text, _ = render(HIGHLIGHT_VIEW, [b"\x1b[1mERROR\x1b[0m: boom\n"])
+    assert text == "\x1b[31mERROR\x1b[0m: boom\n"
+
+
+@pytest.mark.parametrize("view", [HIGHLIGHT_VIEW, VIEWPORT_VIEW])
+def test_level_split_between_flushes_is_highlighted(view):
+    stream = io.StringIO()
+    output = OutputFilter(stream, view, height=10)
+    output.write(b"line 1\nERR")
+    output.flush()
+    output.write(b"OR boom\nWARN")
+    output.flush()
+    output.write(b"ING low disk\n")
+    output.close()
+    assert stream.getvalue() == "line 1\n\x1b[31mERROR\x1b[0m boom\n\x1b[33mWARNING\x1b[0m low disk\n"
+
+
+def test_partial_line_shown_before_next_flush():
+    stream = io.StringIO()
+    output = OutputFilter(stream, HIGHLIGHT_VIEW)
+    output.write(b"Continue? [y/n] ")
+    output.flush()
+    assert stream.getvalue() == "Continue? [y/n] "
+    # Придержанное начало слова выводится при закрытии, даже если продолжения не было
+    output.write(b"E")
+    output.flush()
+    output.close()
+    assert stream.getvalue() == "Continue? [y/n] E"
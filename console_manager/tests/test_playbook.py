@@ -0,0 +1,48 @@
+import pytest
+from command_loader import StandCommands, EXEC_MODE, FOLLOW_MODE
+from playbook import Playbook
+
+COMMANDS = StandCommands(
+    {"dev": "/srv/dev", "test": "/srv/test"}, "/var/log",
+    {"migrate": "cd {base_path} && ./migrate", "restart": "restart {stand}", "tail": "tail -f {logs_path}/app.log"},
+    modes={"migrate": EXEC_MODE, "restart": EXEC_MODE, "tail": FOLLOW_MODE},
+)
+
+
+def parse(*steps):
+    return {step.id: step for step in Playbook.parse_steps(list(steps), COMMANDS)}
+
+
+def test_multi_stand_step_expands_dependencies():
+    steps = parse(
+        {"id": "migrate", "stand": "all", "command": "migrate"},
+        {"id": "restart", "stand": "dev", "command": "restart", "needs": "migrate", "params": " --soft"},
+    )
+    assert list(steps) == ["migrate[dev]", "migrate[test]", "restart"]
+    assert steps["restart"].needs == ["migrate[dev]", "migrate[test]"]
+    assert steps["restart"].command(COMMANDS) == "restart dev --soft"
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([{"id": "a", "stand": "dev", "command": "restart", "needs": "b"},
+      {"id": "b", "stand": "dev", "command": "restart", "needs": "a"}], "Циклические зависимости"),
+    ([{"stand": "dev", "command": "restart", "needs": "missing"}], "неизвестная зависимость"),
+    ([{"stand": "prod", "command": "restart"}], "неизвестный стенд"),
+    ([{"stand": "dev", "command": "deploy"}], "неизвестная команда"),
+    ([{"stand": "dev", "command": "tail"}], "режиме follow"),
+    ([{"stand": ["dev", "dev"], "command": "restart"}], "указан дважды"),
+    ([{"id": "a", "stand": "dev", "command": "restart"}, {"id": "a", "stand": "test", "command": "restart"}], "повторяющийся id"),
+    ([{"stand": "dev", "command": "restart", "retries": 3}], "неизвестные ключи"),
+    ([{"stand": "dev"}], "нужны stand и command"),
+])
+def test_invalid_playbook(steps, message):
+    with pytest.raises(ValueError, match=message):
+        Playbook.parse_steps(steps, COMMANDS)
+
+
+def test_load_yaml(tmp_path):
+    path = tmp_path / "playbook.yaml"
+    path.write_text("fail_fast: true\nworkers: 2\nsteps:\n  - {stand: test, command: restart}\n", encoding="utf-8")
+    playbook = Playbook.load(str(path), COMMANDS)
+    assert (playbook.fail_fast, playbook.max_workers) == (True, 2)
+    assert [step.id for step in playbook.steps] == ["step1"]
@@ -0,0 +1,53 @@
+import re
+import pytest
+from prompt_matcher import PromptMatcher
+
+
+def feed_all(matcher, chunks):
+    '''Возвращает номера чанков, на которых найден prompt.'''
+    return [index for index, chunk in enumerate(chunks) if matcher.feed(chunk)]
+
+
+@pytest.mark.parametrize("split", range(1, 6))
+def test_literal_prompt_split_between_chunks(split):
+    data = b"output\nuser@host:~$ "
+    position = len(data) - 6 + split
+    assert feed_all(PromptMatcher("host:~$ "), [data[:position], data[position:]]) == [1]
+
+
+def test_literal_prompt_split_into_single_bytes():
+    chunks = [bytes([byte]) for byte in "вывод\n$ ".encode("utf-8")]
+    assert feed_all(PromptMatcher("\n$ "), chunks) == [len(chunks) - 1]
+
+
+def test_tail_does_not_find_prompt_twice():
+    matcher = PromptMatcher("$ ")
+    assert matcher.feed(b"a $ ")
+    assert not matcher.feed(b"")
+    assert not matcher.feed(b" b")
+
+
+def test_regex_prompt_split_between_chunks():
+    matcher = PromptMatcher(re.compile(r"\[\w+@[\w-]+ [^\]]*\]\$ $"))
+    assert feed_all(matcher, [b"done\n[user@stand-1 ~/s", b"rc]$ "]) == [1]
+
+
+def test_regex_prompt_in_long_chunk():
+    matcher = PromptMatcher(re.compile(r"\$ $"), window_size=4)
+    assert not matcher.feed(b"x" * 10000)
+    assert matcher.feed(b"y" * 10000 + b"$ ")
+
+
+def test_anchored_regex_not_matched_at_window_cut():
+    # "$ " ровно на границе окна: обрезанный стык заканчивался бы на "$ ", но вывод продолжается
+    matcher = PromptMatcher(re.compile(r"\$ $"), window_size=4)
+    assert not matcher.feed(b"ab")
+    assert not matcher.feed(b"$ ; sleep 5\r\n")
+    assert not matcher.feed(b"ab$ " + b"cd")
+    assert matcher.feed(b"done\r\nuser@host:~$ ")
+
+
+def test_regex_match_inside_tail_not_repeated():
+    matcher = PromptMatcher(re.compile(r"\$ $"))
+    assert matcher.feed(b"a $ ")
+    assert not matcher.feed(b"")
@@ -0,0 +1,70 @@
+import subprocess
+import pytest
+from result_cache import ResultCache
+
+
+class LocalShell:
+    '''Выполняет команды локальным sh вместо exec-канала сервера.'''
+    def __init__(self):
+        self.commands = []
+
+    def run_command(self, command, callback):
+        self.commands.append(command)
+        result = subprocess.run(["sh", "-c", command], capture_output=True)
+        callback(result.stdout, False)
+        callback(result.stderr, True)
+        return result.returncode
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"))
+
+
+def write(path, text, mode="a"):
+    with open(path, mode, encoding="utf-8") as file:
+        file.write(text)
+
+
+def test_refresh_reads_only_appended_lines(cache, tmp_path):
+    log = tmp_path / "app.log"
+    write(log, "a 1\nb 2\n")
+    shell = LocalShell()
+    assert cache.fetch(shell, "dev", "cat app.log", 0, str(log))["data"] == b"a 1\nb 2\n"
+    write(log, "c 3\n")
+    result = cache.fetch(shell, "dev", "cat app.log", 0, str(log))
+    assert (result["source"], result["data"], result["fetched"]) == ("refresh", b"a 1\nb 2\nc 3\n", 4)
+
+
+def test_line_being_written_is_left_for_next_refresh(cache, tmp_path):
+    log = tmp_path / "app.log"
+    write(log, "INFO start\n")
+    shell = LocalShell()
+    fetch = lambda: cache.fetch(shell, "dev", "cat app.log | grep ERROR", 0, str(log), suffix=" | grep ERROR")["data"]
+    assert fetch() == b""
+    # Строка дописывается по частям: фильтр не должен видеть ее обрывки
+    write(log, "ERR")
+    assert fetch() == b""
+    write(log, "OR boom\nINFO ")
+    assert fetch() == b"ERROR boom\n"
+    write(log, "ERROR in info\n")
+    assert fetch() == b"ERROR boom\nINFO ERROR in info\n"
+
+
+def test_rotated_log_is_a_miss(cache, tmp_path):
+    log = tmp_path / "app.log"
+    write(log, "old line 1\nold line 2\n")
+    shell = LocalShell()
+    cache.fetch(shell, "dev", "cat app.log", 0, str(log))
+    write(log, "new\n", mode="w")
+    result = cache.fetch(shell, "dev", "cat app.log", 0, str(log))
+    assert (result["source"], result["data"]) == ("miss", b"new\n")
+    assert cache.stats["misses"] == 2 and cache.stats["refreshes"] == 0
+
+
+def test_fresh_entry_is_a_hit(cache):
+    shell = LocalShell()
+    cache.fetch(shell, "dev", "echo status", 60)
+    result = cache.fetch(shell, "dev", "echo status", 60)
+    assert (result["source"], result["data"]) == ("hit", b"status\n")
+    assert len(shell.commands) == 1
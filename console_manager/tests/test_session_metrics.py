@@ -0,0 +1,83 @@
+import json
+import threading
+import pytest
+from stand_server import StandServer, USERNAME, PASSWORD
+from session_metrics import Histogram, SessionMetrics
+from ssh_client import SSHClient
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert (histogram.count, histogram.sum, histogram.min, histogram.max) == (5, 16.5, 0.5, 10.0)
+    # Медиана - 2.5-е из 5 значений: середина второй корзины (1, 2] с учетом одного значения до нее
+    assert histogram.quantile(0.5) == pytest.approx(1.75)
+    # Последняя корзина ограничена максимумом, а не бесконечностью
+    assert histogram.quantile(1.0) == 10.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_scope_labels_are_per_thread():
+    metrics = SessionMetrics()
+
+    def run(stand):
+        with metrics.scope(stand, "status"):
+            for _ in range(100):
+                metrics.add("bytes_in", 1)
+
+    threads = [threading.Thread(target=run, args=(stand,)) for stand in ("dev", "test")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.add("bytes_in", 5)
+    assert metrics.counters == {("bytes_in", "dev", "status"): 100, ("bytes_in", "test", "status"): 100, ("bytes_in", "", ""): 5}
+
+
+def test_prometheus_export(tmp_path):
+    metrics = SessionMetrics()
+    with metrics.scope('st"and', "logs"):
+        metrics.observe("session_seconds", 0.02)
+        metrics.add("bytes_in", 10)
+    path = tmp_path / "metrics.prom"
+    metrics.export(str(path))
+    lines = path.read_text(encoding="utf-8").splitlines()
+    labels = 'stand="st\\"and",command="logs"'
+    assert "# TYPE ssh_console_session_seconds histogram" in lines
+    assert f'ssh_console_session_seconds_bucket{{{labels},le="0.01"}} 0' in lines
+    assert f'ssh_console_session_seconds_bucket{{{labels},le="0.025"}} 1' in lines
+    assert f'ssh_console_session_seconds_bucket{{{labels},le="+Inf"}} 1' in lines
+    assert f"ssh_console_session_seconds_count{{{labels}}} 1" in lines
+    assert f"ssh_console_bytes_in_total{{{labels}}} 10" in lines
+
+
+def test_json_export(tmp_path):
+    metrics = SessionMetrics()
+    with metrics.scope("dev", "logs"):
+        metrics.observe("session_seconds", 0.5)
+    path = tmp_path / "metrics.json"
+    metrics.export(str(path))
+    exported = json.loads(path.read_text(encoding="utf-8"))
+    assert exported["histograms"][0]["name"] == "session_seconds"
+    assert exported["histograms"][0]["stand"] == "dev"
+    assert exported["histograms"][0]["count"] == 1
+    assert exported["counters"] == []
+
+
+def test_client_records_session_metrics(tmp_path):
+    metrics = SessionMetrics()
+    with StandServer(str(tmp_path)) as server:
+        client = SSHClient(server.hostname, server.port, USERNAME, PASSWORD, metrics=metrics)
+        try:
+            with metrics.scope("dev", "echo"):
+                assert client.run_command("echo hello", lambda data, is_error: None) == 0
+        finally:
+            client.close()
+    assert metrics.histograms[("session_seconds", "dev", "echo")].count == 1
+    assert metrics.histograms[("first_byte_seconds", "dev", "echo")].count == 1
+    assert metrics.counters[("bytes_in", "dev", "echo")] == len(b"hello\n")
+    assert metrics.counters[("bytes_out", "dev", "echo")] == len("echo hello")
+    summary = metrics.summary().splitlines()
+    assert len(summary) >= 2 and summary[1].split()[:3] == ["dev", "echo", "1"]